@@ -0,0 +1,328 @@
+"""
+Runs Rigging Tools on a folder of .blend and .fbx files without the UI.
+
+    python "rigging batch.py" job.json input_folder output_folder --blender path/to/blender --workers 4
+
+Files are split between a pool of background Blender processes, each one loads
+"rigging tools.py" next to this script and runs the job on every armature in its files.
+
+job.json, every key is optional and relative paths are relative to the job file:
+
+    {
+        "delete_list": "bone list example.txt",
+        "reparent_orphans": true,
+        "add_target_bones": true,
+        "target_bone_prefix": "TRGT-",
+        "target_link_type": "link_TRANSFORM",
+        "target_incremental": true,
+        "weapon_links": [{"base": "v_arms", "targets": ["v_weapon", "v_weapon_scope"]}],
+        "link_strip_prefixes": ["ValveBiped."],
+        "link_strip_suffixes": [],
+        "link_remap": "remap.csv",
+        "link_plan_cache": "link plans.json",
+        "recipe": "recipe.json",
+        "merge_link_pairs": false,
+        "pose_cost_frames": 24,
+        "output_format": "blend"
+    }
+
+Bone pairs matched for weapon links are kept in link_plan_cache, shared by every worker,
+so files whose armatures have the same bones skip matching.
+
+A recipe saved from the Recipe panel is played after everything else in the job.
+
+merge_link_pairs swaps Copy Rotation and Copy Location pairs that follow the same bone
+for one Copy Transforms. With pose_cost_frames above 0 the scene steps through that many
+frames and the armatures' constraint counts and frame times are added to the report.
+
+Results are saved to the output folder with a report.json of what happened to each file.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from concurrent.futures import ThreadPoolExecutor
+
+
+ADDON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rigging tools.py")
+
+INPUT_EXTENSIONS = ('.blend', '.fbx')
+
+JOB_DEFAULTS = {
+    "delete_list": "",
+    "reparent_orphans": True,
+    "add_target_bones": False,
+    "target_bone_prefix": "TRGT-",
+    "target_link_type": "link_TRANSFORM",
+    "target_incremental": True,
+    "weapon_links": [],
+    "link_strip_prefixes": [],
+    "link_strip_suffixes": [],
+    "link_remap": "",
+    "link_plan_cache": "",
+    "recipe": "",
+    "merge_link_pairs": False,
+    "pose_cost_frames": 0,
+    "output_format": "blend",
+}
+
+
+# ------------------------------------------------------------------------
+#    Job
+# ------------------------------------------------------------------------
+
+# reads a job file and fills in defaults
+def read_job(job_path):
+    with open(job_path, "r", encoding="utf-8") as opened_file:
+        job = json.load(opened_file)
+
+    unknown_keys = set(job) - set(JOB_DEFAULTS)
+    if unknown_keys:
+        raise ValueError("Unknown job keys: %s" % ", ".join(sorted(unknown_keys)))
+
+    job = dict(JOB_DEFAULTS, **job)
+
+    if job["output_format"] not in ('blend', 'fbx'):
+        raise ValueError("output_format must be blend or fbx")
+    if job["target_link_type"] not in ('link_TRANSFORM', 'link_LOCROT'):
+        raise ValueError("target_link_type must be link_TRANSFORM or link_LOCROT")
+
+    for key in ("delete_list", "link_remap", "link_plan_cache", "recipe"):
+        if job[key]:
+            job[key] = os.path.join(os.path.dirname(os.path.abspath(job_path)), job[key])
+
+    return job
+
+# finds .blend and .fbx files in a folder
+def find_input_files(input_folder, recursive=False):
+    found = []
+    for root, folders, files in os.walk(input_folder):
+        for i in files:
+            if os.path.splitext(i)[1].lower() in INPUT_EXTENSIONS:
+                found.append(os.path.join(root, i))
+        if not recursive:
+            break
+    return sorted(found)
+
+
+# ------------------------------------------------------------------------
+#    Worker, runs inside Blender
+# ------------------------------------------------------------------------
+
+# loads the add-on module from its file, its classes aren't registered since there is no UI
+def load_addon():
+    import importlib.util
+
+    spec = importlib.util.spec_from_file_location("rigging_tools", ADDON_PATH)
+    addon = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(addon)
+    return addon
+
+# runs the job on one file and saves the result, returns a report of what was done
+def process_file(addon, job, bone_list, matcher, recipe, path, output_folder):
+    import bpy
+
+    if path.lower().endswith('.blend'):
+        bpy.ops.wm.open_mainfile(filepath=path)
+    else:
+        bpy.ops.wm.read_factory_settings(use_empty=True)
+        bpy.ops.import_scene.fbx(filepath=path)
+
+    # bone indexes of the last file point at freed armatures
+    addon.invalidate_bone_index()
+
+    context = bpy.context
+    armatures = [ob for ob in context.view_layer.objects if ob.type == 'ARMATURE' and ob.visible_get()]
+    report = {"file": path, "armatures": len(armatures)}
+
+    if armatures and bone_list is not None:
+        matched_bones, missing_bones, deleted_bones = addon.delete_listed_bones(
+            context, armatures, bone_list, job["reparent_orphans"])
+        report["deleted_bones"] = deleted_bones
+        report["missing_bones"] = missing_bones
+
+    if armatures and job["add_target_bones"] and job["target_incremental"]:
+        # files that already have target bones only get the ones they're missing
+        plans = addon.update_target_bones(context, armatures, job["target_bone_prefix"],
+                                          job["target_link_type"])
+        report["target_bones"] = sum(len(plan.created) for armature_object, plan in plans)
+        report["updated_target_bones"] = sum(len(plan.updated()) for armature_object, plan in plans)
+        report["removed_target_bones"] = sum(len(plan.remove) for armature_object, plan in plans)
+    elif armatures and job["add_target_bones"]:
+        targets = addon.add_target_bones(context, armatures, job["target_bone_prefix"],
+                                         job["target_link_type"])
+        report["target_bones"] = sum(len(new_bones) for armature_object, new_bones in targets)
+
+    # each link run replaces the links of its base armature, so links of the same base are made together
+    weapon_links = {}
+    for link in job["weapon_links"]:
+        targets = weapon_links.setdefault(link.get("base", ""), [])
+        targets.extend(i for i in link.get("targets", []) if i not in targets)
+
+    linked_bones = 0
+    for base, targets in weapon_links.items():
+        base_object = bpy.data.objects.get(base)
+        target_objects = [bpy.data.objects.get(i) for i in targets]
+        if base_object is None or not target_objects or None in target_objects:
+            report.setdefault("warnings", []).append("Couldn't find armatures %s and %s" % (base, targets))
+            continue
+        linked_bones += len(addon.link_armature_bones(base_object, target_objects, matcher).pairs)
+    if job["weapon_links"]:
+        report["linked_bones"] = linked_bones
+
+    if armatures and recipe is not None:
+        recipe_warnings = addon.play_recipe(context, armatures, recipe)
+        if recipe_warnings:
+            report.setdefault("warnings", []).extend(recipe_warnings)
+        report["recipe_steps"] = len(recipe)
+
+    if context.view_layer.objects.active is not None and context.view_layer.objects.active.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+
+    if armatures and job["merge_link_pairs"]:
+        report["merged_link_pairs"] = addon.merge_link_constraint_pairs(armatures)
+
+    # measured last so the times are for what gets saved
+    if armatures and job["pose_cost_frames"] > 0:
+        pose_cost = addon.count_pose_cost(armatures)
+        addon.measure_pose_evaluation(context, armatures, job["pose_cost_frames"], pose_cost)
+        report["pose_cost"] = pose_cost.as_dict()
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    if job["output_format"] == 'fbx':
+        output_path = os.path.join(output_folder, name + ".fbx")
+        bpy.ops.export_scene.fbx(filepath=output_path, add_leaf_bones=False)
+    else:
+        output_path = os.path.join(output_folder, name + ".blend")
+        bpy.ops.wm.save_as_mainfile(filepath=output_path)
+
+    report["output"] = output_path
+    return report
+
+# processes a list of files and writes the reports to report_path
+def run_worker(job_path, files_path, output_folder, report_path):
+    addon = load_addon()
+    job = read_job(job_path)
+
+    with open(files_path, "r", encoding="utf-8") as opened_file:
+        files = json.load(opened_file)
+
+    # the bone list is parsed once for every file this worker gets
+    bone_list = addon.load_bone_list(job["delete_list"]) if job["delete_list"] else None
+    remaps = addon.read_remap_table(job["link_remap"]) if job["link_remap"] else ()
+    matcher = addon.BoneNameMatcher(job["link_strip_prefixes"], job["link_strip_suffixes"], remaps)
+    recipe = addon.load_recipe(job["recipe"]) if job["recipe"] else None
+    if job["link_plan_cache"]:
+        addon.load_link_plans(job["link_plan_cache"])
+
+    reports = []
+    for path in files:
+        try:
+            reports.append(process_file(addon, job, bone_list, matcher, recipe, path, output_folder))
+        except Exception as error:
+            reports.append({"file": path, "error": "%s: %s" % (type(error).__name__, error)})
+
+    # plans this worker matched are added to the ones the file had when it started
+    if job["link_plan_cache"]:
+        addon.load_link_plans(job["link_plan_cache"], reload=True)
+        addon.save_link_plans()
+
+    with open(report_path, "w", encoding="utf-8") as opened_file:
+        json.dump(reports, opened_file)
+
+
+# ------------------------------------------------------------------------
+#    Runner, starts the Blender workers
+# ------------------------------------------------------------------------
+
+# runs one background Blender on a chunk of files and returns its reports
+def run_blender(blender, job_path, files, output_folder, timeout):
+    with tempfile.TemporaryDirectory() as temp_folder:
+        files_path = os.path.join(temp_folder, "files.json")
+        report_path = os.path.join(temp_folder, "report.json")
+
+        with open(files_path, "w", encoding="utf-8") as opened_file:
+            json.dump(files, opened_file)
+
+        command = [blender, "--background", "--factory-startup", "--python", os.path.abspath(__file__),
+                   "--", "--worker", job_path, files_path, output_folder, report_path]
+
+        try:
+            process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                     universal_newlines=True, timeout=timeout)
+            output = process.stdout
+        except (OSError, subprocess.TimeoutExpired) as error:
+            return [{"file": i, "error": str(error)} for i in files]
+
+        if not os.path.exists(report_path):
+            output_tail = "\n".join(output.splitlines()[-20:])
+            return [{"file": i, "error": "Blender exited with code %d\n%s" % (process.returncode, output_tail)}
+                    for i in files]
+
+        with open(report_path, "r", encoding="utf-8") as opened_file:
+            return json.load(opened_file)
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Runs Rigging Tools on a folder of .blend and .fbx files.")
+    parser.add_argument("job", help="JSON job file")
+    parser.add_argument("input_folder", help="Folder with .blend and .fbx files")
+    parser.add_argument("output_folder", help="Folder the results are saved to")
+    parser.add_argument("--blender", default="blender", help="Blender executable")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="How many Blender processes run at once")
+    parser.add_argument("--files-per-worker", type=int, default=8,
+                        help="How many files each Blender process handles before exiting")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Seconds before a Blender process is stopped")
+    parser.add_argument("--recursive", action="store_true", help="Also look in sub folders")
+    args = parser.parse_args(argv)
+
+    # checks the job before starting any Blender
+    job_path = os.path.abspath(args.job)
+    try:
+        read_job(job_path)
+    except (OSError, ValueError) as error:
+        print("Couldn't read job %s: %s" % (args.job, error))
+        return 2
+
+    files = find_input_files(args.input_folder, args.recursive)
+    if not files:
+        print("No .blend or .fbx files found in %s" % args.input_folder)
+        return 1
+
+    output_folder = os.path.abspath(args.output_folder)
+    os.makedirs(output_folder, exist_ok=True)
+
+    chunk_size = max(1, args.files_per_worker)
+    chunks = [files[i:i + chunk_size] for i in range(0, len(files), chunk_size)]
+
+    reports = []
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        futures = [pool.submit(run_blender, args.blender, job_path, [os.path.abspath(j) for j in i],
+                               output_folder, args.timeout)
+                   for i in chunks]
+        for future in futures:
+            for report in future.result():
+                reports.append(report)
+                print("%s: %s" % (report["file"], report.get("error", "done")))
+
+    with open(os.path.join(output_folder, "report.json"), "w", encoding="utf-8") as opened_file:
+        json.dump(reports, opened_file, indent=4)
+
+    failed = sum(1 for i in reports if "error" in i)
+    print("Processed %d files, %d failed" % (len(reports), failed))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    # blender passes script arguments after --
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+
+    if argv and argv[0] == "--worker":
+        run_worker(*argv[1:5])
+    else:
+        sys.exit(main(argv))
@@ -0,0 +1,1121 @@
+"""
+Times the Rigging Tools operators on synthetic armatures.
+
+    blender --background --factory-startup --python "rigging benchmark.py" -- --bones 300
+    python "rigging benchmark.py" --bones 300 --shapes chain fan tree --json results.json
+
+Inside Blender the real bpy is used. Without Blender a small bpy stand-in is used instead,
+it keeps bone data in plain Python so times are only good for comparing runs with each other,
+but the mode switch, bpy.ops and bone loop counts from the add-on's profiler match Blender.
+Operator fallbacks that snap with the 3D cursor need a 3D View, so in background Blender
+those cases are skipped.
+The add-on needs NumPy, which Blender ships with, so install it when running without Blender.
+"""
+
+import argparse
+import importlib.util
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import types
+
+
+ADDON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rigging tools.py")
+
+SHAPES = ('chain', 'fan', 'tree')
+
+
+# ------------------------------------------------------------------------
+#    bpy Stand-in
+# ------------------------------------------------------------------------
+
+class StandInVector(tuple):
+    def copy(self):
+        return StandInVector(self)
+
+def vector(value):
+    return StandInVector(float(i) for i in value)
+
+def sub(a, b):
+    return (a[0] - b[0], a[1] - b[1], a[2] - b[2])
+
+def dot(a, b):
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+def cross(a, b):
+    return (a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0])
+
+def normalized(a):
+    length = math.sqrt(dot(a, a))
+    return (a[0] / length, a[1] / length, a[2] / length) if length > 0.0 else (0.0, 1.0, 0.0)
+
+# z axis of a bone with no roll, same as blender's vec_roll_to_mat3
+def zero_roll_z_axis(nor):
+    x, y, z = nor
+    theta = 1.0 + y
+    if theta < 1e-6:
+        return (0.0, 0.0, 1.0)
+    return (-x * z / theta, -z, 1.0 - z * z / theta)
+
+# stores the value on the instance, defaults come from the property options
+class StandInProperty:
+    def __init__(self, kind, **options):
+        self.kind = kind
+        self.options = options
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def default_value(self):
+        if 'default' in self.options:
+            return self.options['default']
+        if self.kind == 'PointerProperty':
+            prop_type = self.options.get('type')
+            return prop_type() if isinstance(prop_type, type) and issubclass(prop_type, StandInPropertyGroup) \
+                else None
+        if self.kind == 'EnumProperty':
+            items = self.options.get('items')
+            return items[0][0] if isinstance(items, list) and items else ""
+        return {'BoolProperty': False, 'IntProperty': 0, 'FloatProperty': 0.0,
+                'FloatVectorProperty': (0.0, 0.0, 0.0), 'CollectionProperty': []}.get(self.kind, "")
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        if self.name not in instance.__dict__:
+            instance.__dict__[self.name] = self.default_value()
+        return instance.__dict__[self.name]
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.name] = value
+
+# names properties that are added to a type after it was made, like bpy.types.Scene.my_tool = ...
+class StandInStructType(type):
+    def __setattr__(cls, name, value):
+        if isinstance(value, StandInProperty):
+            value.__set_name__(cls, name)
+        super().__setattr__(name, value)
+
+class StandInPropertyGroup:
+    def __init__(self):
+        for name, value in getattr(type(self), '__annotations__', {}).items():
+            if isinstance(value, StandInProperty):
+                value.__set_name__(type(self), name)
+                setattr(type(self), name, value)
+
+class StandInOperator:
+    bl_options = set()
+
+    def __init__(self):
+        self.reports = []
+
+    def report(self, report_type, message):
+        self.reports.append((report_type, message))
+
+class StandInConstraint:
+    names = {'COPY_TRANSFORMS': "Copy Transforms", 'COPY_ROTATION': "Copy Rotation",
+             'COPY_LOCATION': "Copy Location", 'IK': "IK"}
+
+    def __init__(self, constraint_type):
+        self.type = constraint_type
+        self.name = self.names.get(constraint_type, constraint_type.title())
+        self.target = None
+        self.subtarget = ""
+        self.influence = 1.0
+
+    def as_pointer(self):
+        return id(self)
+
+class StandInConstraints(list):
+    def new(self, constraint_type, name=None):
+        constraint = StandInConstraint(constraint_type)
+        if name is not None:
+            constraint.name = name
+        names = {i.name for i in self}
+        if constraint.name in names:
+            number = 1
+            while "%s.%03d" % (constraint.name, number) in names:
+                number += 1
+            constraint.name = "%s.%03d" % (constraint.name, number)
+        self.append(constraint)
+        return constraint
+
+    # keeps the name like blender does, with a number if the bone already has one by that name
+    def copy(self, constraint):
+        new_constraint = self.new(constraint.type, constraint.name)
+        for key, value in vars(constraint).items():
+            if key != 'name':
+                setattr(new_constraint, key, value)
+        return new_constraint
+
+    def get(self, name, default=None):
+        return next((i for i in self if i.name == name), default)
+
+    def move(self, from_index, to_index):
+        self.insert(to_index, self.pop(from_index))
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            constraint = self.get(key)
+            if constraint is None:
+                raise KeyError(key)
+            return constraint
+        return list.__getitem__(self, key)
+
+# one object stands in for a bone, edit bone and pose bone
+class StandInBone:
+    def __init__(self, armature, name):
+        self.armature = armature
+        self._name = name
+        self._head = vector((0.0, 0.0, 0.0))
+        self._tail = vector((0.0, 1.0, 0.0))
+        self.roll = 0.0
+        self._parent = None
+        self._use_connect = False
+        self.use_deform = True
+        self.select = False
+        self.select_head = False
+        self.select_tail = False
+        self.hide = False
+        self.layers = (True,) + (False,) * 31
+        self.use_inherit_rotation = True
+        self.inherit_scale = 'FULL'
+        self.use_local_location = True
+        self.use_relative_parent = False
+        self.use_envelope_multiply = False
+        self.envelope_distance = 0.25
+        self.envelope_weight = 1.0
+        self.head_radius = 0.1
+        self.tail_radius = 0.05
+        self.bbone_segments = 1
+        self.bbone_x = 0.1
+        self.bbone_z = 0.1
+        self.show_wire = False
+        self.rotation_mode = 'QUATERNION'
+        self.custom_shape = None
+        self.custom_shape_scale = 1.0
+        self.custom_shape_transform = None
+        self.use_custom_shape_bone_size = True
+        self.bone_group = None
+        self.lock_location = (False, False, False)
+        self.lock_rotation = (False, False, False)
+        self.lock_rotation_w = False
+        self.lock_scale = (False, False, False)
+        self.ik_stretch = 0.0
+        self.constraints = StandInConstraints()
+
+    @property
+    def name(self):
+        return self._name
+
+    @name.setter
+    def name(self, value):
+        self.armature.rename_bone(self, value)
+
+    @property
+    def bone(self):
+        return self
+
+    @property
+    def head(self):
+        return self._head
+
+    # like rna_Armature_editbone_transform_update, connected parents and children follow
+    @head.setter
+    def head(self, value):
+        self._head = vector(value)
+        if self._parent is not None and self._use_connect:
+            self._parent._tail = self._head
+
+    @property
+    def tail(self):
+        return self._tail
+
+    @tail.setter
+    def tail(self, value):
+        self._tail = vector(value)
+        for bone in self.armature.bone_list:
+            if bone._parent is self and bone._use_connect:
+                bone._head = self._tail
+
+    # like rna_EditBone_parent_set, a connected bone's head moves to its new parent's tail
+    @property
+    def parent(self):
+        return self._parent
+
+    @parent.setter
+    def parent(self, value):
+        self._parent = value
+        if value is not None and self._use_connect:
+            self._head = value.tail
+
+    @property
+    def head_local(self):
+        return self._head
+
+    @property
+    def tail_local(self):
+        return self._tail
+
+    @property
+    def use_connect(self):
+        return self._use_connect
+
+    @use_connect.setter
+    def use_connect(self, value):
+        self._use_connect = bool(value)
+        if value and self.parent is not None:
+            self.head = self.parent.tail
+
+    @property
+    def length(self):
+        direction = sub(self.tail, self.head)
+        return math.sqrt(dot(direction, direction))
+
+    @length.setter
+    def length(self, value):
+        direction = sub(self.tail, self.head)
+        direction = normalized(direction) if dot(direction, direction) > 0.0 else (0.0, 0.0, 1.0)
+        self.tail = [self.head[i] + direction[i] * value for i in range(3)]
+
+    # x, y and z axes of the bone in armature space
+    def axes(self):
+        nor = normalized(sub(self.tail, self.head))
+        z_axis = zero_roll_z_axis(nor)
+        side = cross(nor, z_axis)
+        z_axis = tuple(z_axis[i] * math.cos(self.roll) + side[i] * math.sin(self.roll) for i in range(3))
+        return cross(nor, z_axis), nor, z_axis
+
+    # EditBone.z_axis is in armature space, Bone.z_axis is relative to the parent bone like Bone.matrix
+    @property
+    def z_axis(self):
+        z_axis = self.axes()[2]
+        if self.armature.is_editmode or self._parent is None:
+            return vector(z_axis)
+        return vector(dot(z_axis, i) for i in self._parent.axes())
+
+    # armature space matrix of the bone, flattened column by column like foreach_get gives it
+    @property
+    def matrix_local(self):
+        x_axis, y_axis, z_axis = self.axes()
+        return tuple(x_axis) + (0.0,) + tuple(y_axis) + (0.0,) + tuple(z_axis) + (0.0,) + tuple(self.head) + (1.0,)
+
+    def align_roll(self, align_axis):
+        nor = normalized(sub(self.tail, self.head))
+        along = dot(align_axis, nor)
+        projected = [align_axis[i] - nor[i] * along for i in range(3)]
+        if dot(projected, projected) < 1e-12:
+            self.roll = 0.0
+            return
+        z_axis = zero_roll_z_axis(nor)
+        self.roll = math.atan2(dot(cross(nor, z_axis), projected), dot(z_axis, projected))
+
+# bones, edit_bones and pose.bones of an armature
+class StandInBones:
+    def __init__(self, armature):
+        self.armature = armature
+
+    def __iter__(self):
+        return iter(list(self.armature.bone_list))
+
+    def __len__(self):
+        return len(self.armature.bone_list)
+
+    def __contains__(self, name):
+        return name in self.armature.bone_map
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self.armature.bone_list[key]
+        return self.armature.bone_map[key]
+
+    def get(self, name, default=None):
+        return self.armature.bone_map.get(name, default)
+
+    @property
+    def active(self):
+        return self.armature.active_bone
+
+    @active.setter
+    def active(self, bone):
+        self.armature.active_bone = bone
+
+    def new(self, name):
+        return self.armature.add_bone(name)
+
+    def remove(self, bone):
+        self.armature.remove_bone(bone)
+
+    def foreach_get(self, attr, buffer):
+        values = []
+        for bone in self.armature.bone_list:
+            value = getattr(bone, attr)
+            values.extend(value if isinstance(value, tuple) else (value,))
+        buffer[:] = values
+
+    def foreach_set(self, attr, buffer):
+        bones = self.armature.bone_list
+        values = buffer.tolist() if hasattr(buffer, "tolist") else list(buffer)
+        size = len(values) // len(bones) if bones else 0
+        for i, bone in enumerate(bones):
+            # foreach_set skips the updates that move connected bones
+            if attr in ("head", "tail"):
+                setattr(bone, "_" + attr, vector(values[i * size:(i + 1) * size]))
+            elif size == 1:
+                setattr(bone, attr, values[i])
+            else:
+                setattr(bone, attr, tuple(values[i * size:(i + 1) * size]))
+
+class StandInArmature(metaclass=StandInStructType):
+    def __init__(self, name):
+        self.name = name
+        self.bone_list = []
+        self.bone_map = {}
+        self.active_bone = None
+        self.layers = (True,) + (False,) * 31
+        self.is_editmode = False
+        self.properties = {}
+
+    # custom properties
+    def __getitem__(self, key):
+        return self.properties[key]
+
+    def __setitem__(self, key, value):
+        self.properties[key] = value
+
+    def __contains__(self, key):
+        return key in self.properties
+
+    def get(self, key, default=None):
+        return self.properties.get(key, default)
+
+    def as_pointer(self):
+        return id(self)
+
+    @property
+    def bones(self):
+        return StandInBones(self)
+
+    edit_bones = bones
+
+    def unique_name(self, name):
+        if name not in self.bone_map:
+            return name
+        number = 1
+        while "%s.%03d" % (name, number) in self.bone_map:
+            number += 1
+        return "%s.%03d" % (name, number)
+
+    def add_bone(self, name):
+        bone = StandInBone(self, self.unique_name(name))
+        self.bone_list.append(bone)
+        self.bone_map[bone.name] = bone
+        return bone
+
+    def rename_bone(self, bone, name):
+        del self.bone_map[bone.name]
+        bone._name = self.unique_name(name)
+        self.bone_map[bone.name] = bone
+
+    # children go to the removed bone's parent like ED_armature_ebone_remove
+    def remove_bone(self, bone):
+        for child in self.bone_list:
+            if child.parent is bone:
+                child._use_connect = False
+                child.parent = bone.parent
+        self.bone_list.remove(bone)
+        del self.bone_map[bone.name]
+        if self.active_bone is bone:
+            self.active_bone = None
+
+class StandInPose:
+    def __init__(self, armature):
+        self.bones = StandInBones(armature)
+
+class StandInObject(metaclass=StandInStructType):
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+        self.type = 'ARMATURE' if isinstance(data, StandInArmature) else 'EMPTY'
+        self.mode = 'OBJECT'
+        self.selected = False
+        self.pose = StandInPose(data) if self.type == 'ARMATURE' else None
+        self.tagged = False
+        self.evaluations = 0
+
+    def update_tag(self, refresh=None):
+        self.tagged = True
+
+    def select_set(self, state):
+        self.selected = bool(state)
+
+    def select_get(self):
+        return self.selected
+
+    def visible_get(self):
+        return True
+
+# evaluates tagged armatures by going over their constraints, so times grow with constraint count
+# nothing is animated, so like in blender an armature is only evaluated when it was tagged
+def evaluate_stand_in_scene(scene):
+    for armature_object in scene.objects:
+        if armature_object.pose is not None and armature_object.tagged:
+            armature_object.tagged = False
+            armature_object.evaluations += 1
+            for pose_bone in armature_object.pose.bones:
+                for constraint in pose_bone.constraints:
+                    getattr(constraint.target, "pose", None)
+
+class StandInIDs:
+    def __init__(self, id_type):
+        self.id_type = id_type
+        self.items = {}
+
+    def __iter__(self):
+        return iter(list(self.items.values()))
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, name):
+        return name in self.items
+
+    def __getitem__(self, name):
+        return self.items[name]
+
+    def get(self, name, default=None):
+        return self.items.get(name, default)
+
+    def new(self, name, *args):
+        item = self.id_type(name, *args)
+        self.items[name] = item
+        return item
+
+    def remove(self, item):
+        self.items.pop(item.name, None)
+
+class StandInSceneObjects:
+    def __init__(self):
+        self.objects = []
+
+    def __iter__(self):
+        return iter(list(self.objects))
+
+    def __contains__(self, name):
+        return any(i.name == name for i in self.objects)
+
+    def get(self, name, default=None):
+        return next((i for i in self.objects if i.name == name), default)
+
+    def __len__(self):
+        return len(self.objects)
+
+    def link(self, ob):
+        self.objects.append(ob)
+
+    def unlink(self, ob):
+        self.objects.remove(ob)
+
+class StandInViewLayerObjects(StandInSceneObjects):
+    def __init__(self, scene_objects):
+        self.scene_objects = scene_objects
+        self.active = None
+
+    @property
+    def objects(self):
+        return self.scene_objects.objects
+
+class StandInScene(metaclass=StandInStructType):
+    def __init__(self):
+        self.name = "Scene"
+        self.collection = types.SimpleNamespace(objects=StandInSceneObjects())
+        self.objects = self.collection.objects
+        self.cursor = types.SimpleNamespace(location=vector((0.0, 0.0, 0.0)))
+        self.frame_current = 1
+        self.frame_subframe = 0.0
+
+    def as_pointer(self):
+        return id(self)
+
+    def frame_set(self, frame, subframe=0.0):
+        self.frame_current = frame
+        self.frame_subframe = subframe
+        evaluate_stand_in_scene(self)
+
+class StandInContext:
+    def __init__(self):
+        self.scene = StandInScene()
+        self.view_layer = types.SimpleNamespace(objects=StandInViewLayerObjects(self.scene.objects))
+
+    @property
+    def active_object(self):
+        return self.view_layer.objects.active
+
+    object = active_object
+
+    @property
+    def selected_objects(self):
+        return [i for i in self.scene.objects if i.selected]
+
+    @property
+    def mode(self):
+        active_object = self.active_object
+        return 'OBJECT' if active_object is None else active_object.mode
+
+    @property
+    def selected_bones(self):
+        active_object = self.active_object
+        if active_object is None or active_object.mode != 'EDIT':
+            return []
+        return [i for i in active_object.data.bone_list if i.select and not i.hide]
+
+# the bpy.ops calls the add-on makes, with enough of their behavior to run the operator fallbacks
+class StandInOps:
+    def __init__(self, context):
+        self.context = context
+        self.operators = {}
+        self.object = types.SimpleNamespace(mode_set=self.object_mode_set, select_all=self.object_select_all,
+                                            join=self.object_join)
+        self.armature = types.SimpleNamespace(select_all=self.armature_select_all,
+                                              duplicate=self.armature_duplicate,
+                                              delete=self.armature_delete,
+                                              parent_clear=self.armature_parent_clear,
+                                              calculate_roll=self.armature_calculate_roll)
+        self.pose = types.SimpleNamespace(select_all=self.pose_select_all,
+                                          constraint_add_with_targets=self.pose_constraint_add_with_targets,
+                                          constraint_add=self.pose_constraint_add,
+                                          ik_add=self.pose_ik_add)
+        self.view3d = types.SimpleNamespace(snap_cursor_to_selected=self.view3d_snap_cursor_to_selected,
+                                            snap_selected_to_cursor=self.view3d_snap_selected_to_cursor)
+
+    def __getattr__(self, name):
+        # registered operators, bpy.ops.wm.delete_listed_bones and so on
+        operators = {key.split('.')[1]: value for key, value in self.operators.items() if key.startswith(name + '.')}
+        return types.SimpleNamespace(**{key: self.operator_caller(value) for key, value in operators.items()})
+
+    def operator_caller(self, operator_class):
+        def call():
+            operator = operator_class()
+            result = operator.execute(self.context)
+            self.last_reports = operator.reports
+            return result
+        return call
+
+    def active(self):
+        active_object = self.context.active_object
+        if active_object is None:
+            raise RuntimeError("Operator poll failed, no active object")
+        return active_object
+
+    def edit_objects(self):
+        return [i for i in self.context.scene.objects if i.mode == 'EDIT' and i.type == 'ARMATURE']
+
+    def object_mode_set(self, mode='OBJECT'):
+        active_object = self.active()
+        if mode == 'OBJECT':
+            objects = [i for i in self.context.scene.objects if i.mode != 'OBJECT']
+        else:
+            objects = [active_object] + [i for i in self.context.selected_objects
+                                         if i is not active_object and i.type == active_object.type]
+        for ob in objects:
+            if ob.mode != 'OBJECT' and ob.mode != mode:
+                ob.mode = 'OBJECT'
+            ob.mode = mode
+            if ob.type == 'ARMATURE':
+                ob.data.is_editmode = mode == 'EDIT'
+        return {'FINISHED'}
+
+    def object_select_all(self, action='TOGGLE'):
+        for ob in self.context.scene.objects:
+            ob.selected = action == 'SELECT'
+        return {'FINISHED'}
+
+    # moves the bones of the other selected armatures into the active one, taken names get a number
+    def object_join(self):
+        active_object = self.active()
+        for ob in [i for i in self.context.selected_objects if i is not active_object and i.type == 'ARMATURE']:
+            new_bones = {}
+            for bone in ob.data.bone_list:
+                new_bone = active_object.data.add_bone(bone.name)
+                for key, value in vars(bone).items():
+                    if key not in ('armature', '_name', '_parent', 'constraints'):
+                        setattr(new_bone, key, value)
+                for constraint in bone.constraints:
+                    new_bone.constraints.copy(constraint)
+                new_bones[bone] = new_bone
+            for bone, new_bone in new_bones.items():
+                new_bone._parent = new_bones.get(bone.parent)
+            self.context.scene.collection.objects.unlink(ob)
+        return {'FINISHED'}
+
+    def armature_select_all(self, action='TOGGLE'):
+        for ob in self.edit_objects():
+            for bone in ob.data.bone_list:
+                bone.select = bone.select_head = bone.select_tail = action == 'SELECT'
+        return {'FINISHED'}
+
+    def armature_duplicate(self, do_flip_names=False):
+        for ob in self.edit_objects():
+            armature = ob.data
+            selected = [i for i in armature.bone_list if i.select]
+            new_bones = {}
+            for bone in selected:
+                new_bone = armature.add_bone(bone.name)
+                for key, value in vars(bone).items():
+                    if key not in ('armature', '_name', 'parent', 'constraints'):
+                        setattr(new_bone, key, value)
+                for constraint in bone.constraints:
+                    new_bone.constraints.copy(constraint)
+                new_bones[bone] = new_bone
+            for bone, new_bone in new_bones.items():
+                new_bone.parent = new_bones.get(bone.parent, bone.parent)
+                bone.select = bone.select_head = bone.select_tail = False
+            if armature.active_bone in new_bones:
+                armature.active_bone = new_bones[armature.active_bone]
+        return {'FINISHED'}
+
+    def armature_delete(self):
+        for ob in self.edit_objects():
+            for bone in [i for i in ob.data.bone_list if i.select]:
+                ob.data.remove_bone(bone)
+        return {'FINISHED'}
+
+    def armature_parent_clear(self, type='CLEAR'):
+        for ob in self.edit_objects():
+            for bone in ob.data.bone_list:
+                if bone.select:
+                    bone.parent = None
+                    bone._use_connect = False
+        return {'FINISHED'}
+
+    def armature_calculate_roll(self, type='ACTIVE'):
+        armature = self.active().data
+        if armature.active_bone is None:
+            raise RuntimeError("No active bone set")
+        z_axis = armature.active_bone.z_axis
+        for bone in armature.bone_list:
+            if bone.select:
+                bone.align_roll(z_axis)
+        return {'FINISHED'}
+
+    def pose_select_all(self, action='TOGGLE'):
+        for bone in self.active().data.bone_list:
+            bone.select = action == 'SELECT'
+            if action != 'SELECT':
+                bone.select_head = bone.select_tail = False
+        return {'FINISHED'}
+
+    def pose_constraint_add_with_targets(self, type):
+        active_object = self.active()
+        owner = active_object.data.active_bone
+        target = next((i for i in active_object.data.bone_list if i.select and i is not owner), None)
+        constraint = owner.constraints.new(type)
+        if target is not None:
+            constraint.target = active_object
+            constraint.subtarget = target.name
+        return {'FINISHED'}
+
+    def pose_constraint_add(self, type):
+        self.active().data.active_bone.constraints.new(type)
+        return {'FINISHED'}
+
+    def pose_ik_add(self, with_targets=True):
+        self.active().data.active_bone.constraints.new('IK')
+        return {'FINISHED'}
+
+    def selected_points(self):
+        for bone in self.active().data.bone_list:
+            if bone.select or bone.select_head:
+                yield bone, 'head'
+            if bone.select or bone.select_tail:
+                yield bone, 'tail'
+
+    def view3d_snap_cursor_to_selected(self):
+        points = [getattr(bone, side) for bone, side in self.selected_points()]
+        if points:
+            self.context.scene.cursor.location = vector(sum(i[j] for i in points) / len(points) for j in range(3))
+        return {'FINISHED'}
+
+    def view3d_snap_selected_to_cursor(self, use_offset=True):
+        for bone, side in list(self.selected_points()):
+            setattr(bone, side, self.context.scene.cursor.location)
+        return {'FINISHED'}
+
+# builds the bpy stand-in modules and puts them in sys.modules
+def install_stand_in():
+    context = StandInContext()
+    ops = StandInOps(context)
+
+    def register_class(cls):
+        if issubclass(cls, StandInOperator):
+            ops.operators[cls.bl_idname] = cls
+
+    def unregister_class(cls):
+        ops.operators.pop(getattr(cls, 'bl_idname', None), None)
+
+    bpy = types.ModuleType("bpy")
+    bpy.context = context
+    bpy.ops = ops
+    bpy.data = types.SimpleNamespace(objects=StandInIDs(StandInObject), armatures=StandInIDs(StandInArmature))
+    bpy.path = types.SimpleNamespace(abspath=lambda path: path[2:] if path.startswith('//') else path)
+    bpy.props = types.ModuleType("bpy.props")
+    for kind in ('StringProperty', 'BoolProperty', 'IntProperty', 'FloatProperty', 'FloatVectorProperty',
+                 'EnumProperty', 'PointerProperty', 'CollectionProperty'):
+        setattr(bpy.props, kind, (lambda kind: lambda **options: StandInProperty(kind, **options))(kind))
+    bpy.types = types.ModuleType("bpy.types")
+    bpy.types.Panel = type("Panel", (), {})
+    bpy.types.Menu = type("Menu", (), {})
+    bpy.types.UIList = type("UIList", (), {})
+    bpy.types.Operator = StandInOperator
+    bpy.types.PropertyGroup = StandInPropertyGroup
+    bpy.types.Collection = type("Collection", (), {})
+    bpy.types.Object = StandInObject
+    bpy.types.Armature = StandInArmature
+    bpy.types.Scene = StandInScene
+    bpy.types.SpaceView3D = types.SimpleNamespace(draw_handler_add=lambda *args: args,
+                                                  draw_handler_remove=lambda *args: None)
+    bpy.utils = types.ModuleType("bpy.utils")
+    bpy.utils.register_class = register_class
+    bpy.utils.unregister_class = unregister_class
+    bpy.app = types.ModuleType("bpy.app")
+    bpy.app.background = True
+    bpy.app.handlers = types.ModuleType("bpy.app.handlers")
+    bpy.app.handlers.persistent = lambda function: function
+    bpy.app.handlers.depsgraph_update_post = []
+    bpy.app.handlers.load_post = []
+    # timers are kept but never run, there is no event loop
+    timers = []
+    bpy.app.timers = types.SimpleNamespace(register=lambda function, **options: timers.append(function),
+                                           unregister=timers.remove,
+                                           is_registered=lambda function: function in timers)
+
+    sys.modules.update({'bpy': bpy, 'bpy.props': bpy.props, 'bpy.types': bpy.types, 'bpy.utils': bpy.utils,
+                        'bpy.app': bpy.app, 'bpy.app.handlers': bpy.app.handlers})
+    return bpy
+
+
+# ------------------------------------------------------------------------
+#    Synthetic Armatures
+# ------------------------------------------------------------------------
+
+# parent index of bone i for each shape
+def shape_parent(shape, i):
+    if i == 0:
+        return None
+    if shape == 'chain':
+        return i - 1
+    if shape == 'fan':
+        return 0
+    return (i - 1) // 2
+
+# makes an armature object with bone_count bones named bone_prefix000, bone_prefix001...
+def build_armature(bpy, name, shape, bone_count, bone_prefix="bone_"):
+    context = bpy.context
+    armature = bpy.data.armatures.new(name)
+    armature_object = bpy.data.objects.new(name, armature)
+    context.scene.collection.objects.link(armature_object)
+
+    if context.view_layer.objects.active is not None and context.view_layer.objects.active.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+    for ob in context.selected_objects:
+        ob.select_set(False)
+    armature_object.select_set(True)
+    context.view_layer.objects.active = armature_object
+    bpy.ops.object.mode_set(mode='EDIT')
+
+    edit_bones = armature.edit_bones
+    bones = []
+    for i in range(bone_count):
+        parent_index = shape_parent(shape, i)
+        bone = edit_bones.new("%s%03d" % (bone_prefix, i))
+        if parent_index is None:
+            bone.head = (0.0, 0.0, 0.0)
+        elif shape == 'fan':
+            bone.head = bones[0].tail
+        else:
+            bone.head = bones[parent_index].tail
+
+        angle = i * 0.7
+        bone.tail = (bone.head[0] + 0.2 * math.cos(angle), bone.head[1] + 0.2 * math.sin(angle),
+                     bone.head[2] + 0.5)
+        bone.roll = (i % 7) * 0.3
+        if parent_index is not None:
+            bone.parent = bones[parent_index]
+            bone.use_connect = shape != 'fan'
+        bones.append(bone)
+
+    bpy.ops.object.mode_set(mode='OBJECT')
+    return armature_object
+
+# removes every object and armature from the last case
+def clear_scene(bpy):
+    context = bpy.context
+    if context.view_layer.objects.active is not None and context.view_layer.objects.active.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+    for ob in list(bpy.data.objects):
+        if ob in context.scene.objects.objects:
+            context.scene.collection.objects.unlink(ob)
+        bpy.data.objects.remove(ob)
+    for armature in list(bpy.data.armatures):
+        bpy.data.armatures.remove(armature)
+
+def select_bones(bpy, armature_object, bone_names):
+    bpy.ops.object.mode_set(mode='POSE')
+    for bone in armature_object.data.bones:
+        bone.select = bone.name in bone_names
+        bone.select_head = bone.select_tail = False
+
+
+# ------------------------------------------------------------------------
+#    Cases, each one sets up the scene and returns the operator to time
+# ------------------------------------------------------------------------
+
+def case_delete_listed_bones(bpy, shape, bone_count, temp_folder):
+    armature_object = build_armature(bpy, "Bench", shape, bone_count)
+    bone_list_path = os.path.join(temp_folder, "bone list.txt")
+    with open(bone_list_path, "w") as opened_file:
+        for i in range(1, bone_count, 2):
+            opened_file.write("bone_%03d\n" % i)
+        opened_file.write("nonexisting_bone\n")
+    bpy.context.scene.my_tool.my_bone_list_path = bone_list_path
+    select_bones(bpy, armature_object, ())
+    return bpy.ops.wm.delete_listed_bones
+
+def case_connect_selected_bones(bpy, shape, bone_count, temp_folder):
+    armature_object = build_armature(bpy, "Bench", shape, bone_count)
+    select_bones(bpy, armature_object, {i.name for i in armature_object.data.bones})
+    return bpy.ops.wm.connect_selected_bones
+
+# every bone selected and split into chains where the shape branches, all chains are made in one run
+def case_connect_bone_chains(bpy, shape, bone_count, temp_folder):
+    armature_object = build_armature(bpy, "Bench", shape, bone_count)
+    select_bones(bpy, armature_object, {i.name for i in armature_object.data.bones})
+    bpy.context.scene.my_tool.my_chain_mode = 'chain_DETECT'
+    return bpy.ops.wm.connect_selected_bones
+
+# a chain that was connected and given target bones is connected again, the new bones mustn't take over
+# the link constraints of the bones they're copied from
+def case_reconnect_linked_chain(bpy, shape, bone_count, temp_folder):
+    armature_object = build_armature(bpy, "Bench", shape, bone_count)
+    bone_names = {i.name for i in armature_object.data.bones}
+    select_bones(bpy, armature_object, bone_names)
+    bpy.ops.wm.connect_selected_bones()
+    select_bones(bpy, armature_object, ())
+    bpy.ops.wm.add_target_bones()
+    select_bones(bpy, armature_object, bone_names)
+    return bpy.ops.wm.connect_selected_bones
+
+def case_add_target_bones(bpy, shape, bone_count, temp_folder):
+    armature_object = build_armature(bpy, "Bench", shape, bone_count)
+    select_bones(bpy, armature_object, ())
+    return bpy.ops.wm.add_target_bones
+
+# targets were added before, then a few bones change, only the update is timed
+def case_update_target_bones(bpy, shape, bone_count, temp_folder):
+    armature_object = build_armature(bpy, "Bench", shape, bone_count)
+    select_bones(bpy, armature_object, ())
+    bpy.context.scene.my_tool.my_target_incremental = True
+    bpy.ops.wm.add_target_bones()
+
+    bpy.ops.object.mode_set(mode='EDIT')
+    edit_bones = armature_object.data.edit_bones
+    for i in range(0, bone_count, 10):
+        edit_bone = edit_bones["bone_%03d" % i]
+        edit_bone.tail = (edit_bone.tail[0], edit_bone.tail[1], edit_bone.tail[2] + 0.1)
+    new_bone = edit_bones.new("bone_new")
+    new_bone.tail = (0.0, 0.0, 1.0)
+    bpy.ops.object.mode_set(mode='OBJECT')
+    return bpy.ops.wm.add_target_bones
+
+# targets linked with copy rotation and copy location, only swapping the pairs for copy transforms is timed
+def case_merge_link_constraints(bpy, shape, bone_count, temp_folder):
+    armature_object = build_armature(bpy, "Bench", shape, bone_count)
+    select_bones(bpy, armature_object, ())
+    bpy.context.scene.my_tool.my_target_link_type = 'link_LOCROT'
+    bpy.ops.wm.add_target_bones()
+    return bpy.ops.wm.merge_link_constraints
+
+def case_link_arm_to_weapon_armature(bpy, shape, bone_count, temp_folder):
+    build_armature(bpy, "BenchWeapon", shape, bone_count // 2)
+    base_object = build_armature(bpy, "BenchArms", shape, bone_count)
+    bpy.context.scene.target_arm_armature = base_object.name
+    bpy.context.scene.target_weapon_armature = "BenchWeapon"
+    return bpy.ops.wm.link_arm_to_weapon_armature
+
+def case_set_parent(bpy, shape, bone_count, temp_folder):
+    armature_object = build_armature(bpy, "Bench", shape, bone_count)
+    bpy.context.scene.bone_name = "bone_000"
+    select_bones(bpy, armature_object, {"bone_%03d" % i for i in range(bone_count // 2, bone_count)})
+    return bpy.ops.wm.set_parent
+
+def case_clear_parent(bpy, shape, bone_count, temp_folder):
+    armature_object = build_armature(bpy, "Bench", shape, bone_count)
+    select_bones(bpy, armature_object, {"bone_%03d" % i for i in range(1, bone_count)})
+    return bpy.ops.wm.clear_parent
+
+# operator, setup and the modes it's timed in, fast mode is compared against its operator fallback
+CASES = (
+    ('wm.delete_listed_bones', case_delete_listed_bones, ('fast', 'ops')),
+    ('wm.connect_selected_bones', case_connect_selected_bones, ('fast', 'ops')),
+    ('wm.connect_selected_bones', case_connect_bone_chains, ('detect',)),
+    ('wm.connect_selected_bones', case_reconnect_linked_chain, ('rerun',)),
+    ('wm.add_target_bones', case_add_target_bones, ('fast', 'ops')),
+    ('wm.add_target_bones', case_update_target_bones, ('update',)),
+    ('wm.merge_link_constraints', case_merge_link_constraints, ('fast',)),
+    ('wm.link_arm_to_weapon_armature', case_link_arm_to_weapon_armature, ('fast',)),
+    ('wm.set_parent', case_set_parent, ('fast',)),
+    ('wm.clear_parent', case_clear_parent, ('fast',)),
+)
+
+# cases whose mode calls view3d operators, they need a 3D View to pass their poll
+VIEW3D_CASES = {
+    (case_connect_selected_bones, 'ops'),
+}
+
+
+# ------------------------------------------------------------------------
+#    Runner
+# ------------------------------------------------------------------------
+
+def load_addon():
+    spec = importlib.util.spec_from_file_location("rigging_tools", ADDON_PATH)
+    addon = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(addon)
+    return addon
+
+# context override with a 3D View of an open window, None in background Blender where there are no windows
+def find_view3d_override(bpy):
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == 'VIEW_3D':
+                region = next(i for i in area.regions if i.type == 'WINDOW')
+                return {'window': window, 'screen': window.screen, 'area': area, 'region': region}
+    return None
+
+# link constraints the add-on owns that more than one bone has with the same name and target bone,
+# each owned link is made for one bone so any more are stale copies
+def count_copied_owned_constraints(addon, bpy):
+    seen = set()
+    copied = 0
+    for armature_object in bpy.data.objects:
+        if armature_object.type != 'ARMATURE':
+            continue
+        for pose_bone in armature_object.pose.bones:
+            for constraint in pose_bone.constraints:
+                if not constraint.name.startswith(addon.OWNED_CONSTRAINT_PREFIX):
+                    continue
+                key = (armature_object.name, constraint.name, getattr(constraint.target, "name", None),
+                       constraint.subtarget)
+                if key in seen:
+                    copied += 1
+                seen.add(key)
+    return copied
+
+# runs one case and returns its timing and counts, the stand-in's view3d operators don't need a 3D View
+def run_case(bpy, addon, setup, shape, bone_count, mode, temp_folder, stand_in=False):
+    override = None
+    if (setup, mode) in VIEW3D_CASES and not stand_in:
+        override = find_view3d_override(bpy)
+        if override is None:
+            return {'skipped': "needs a 3D View"}
+
+    clear_scene(bpy)
+    addon.invalidate_bone_index()
+    bpy.context.scene.my_tool.my_use_fast_mode = mode != 'ops'
+    bpy.context.scene.my_tool.my_target_incremental = False
+    bpy.context.scene.my_tool.my_chain_mode = 'chain_SELECTED'
+    bpy.context.scene.my_tool.my_target_link_type = 'link_TRANSFORM'
+    operator = setup(bpy, shape, bone_count, temp_folder)
+
+    # the add-on profiles its own operators, counts and phase times come from that
+    addon.last_profile = None
+    result = {}
+    try:
+        start = time.perf_counter()
+        if override is not None:
+            operator(override)
+        else:
+            operator()
+        result['time'] = time.perf_counter() - start
+    except Exception as error:
+        result['error'] = "%s: %s" % (type(error).__name__, error)
+
+    if addon.last_profile is not None:
+        profile = addon.last_profile.as_dict()
+        result.update(mode_switches=profile["mode_switches"], ops_calls=profile["ops_calls"],
+                      bone_iterations=profile["bone_iterations"], phases=profile["phases"])
+
+    # fast mode and the operator fallback should leave the same number of bones behind
+    result['bones_after'] = sum(len(i.data.bones) for i in bpy.data.objects if i.type == 'ARMATURE')
+
+    copied = count_copied_owned_constraints(addon, bpy)
+    if copied and 'error' not in result:
+        result['error'] = "%d owned link constraints were copied onto other bones" % copied
+
+    return result
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Times the Rigging Tools operators on synthetic armatures.")
+    parser.add_argument("--bones", type=int, nargs='+', default=[50, 150, 300], help="Bone counts to test")
+    parser.add_argument("--shapes", nargs='+', choices=SHAPES, default=list(SHAPES), help="Armature shapes")
+    parser.add_argument("--operators", nargs='+', help="Only time these operators, like wm.add_target_bones")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per case, the fastest is kept")
+    parser.add_argument("--stand-in", action="store_true", help="Use the bpy stand-in even inside Blender")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    stand_in = args.stand_in
+    if not stand_in:
+        try:
+            import bpy
+        except ImportError:
+            stand_in = True
+    if stand_in:
+        bpy = install_stand_in()
+
+    addon = load_addon()
+    addon.register()
+
+    results = []
+    print("%-32s %-6s %-6s %6s %11s %6s %6s %7s %6s" % ("operator", "shape", "mode", "bones", "time (ms)", "modes",
+                                                       "ops", "loops", "after"))
+    with tempfile.TemporaryDirectory() as temp_folder:
+        for idname, setup, modes in CASES:
+            if args.operators and idname not in args.operators:
+                continue
+            for shape in args.shapes:
+                for bone_count in args.bones:
+                    for mode in modes:
+                        runs = [run_case(bpy, addon, setup, shape, bone_count, mode, temp_folder, stand_in)
+                                for i in range(max(1, args.repeat))]
+                        best = min(runs, key=lambda i: i.get('time', math.inf))
+                        result = dict(best, operator=idname, shape=shape, bones=bone_count, mode=mode)
+                        results.append(result)
+
+                        if 'skipped' in result:
+                            timing = "skipped: %s" % result['skipped']
+                        elif 'error' in result:
+                            timing = "failed: %s" % result['error']
+                        else:
+                            timing = "%11.2f %6d %6d %7d %6d" % (result['time'] * 1000.0, result['mode_switches'],
+                                                                 result['ops_calls'], result['bone_iterations'],
+                                                                 result['bones_after'])
+                        print("%-32s %-6s %-6s %6d %s" % (idname, shape, result['mode'], bone_count, timing))
+
+    clear_scene(bpy)
+    addon.unregister()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as opened_file:
+            json.dump(results, opened_file, indent=4)
+
+    return 1 if any('error' in i for i in results) else 0
+
+
+if __name__ == "__main__":
+    # blender passes script arguments after --
+    sys.exit(main(sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]))
@@ -0,0 +1,596 @@
+"""
+Tests for Rigging Tools, run on the bpy stand-in from "rigging benchmark.py" so Blender isn't needed.
+
+    python "rigging tests.py"
+
+The add-on needs NumPy, install it when running without Blender.
+"""
+
+import importlib.util
+import os
+import tempfile
+import unittest
+
+
+BENCHMARK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rigging benchmark.py")
+
+spec = importlib.util.spec_from_file_location("rigging_benchmark", BENCHMARK_PATH)
+benchmark = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(benchmark)
+
+bpy = benchmark.install_stand_in()
+addon = benchmark.load_addon()
+
+
+def setUpModule():
+    addon.register()
+
+def tearDownModule():
+    benchmark.clear_scene(bpy)
+    addon.unregister()
+
+
+# every test starts with an empty scene and default settings
+class RiggingTestCase(unittest.TestCase):
+    def setUp(self):
+        benchmark.clear_scene(bpy)
+        addon.invalidate_bone_index()
+        scene = bpy.context.scene
+        scene.my_tool = type(scene.my_tool)()
+        self.mytool = scene.my_tool
+
+    # replaces an add-on function for the rest of the test
+    def patch(self, name, value):
+        original = getattr(addon, name)
+        setattr(addon, name, value)
+        self.addCleanup(setattr, addon, name, original)
+
+    def last_report(self):
+        return bpy.ops.last_reports[-1]
+
+    # writes a text file that is removed after the test, returns its path
+    def write_file(self, name, text):
+        folder = tempfile.TemporaryDirectory()
+        self.addCleanup(folder.cleanup)
+        path = os.path.join(folder.name, name)
+        with open(path, "w") as opened_file:
+            opened_file.write(text)
+        return path
+
+
+# ------------------------------------------------------------------------
+#    Transactions
+# ------------------------------------------------------------------------
+
+def fail(*args, **kwargs):
+    raise RuntimeError("failed on purpose")
+
+# bones are stored as 32 bit floats in blender, so heads are compared rounded
+def parents_and_heads(bones):
+    return {bone.name: (bone.parent.name if bone.parent else None, tuple(round(i, 5) for i in bone.head))
+            for bone in bones}
+
+class TransactionTests(RiggingTestCase):
+    def test_rollback_restores_rolls_of_parented_bones(self):
+        armature_object = benchmark.build_armature(bpy, "Rig", 'chain', 6)
+        bones = armature_object.data.bones
+        saved = {bone.name: (bone.roll, tuple(bone.head), tuple(bone.tail)) for bone in bones}
+        self.assertTrue(any(bone.parent is not None and bone.roll != 0.0 for bone in bones))
+
+        self.patch("roll_chains", fail)
+        benchmark.select_bones(bpy, armature_object, {bone.name for bone in bones})
+        bpy.ops.wm.connect_selected_bones()
+
+        self.assertEqual(self.last_report()[0], {'ERROR'})
+        self.assertEqual(sorted(bone.name for bone in bones), sorted(saved))
+        for bone in bones:
+            roll, head, tail = saved[bone.name]
+            self.assertAlmostEqual(bone.roll, roll, places=4, msg=bone.name)
+            for i in range(3):
+                self.assertAlmostEqual(bone.head[i], head[i], places=5)
+                self.assertAlmostEqual(bone.tail[i], tail[i], places=5)
+
+    def test_rollback_restores_constraints_in_order(self):
+        armature_object = benchmark.build_armature(bpy, "Rig", 'chain', 3)
+        constraints = armature_object.pose.bones["bone_001"].constraints
+        for constraint_type, subtarget in (('IK', ""), ('COPY_TRANSFORMS', "bone_000"), ('COPY_ROTATION', "bone_002")):
+            constraint = constraints.new(constraint_type)
+            constraint.target = armature_object
+            constraint.subtarget = subtarget
+        saved = [(i.name, i.type, i.subtarget, i.influence) for i in constraints]
+
+        snapshot = addon.ArmatureSnapshot(armature_object, ["bone_001"])
+        constraints[1].name = "RT Target Copy Transforms"
+        constraints[1].subtarget = "bone_002"
+        constraints[1].influence = 0.5
+        constraints.move(0, 2)
+        constraints.remove(constraints["IK"])
+        constraints.new('COPY_LOCATION')
+
+        snapshot.restore_pose_bones()
+        self.assertEqual([(i.name, i.type, i.subtarget, i.influence) for i in constraints], saved)
+
+    # snapshots taken in edit mode read the geometry of edit bones
+    def test_snapshot_in_edit_mode_restores_geometry(self):
+        armature_object = benchmark.build_armature(bpy, "Rig", 'chain', 4)
+        bpy.ops.object.mode_set(mode='EDIT')
+        edit_bones = armature_object.data.edit_bones
+        saved = {bone.name: (bone.roll, tuple(bone.tail)) for bone in edit_bones}
+
+        snapshot = addon.ArmatureSnapshot(armature_object, ["bone_001", "bone_002"])
+        edit_bones["bone_001"].roll = 2.0
+        edit_bones["bone_002"].tail = (1.0, 2.0, 3.0)
+        snapshot.restore_edit_bones()
+
+        for bone in edit_bones:
+            roll, tail = saved[bone.name]
+            self.assertAlmostEqual(bone.roll, roll, places=4, msg=bone.name)
+            for i in range(3):
+                self.assertAlmostEqual(bone.tail[i], tail[i], places=5)
+
+    # only the listed bones, their neighbours and bones constrained to them are saved, that's enough to undo
+    def test_rollback_of_delete_saves_only_affected_bones(self):
+        armature_object = benchmark.build_armature(bpy, "Rig", 'chain', 8)
+        constraint = armature_object.pose.bones["bone_006"].constraints.new('COPY_ROTATION')
+        constraint.target = armature_object
+        constraint.subtarget = "bone_003"
+        bones = armature_object.data.bones
+        saved = parents_and_heads(bones)
+
+        self.mytool.my_bone_list_path = self.write_file("bone list.txt", "bone_003\n")
+        bone_list = addon.load_bone_list(self.mytool.my_bone_list_path)
+        self.assertEqual(addon.delete_snapshot_bones(armature_object, bone_list),
+                         {"bone_002", "bone_003", "bone_004", "bone_006"})
+
+        delete_edit_bones = addon.delete_edit_bones
+        def delete_and_fail(*args, **kwargs):
+            delete_edit_bones(*args, **kwargs)
+            fail()
+        self.patch("delete_edit_bones", delete_and_fail)
+        bpy.ops.wm.delete_listed_bones()
+
+        self.assertEqual(self.last_report()[0], {'ERROR'})
+        self.assertEqual(parents_and_heads(bones), saved)
+        self.assertEqual([(i.type, i.subtarget) for i in armature_object.pose.bones["bone_006"].constraints],
+                         [('COPY_ROTATION', "bone_003")])
+
+
+
+# ------------------------------------------------------------------------
+#    Bone lists
+# ------------------------------------------------------------------------
+
+class BoneListTests(RiggingTestCase):
+    bone_names = ["spine", "hand_l", "hand_r", "finger_01_l", "finger_02_l", "LOD1_spine"]
+
+    def load(self, name, text):
+        return addon.load_bone_list(self.write_file(name, text))
+
+    def test_text_entries_comments_and_patterns(self):
+        bone_list = self.load("bone list.txt", "# comment\n// comment\n\n  spine  \nhand_?\nre:finger_\\d+_l\ngone\n")
+        self.assertEqual(bone_list.match(self.bone_names), {"spine", "hand_l", "hand_r", "finger_01_l", "finger_02_l"})
+        self.assertEqual(bone_list.missing(self.bone_names), {"gone"})
+
+    def test_csv_uses_the_bone_column_of_a_header(self):
+        bone_list = self.load("bone list.csv", "lod,bone\n1,spine\n1,hand_l\n\n2,LOD1_spine\n")
+        self.assertEqual(bone_list.names, {"spine", "hand_l", "LOD1_spine"})
+
+        bone_list = self.load("no header.csv", "spine,1\nhand_r,2\n")
+        self.assertEqual(bone_list.names, {"spine", "hand_r"})
+
+    def test_json_list_or_bones_key(self):
+        self.assertEqual(self.load("list.json", '["spine", "hand_*", 3]').match(self.bone_names),
+                         {"spine", "hand_l", "hand_r"})
+        self.assertEqual(self.load("object.json", '{"bones": ["spine"]}').names, {"spine"})
+        with self.assertRaises(ValueError):
+            self.load("bad.json", '"spine"')
+
+    def test_byte_order_mark_is_skipped(self):
+        path = self.write_file("bom.txt", "")
+        with open(path, "w", encoding="utf-8-sig") as opened_file:
+            opened_file.write("spine\n")
+        self.assertEqual(addon.load_bone_list(path).names, {"spine"})
+
+    # the parsed list is reused until the file changes
+    def test_cache_is_invalidated_when_the_file_changes(self):
+        path = self.write_file("bone list.txt", "spine\n")
+        bone_list = addon.load_bone_list(path)
+        self.assertIs(addon.load_bone_list(path), bone_list)
+
+        with open(path, "w") as opened_file:
+            opened_file.write("spine\nhand_l\n")
+        self.assertEqual(addon.load_bone_list(path).names, {"spine", "hand_l"})
+
+
+
+# ------------------------------------------------------------------------
+#    Bone matching
+# ------------------------------------------------------------------------
+
+class BoneMatchingTests(RiggingTestCase):
+    def setUp(self):
+        super().setUp()
+        addon.link_plan_cache.clear()
+        self.addCleanup(addon.link_plan_cache.clear)
+
+    def test_matcher_remaps_then_strips_one_prefix_and_suffix(self):
+        matcher = addon.BoneNameMatcher(["", "DEF-", "ORG-"], [".L", "_end"], [(r"^ValveBiped\.Bip01_", "bip_")])
+        self.assertEqual(matcher.key("ValveBiped.Bip01_Hand.L"), "bip_Hand")
+        self.assertEqual(matcher.key("DEF-ORG-spine"), "ORG-spine")
+        self.assertEqual(matcher.key("finger_end.L"), "finger_end")
+        self.assertEqual(matcher.index(["DEF-spine", "ORG-spine", "head"]), {"spine": "DEF-spine", "head": "head"})
+
+    # a base bone goes to the first target armature that has it, later matches are conflicts
+    def test_match_report_over_several_targets(self):
+        report = addon.match_bone_names(["hand", "arm", "head"],
+                                        [("Sword", ["hand", "blade"]), ("Shield", ["hand", "arm"])])
+        self.assertEqual(report.pairs, [("Sword", "hand", "hand"), ("Shield", "arm", "arm")])
+        self.assertEqual(report.unmatched_base, {"head"})
+        self.assertEqual(report.unmatched_target, {"Sword": {"blade"}, "Shield": set()})
+        self.assertEqual(report.conflicts, {"hand"})
+
+    # armatures with the same bones and settings reuse the plan, under their own names
+    def test_link_plan_is_reused_for_the_same_bones(self):
+        report = addon.plan_bone_links(["hand", "arm"], [("Sword", ["hand"])])
+        self.patch("match_bone_names", fail)
+
+        reused = addon.plan_bone_links(["hand", "arm"], [("Axe", ["hand"])])
+        self.assertEqual(reused.pairs, [("Axe", "hand", "hand")])
+        self.assertEqual(reused.unmatched_base, report.unmatched_base)
+
+    # any change to the bones, their order or the match settings gives another plan
+    def test_link_plan_key_changes_with_bones_and_settings(self):
+        matcher = addon.BoneNameMatcher()
+        key = addon.link_plan_key(["hand", "arm"], [("Sword", ["hand"])], matcher)
+        self.assertEqual(addon.link_plan_key(["hand", "arm"], [("Axe", ["hand"])], addon.BoneNameMatcher()), key)
+        for other_key in (addon.link_plan_key(["arm", "hand"], [("Sword", ["hand"])], matcher),
+                          addon.link_plan_key(["hand", "arm"], [("Sword", ["hand", "blade"])], matcher),
+                          addon.link_plan_key(["hand", "arm"], [("Sword", ["hand"]), ("Shield", [])], matcher),
+                          addon.link_plan_key(["hand", "arm"], [("Sword", ["hand"])],
+                                              addon.BoneNameMatcher(["DEF-"]))):
+            self.assertNotEqual(other_key, key)
+
+    def test_least_recently_used_plans_are_dropped(self):
+        self.patch("LINK_PLAN_CACHE_SIZE", 2)
+        for name in ("a", "b", "c"):
+            addon.plan_bone_links([name], [("Target", [name])])
+        self.assertEqual(len(addon.link_plan_cache), 2)
+        self.assertNotIn(addon.link_plan_key(["a"], [("Target", ["a"])], addon.BoneNameMatcher()),
+                         addon.link_plan_cache)
+
+
+
+# ------------------------------------------------------------------------
+#    Chains and rolls
+# ------------------------------------------------------------------------
+
+# makes an armature from a dict of bone name to parent name, parents listed before their children
+def build_hierarchy(name, parents):
+    armature_object = benchmark.build_armature(bpy, name, 'chain', 0)
+    bpy.ops.object.mode_set(mode='EDIT')
+    edit_bones = armature_object.data.edit_bones
+    for i, (bone_name, parent_name) in enumerate(parents.items()):
+        edit_bone = edit_bones.new(bone_name)
+        edit_bone.head = edit_bones[parent_name].tail if parent_name else (0.0, 0.0, 0.0)
+        edit_bone.tail = (edit_bone.head[0] + 0.1 * (i % 3), edit_bone.head[1] + 0.1, edit_bone.head[2] + 0.5)
+        if parent_name:
+            edit_bone.parent = edit_bones[parent_name]
+            edit_bone.use_connect = True
+    bpy.ops.object.mode_set(mode='OBJECT')
+    return armature_object
+
+# a hand, each finger is a chain of three bones under the palm
+HAND = dict([("palm", None)] + [("%s_%d" % (finger, i), "palm" if i == 1 else "%s_%d" % (finger, i - 1))
+                                for finger in ("index", "middle", "ring") for i in (1, 2, 3)])
+
+class ChainTests(RiggingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.armature_object = build_hierarchy("Hand", HAND)
+        self.index = addon.get_bone_index(self.armature_object.data)
+
+    def test_selected_bones_are_one_chain_in_selected_order(self):
+        self.assertEqual(addon.get_bone_chains(self.index, ["ring_2", "index_1"], 'chain_SELECTED'),
+                         [["ring_2", "index_1"]])
+        self.assertEqual(addon.get_bone_chains(self.index, [], 'chain_SELECTED'), [])
+
+    # a parent with more than one selected child ends its chain, each child starts one
+    def test_chains_split_where_the_selection_branches(self):
+        chains = addon.get_bone_chains(self.index, list(HAND), 'chain_DETECT')
+        self.assertEqual(chains, [["palm"], ["index_1", "index_2", "index_3"], ["middle_1", "middle_2", "middle_3"],
+                                  ["ring_1", "ring_2", "ring_3"]])
+
+        # bones that aren't selected break chains too
+        self.assertEqual(addon.get_bone_chains(self.index, ["index_1", "index_3", "middle_2"], 'chain_DETECT'),
+                         [["index_1"], ["index_3"], ["middle_2"]])
+
+    def test_subtree_adds_every_bone_below_the_selection(self):
+        self.assertEqual(addon.get_bone_chains(self.index, ["middle_1", "ring_2"], 'chain_SUBTREE'),
+                         [["middle_1", "middle_2", "middle_3"], ["ring_2", "ring_3"]])
+
+    # one run connects every finger, new bones are parented within their own chain and the first keeps the palm
+    def test_connect_builds_every_chain_in_one_run(self):
+        self.mytool.my_chain_mode = 'chain_DETECT'
+        benchmark.select_bones(bpy, self.armature_object, {i for i in HAND if i != "palm"})
+        self.assertEqual(bpy.ops.wm.connect_selected_bones(), {'FINISHED'})
+
+        bones = self.armature_object.data.bones
+        for finger in ("index", "middle", "ring"):
+            self.assertEqual(bones["CTRL-%s_1" % finger].parent.name, "palm")
+            self.assertEqual(bones["CTRL-%s_2" % finger].parent.name, "CTRL-%s_1" % finger)
+            self.assertEqual(bones["CTRL-%s_3" % finger].parent.name, "CTRL-%s_2" % finger)
+
+    # z axes and rolls match blender's, an aligned roll gives back the axis it was aligned to
+    def test_roll_math_matches_edit_bones(self):
+        bpy.ops.object.mode_set(mode='EDIT')
+        edit_bones = self.armature_object.data.edit_bones
+        edit_bones.new("down").tail = (0.0, -1.0, 0.0)
+        for i, edit_bone in enumerate(edit_bones):
+            edit_bone.roll = i * 0.4 - 1.5
+
+        geometry = addon.BoneGeometry(edit_bones)
+        rows = geometry.index(geometry.names)
+        axes = geometry.z_axes(rows)
+        for edit_bone, axis in zip(edit_bones, axes):
+            for i in range(3):
+                self.assertAlmostEqual(axis[i], edit_bone.z_axis[i], places=4, msg=edit_bone.name)
+
+        rolls = geometry.rolls.copy()
+        geometry.rolls[:] = 0.0
+        geometry.align_rolls(rows, axes)
+        for roll, expected in zip(geometry.rolls, rolls):
+            self.assertAlmostEqual(roll, expected, places=4)
+
+    # twist mode carries the first bone's axis down the chain
+    def test_twist_rolls_follow_the_chain(self):
+        bpy.ops.object.mode_set(mode='EDIT')
+        edit_bones = self.armature_object.data.edit_bones
+        chain = ["index_1", "index_2", "index_3"]
+        new_bones = addon.duplicate_edit_bones(edit_bones, chain, "CTRL-")
+        edit_bones["index_2"].roll = 1.0
+        edit_bones["index_3"].roll = -1.0
+
+        geometry = addon.BoneGeometry(edit_bones)
+        addon.roll_chains(geometry, [chain], new_bones, 'roll_TWIST')
+        geometry.write_rolls(edit_bones)
+
+        first_axis = edit_bones["index_1"].z_axis
+        for name in chain:
+            bone_axis = edit_bones[new_bones[name]].z_axis
+            self.assertGreater(sum(i * j for i, j in zip(first_axis, bone_axis)), 0.9, name)
+
+
+
+# ------------------------------------------------------------------------
+#    Target bones
+# ------------------------------------------------------------------------
+
+class TargetBonesTests(RiggingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.mytool.my_target_incremental = True
+        self.armature_object = benchmark.build_armature(bpy, "Rig", 'chain', 4)
+        benchmark.select_bones(bpy, self.armature_object, ())
+
+    def manifest_bones(self):
+        return addon.read_target_manifest(self.armature_object.data)["bones"]
+
+    # changes made in edit mode are only in armature.bones once edit mode is left, the update leaves it first
+    def test_update_from_edit_mode(self):
+        bpy.ops.wm.add_target_bones()
+        bpy.ops.object.mode_set(mode='EDIT')
+        edit_bones = self.armature_object.data.edit_bones
+        edit_bones["bone_001"].tail = (1.0, 1.0, 1.0)
+        edit_bones.new("bone_new").tail = (0.0, 0.0, 1.0)
+
+        bpy.ops.wm.add_target_bones()
+
+        self.assertFalse(self.armature_object.data.is_editmode)
+        bones = self.armature_object.data.bones
+        prefix = self.mytool.my_target_bone_prefix
+        self.assertEqual(self.manifest_bones()["bone_new"], prefix + "bone_new")
+        self.assertEqual(tuple(bones[prefix + "bone_001"].tail_local), tuple(bones["bone_001"].tail_local))
+
+
+    # the diff against the manifest sorts bones into targets to make, keep, move and remove
+    def test_plan_diffs_the_manifest(self):
+        bpy.ops.wm.add_target_bones()
+        prefix = self.mytool.my_target_bone_prefix
+        link_type = self.mytool.my_target_link_type
+
+        bpy.ops.object.mode_set(mode='EDIT')
+        edit_bones = self.armature_object.data.edit_bones
+        edit_bones["bone_002"].tail = (2.0, 0.0, 2.0)
+        edit_bones.new("bone_new").tail = (0.0, 0.0, 1.0)
+        edit_bones.remove(edit_bones["bone_003"])
+        bpy.ops.object.mode_set(mode='OBJECT')
+        addon.invalidate_bone_index(self.armature_object.data)
+
+        plan = addon.plan_target_bones(self.armature_object, prefix, link_type)
+        self.assertEqual(plan.create, ["bone_new"])
+        self.assertEqual(plan.remove, [prefix + "bone_003"])
+        self.assertEqual(sorted(plan.keep), ["bone_000", "bone_001", "bone_002"])
+        self.assertEqual(plan.update, ["bone_002"])
+        self.assertEqual(plan.relink, ["bone_new"])
+
+        # a new prefix replaces every target
+        plan = addon.plan_target_bones(self.armature_object, "NEW-", link_type)
+        self.assertEqual(sorted(plan.remove), [prefix + "bone_%03d" % i for i in range(4)])
+        self.assertEqual(sorted(plan.create), ["bone_000", "bone_001", "bone_002", "bone_new"])
+
+    # a full run reuses the targets the manifest has and never gives targets targets of their own
+    def test_incremental_full_incremental(self):
+        bpy.ops.wm.add_target_bones()
+        bone_names = sorted(bone.name for bone in self.armature_object.data.bones)
+        manifest = self.manifest_bones()
+
+        self.mytool.my_target_incremental = False
+        bpy.ops.wm.add_target_bones()
+        self.assertEqual(sorted(bone.name for bone in self.armature_object.data.bones), bone_names)
+        self.assertEqual(self.manifest_bones(), manifest)
+
+        self.mytool.my_target_incremental = True
+        bpy.ops.wm.add_target_bones()
+        self.assertEqual(sorted(bone.name for bone in self.armature_object.data.bones), bone_names)
+        self.assertEqual(self.manifest_bones(), manifest)
+        for source, target in manifest.items():
+            constraints = self.armature_object.pose.bones[source].constraints
+            self.assertEqual([(i.type, i.subtarget) for i in constraints], [('COPY_TRANSFORMS', target)])
+
+
+    # an update that changes nothing trusts the manifest and doesn't look at link constraints
+    def test_unchanged_update_skips_link_checks(self):
+        bpy.ops.wm.add_target_bones()
+        self.patch("has_target_links", fail)
+
+        bpy.ops.wm.add_target_bones()
+        self.assertEqual(self.last_report()[0], {'INFO'})
+
+
+
+# ------------------------------------------------------------------------
+#    Recipes
+# ------------------------------------------------------------------------
+
+def recipe_part(name, mode, **flags):
+    return addon.RecipePart(name, mode, None, **flags)
+
+# names, parents and constraints of every bone
+def describe_bones(armature_object):
+    return {bone.name: (bone.parent.name if bone.parent else None,
+                        [(i.name, i.subtarget) for i in armature_object.pose.bones[bone.name].constraints])
+            for bone in armature_object.data.bones}
+
+class RecipeTests(RiggingTestCase):
+    def scheduled(self, parts):
+        return [(part.step, part.mode) for part in addon.schedule_recipe_parts(parts)]
+
+    # edit parts move before pose parts of earlier steps so edit mode is entered once
+    def test_edit_parts_run_together(self):
+        parts = [recipe_part("connect", 'EDIT'), recipe_part("connect", 'POSE'), recipe_part("set parent", 'EDIT')]
+        self.assertEqual(self.scheduled(parts),
+                         [("connect", 'EDIT'), ("set parent", 'EDIT'), ("connect", 'POSE')])
+
+    # unless the pose part reads bone names, or the edit part removes bones
+    def test_parts_that_depend_on_bones_keep_their_order(self):
+        parts = [recipe_part("delete", 'POSE', reads_bones=True), recipe_part("connect", 'EDIT')]
+        self.assertEqual(self.scheduled(parts), [("delete", 'POSE'), ("connect", 'EDIT')])
+
+        parts = [recipe_part("connect", 'POSE'), recipe_part("delete", 'EDIT', removes_bones=True)]
+        self.assertEqual(self.scheduled(parts), [("connect", 'POSE'), ("delete", 'EDIT')])
+
+    # a recorded run played on another armature gives the same bones, parents and constraints,
+    # the parent step uses a bone the connect step before it made
+    def test_recorded_steps_replay_in_order(self):
+        recorded = benchmark.build_armature(bpy, "Recorded", 'chain', 5)
+        self.mytool.my_record_recipe = True
+        addon.recorded_steps.clear()
+        self.addCleanup(addon.recorded_steps.clear)
+
+        benchmark.select_bones(bpy, recorded, {"bone_000", "bone_001", "bone_002"})
+        bpy.ops.wm.connect_selected_bones()
+        benchmark.select_bones(bpy, recorded, {"bone_004"})
+        bpy.context.scene.bone_name = "CTRL-bone_002"
+        bpy.ops.wm.set_parent()
+        benchmark.select_bones(bpy, recorded, {"bone_003"})
+        bpy.ops.wm.clear_parent()
+        self.assertEqual([i["operator"] for i in addon.recorded_steps],
+                         ["wm.connect_selected_bones", "wm.set_parent", "wm.clear_parent"])
+
+        self.mytool.my_record_recipe = False
+        self.mytool.my_recipe_path = self.write_file("recipe.json", "")
+        bpy.ops.wm.save_recipe()
+        played = benchmark.build_armature(bpy, "Played", 'chain', 5)
+        bpy.ops.wm.play_recipe()
+
+        self.assertEqual(describe_bones(played), describe_bones(recorded))
+        self.assertEqual(played.data.bones["bone_004"].parent.name, "CTRL-bone_002")
+        self.assertIsNone(played.data.bones["bone_003"].parent)
+
+
+
+# ------------------------------------------------------------------------
+#    Link constraints
+# ------------------------------------------------------------------------
+
+class LinkConstraintTests(RiggingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.base_object = benchmark.build_armature(bpy, "Arm", 'chain', 3)
+        self.weapon_object = benchmark.build_armature(bpy, "Weapon", 'chain', 3)
+        self.other_object = benchmark.build_armature(bpy, "Other", 'chain', 3)
+        self.constraints = self.base_object.pose.bones["bone_001"].constraints
+
+    def link(self, target_object):
+        scene = bpy.context.scene
+        scene.target_arm_armature = self.base_object.name
+        scene.target_weapon_armature = target_object.name
+        bpy.ops.wm.link_arm_to_weapon_armature()
+
+    def add_constraint(self, target_object):
+        constraint = self.constraints.new('COPY_TRANSFORMS')
+        constraint.target = target_object
+        constraint.subtarget = "bone_001"
+        return constraint
+
+    # a constraint that is exactly the planned link is taken over instead of doubled
+    def test_planned_link_is_taken_over(self):
+        self.add_constraint(self.weapon_object)
+        self.link(self.weapon_object)
+        self.assertEqual([(i.name, i.target) for i in self.constraints],
+                         [(addon.owned_constraint_name("Weapon", 'COPY_TRANSFORMS'), self.weapon_object)])
+
+    # constraints the user made to other armatures stay, also on runs that replace the links
+    def test_user_links_are_left_alone(self):
+        user_constraint = self.add_constraint(self.other_object)
+        self.link(self.weapon_object)
+        self.link(self.weapon_object)
+
+        self.assertEqual(sorted((i.name, i.target.name) for i in self.constraints),
+                         [("Copy Transforms", "Other"),
+                          (addon.owned_constraint_name("Weapon", 'COPY_TRANSFORMS'), "Weapon")])
+        self.assertIs(self.constraints["Copy Transforms"], user_constraint)
+
+    # the operator fallback of connect adds the same tagged link constraints as the fast path, directly
+    def test_connect_fallback_adds_owned_link_constraints(self):
+        armature_object = benchmark.build_armature(bpy, "Rig", 'chain', 3)
+        self.mytool.my_use_fast_mode = False
+        self.mytool.my_link_bones = True
+        self.mytool.my_link_type = 'link_LOCROT'
+        constraint_add_with_targets = bpy.ops.pose.constraint_add_with_targets
+        bpy.ops.pose.constraint_add_with_targets = fail
+        self.addCleanup(setattr, bpy.ops.pose, "constraint_add_with_targets", constraint_add_with_targets)
+
+        benchmark.select_bones(bpy, armature_object, {bone.name for bone in armature_object.data.bones})
+        self.assertEqual(bpy.ops.wm.connect_selected_bones(), {'FINISHED'})
+
+        prefix = self.mytool.my_new_bone_prefix
+        for name in ("bone_000", "bone_001", "bone_002"):
+            constraints = armature_object.pose.bones[name].constraints
+            self.assertEqual([(i.name, i.subtarget) for i in constraints],
+                             [(addon.owned_constraint_name("Chain", 'COPY_ROTATION'), prefix + name),
+                              (addon.owned_constraint_name("Chain", 'COPY_LOCATION'), prefix + name)])
+
+
+
+# ------------------------------------------------------------------------
+#    Pose cost
+# ------------------------------------------------------------------------
+
+class PoseCostTests(RiggingTestCase):
+    # nothing is animated, every sampled frame still evaluates the armatures and the frame is put back
+    def test_measure_evaluates_armatures_on_every_frame(self):
+        armature_object = benchmark.build_armature(bpy, "Rig", 'chain', 3)
+        self.mytool.my_pose_cost_frames = 4
+        scene = bpy.context.scene
+        scene.frame_current = 7
+
+        bpy.ops.wm.measure_pose_cost()
+
+        self.assertEqual(armature_object.evaluations, 4)
+        self.assertEqual(len(addon.last_pose_cost.frame_times), 4)
+        self.assertEqual(scene.frame_current, 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
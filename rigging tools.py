@@ -11,8 +11,26 @@ bl_info = {
     "category": "Development"
 }
 
+import collections
+import contextlib
+import csv
+import fnmatch
+import functools
+import hashlib
+import itertools
+import json
+import os
+import re
+import threading
+import time
+import types
+
 import bpy
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
 
+from bpy.app.handlers import persistent
 from bpy.props import (StringProperty,
                        BoolProperty,
                        IntProperty,
@@ -20,6 +38,7 @@ from bpy.props import (StringProperty,
                        FloatVectorProperty,
                        EnumProperty,
                        PointerProperty,
+                       CollectionProperty,
                        )
 from bpy.types import (Panel,
                        Menu,
@@ -32,6 +51,10 @@ from bpy.types import (Panel,
 #    Scene Properties
 # ------------------------------------------------------------------------
 
+# an armature object name for the armature searches
+class ArmatureName(PropertyGroup):
+    pass
+
 class MyProperties(PropertyGroup):
     my_bool: BoolProperty(
         name="Enable or Disable",
@@ -63,6 +86,54 @@ class MyProperties(PropertyGroup):
         default=False
     )
 
+    my_use_fast_mode: BoolProperty(
+        name="Fast Mode",
+        description="Edits bones with bone data in one edit session instead of operators",
+        default=True
+    )
+
+    my_batch_mode: EnumProperty(
+        name="Run On:",
+        description="Armatures the tools run on, when linking armatures these are extra target armatures",
+        items=[('batch_ACTIVE', "Active", "Only the active armature"),
+               ('batch_SELECTED', "Selected", "Every selected armature"),
+               ('batch_COLLECTION', "Collection", "Every armature in a collection"),
+               ]
+    )
+
+    my_batch_collection: PointerProperty(
+        name="Collection",
+        description="Collection whose armatures get processed",
+        type=bpy.types.Collection
+    )
+
+    my_target_incremental: BoolProperty(
+        name="Only Changes",
+        description="Only adds, updates or removes target bones of bones that changed since the last run, "
+                    "turn off to relink every bone to its target",
+        default=True
+    )
+
+    my_reparent_orphans: BoolProperty(
+        name="Reparent Children",
+        description="Parents children of deleted bones to the nearest bone that isn't deleted, "
+                    "instead of clearing their parent",
+        default=True
+    )
+
+    my_record_recipe: BoolProperty(
+        name="Record",
+        description="Records every Rigging Tools operator that runs, with its settings, as a recipe step",
+        default=False
+    )
+
+    my_show_preview: BoolProperty(
+        name="Preview",
+        description="Highlights the bones Delete Listed Bones would delete and Link Bones from Armatures "
+                    "would constrain in the viewport, without running them",
+        default=False
+    )
+
     my_int: IntProperty(
         name="Int Value",
         description="A integer property",
@@ -116,6 +187,11 @@ class MyProperties(PropertyGroup):
         maxlen=1024,
     )
 
+    # armature objects of the scene, refilled by a timer when they change instead of on every redraw
+    my_armature_names: CollectionProperty(
+        type=ArmatureName
+    )
+
     my_bone_list_path: StringProperty(
         name="Bone List:",
         description="Choose a directory:",
@@ -124,6 +200,61 @@ class MyProperties(PropertyGroup):
         subtype='FILE_PATH'
     )
 
+    my_link_strip_prefixes: StringProperty(
+        name="Strip Prefixes",
+        description="Comma separated prefixes ignored when matching bone names between armatures",
+        default="",
+        maxlen=1024,
+    )
+
+    my_link_strip_suffixes: StringProperty(
+        name="Strip Suffixes",
+        description="Comma separated suffixes ignored when matching bone names between armatures",
+        default="",
+        maxlen=1024,
+    )
+
+    my_link_remap_path: StringProperty(
+        name="Remap Table:",
+        description="CSV or JSON file of regex and replacement pairs applied to bone names before matching",
+        default="",
+        maxlen=1024,
+        subtype='FILE_PATH'
+    )
+
+    my_pose_cost_frames: IntProperty(
+        name="Frames",
+        description="How many frames the armatures are evaluated for when measuring pose cost",
+        default=24,
+        min=1,
+        max=1000
+    )
+
+    my_link_plan_cache_path: StringProperty(
+        name="Plan Cache:",
+        description="JSON file matched bone pairs are kept in between sessions, "
+                    "leave empty to only keep them until Blender closes",
+        default="",
+        maxlen=1024,
+        subtype='FILE_PATH'
+    )
+
+    my_profile_log_path: StringProperty(
+        name="Profile Log:",
+        description="File every operator profile is added to as a line of JSON, leave empty to not log",
+        default="",
+        maxlen=1024,
+        subtype='FILE_PATH'
+    )
+
+    my_recipe_path: StringProperty(
+        name="Recipe:",
+        description="JSON recipe file recorded steps are saved to and played from",
+        default="",
+        maxlen=1024,
+        subtype='FILE_PATH'
+    )
+
     my_target_bone_prefix: StringProperty(
         name="Bone Prefix:",
         description="The prefix that gets added to the target bones",
@@ -148,6 +279,35 @@ class MyProperties(PropertyGroup):
                ]
     )
 
+    my_chain_mode: EnumProperty(
+        name="Chains:",
+        description="Which chains new bones are made for",
+        items=[('chain_SELECTED', "Selected", "One chain of the selected bones in order"),
+               ('chain_DETECT', "Detect", "Splits the selected bones into chains, a new chain starts where bones branch"),
+               ('chain_SUBTREE', "Subtree", "Splits the selected bones and every bone below them into chains"),
+               ]
+    )
+
+    my_roll_mode: EnumProperty(
+        name="Roll:",
+        description="How the roll of new bones is set",
+        items=[('roll_SOURCE', "Match Source", "Same roll as the bone each new bone is made from"),
+               ('roll_TWIST', "Minimize Twist", "Roll of the first bone is matched, "
+                                                "the rest follow it along the chain with as little twist as they can"),
+               ('roll_GLOBAL_X', "Global X", "Points the Z axis of new bones along global X"),
+               ('roll_GLOBAL_Y', "Global Y", "Points the Z axis of new bones along global Y"),
+               ('roll_GLOBAL_Z', "Global Z", "Points the Z axis of new bones along global Z"),
+               ]
+    )
+
+    my_set_parent_type: EnumProperty(
+        name="Set Parent Type:",
+        description="Keeps selected bones where they are, or connects them which moves them to the parent's tail",
+        items=[('parent_OFFSET', "Keep Offset", ""),
+               ('parent_CONNECTED', "Connected", ""),
+               ]
+    )
+
     my_link_type: EnumProperty(
         name="Link Type:",
         description="Links using parenting or constraints",
@@ -178,83 +338,2664 @@ class MyProperties(PropertyGroup):
 #    Fuctions
 # ------------------------------------------------------------------------
 
+# how long each phase of an operator took and how many operators and bone loops it ran
+class OperatorProfile:
+    def __init__(self, operator):
+        self.operator = operator
+        self.started = time.time()
+        self.time = 0.0
+        # phase name to seconds, in the order phases first ran
+        self.phases = {}
+        self.mode_switches = 0
+        self.ops_calls = 0
+        self.bone_iterations = 0
+
+    def as_dict(self):
+        return {
+            "operator": self.operator,
+            "started": self.started,
+            "time": self.time,
+            "phases": dict(self.phases),
+            "mode_switches": self.mode_switches,
+            "ops_calls": self.ops_calls,
+            "bone_iterations": self.bone_iterations,
+        }
+
+# profile of the operator that is running, and of the last one that finished for the panel
+current_profile = None
+last_profile = None
+
+# bpy.ops that counts calls towards the running operator's profile, mode_set separately from the rest
+# only calls made while an operator is profiled are counted, bpy itself is left alone
+class ProfiledOps:
+    def __init__(self, submodule=None):
+        self.submodule = submodule
+
+    def __getattr__(self, name):
+        if self.submodule is None:
+            return ProfiledOps(name)
+
+        operator = getattr(getattr(bpy.ops, self.submodule), name)
+        counts_mode = self.submodule == 'object' and name == 'mode_set'
+
+        def call(*args, **kwargs):
+            if current_profile is not None:
+                if counts_mode:
+                    current_profile.mode_switches += 1
+                else:
+                    current_profile.ops_calls += 1
+            return operator(*args, **kwargs)
+        return call
+
+# operator calls in this file go through this so profiled operators can count them
+profiled_ops = ProfiledOps()
+
+# times a phase of the running operator, phases that run more than once add up
+@contextlib.contextmanager
+def profile_phase(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if current_profile is not None:
+            current_profile.phases[name] = current_profile.phases.get(name, 0.0) + time.perf_counter() - start
+
+# counts bones a loop of the running operator goes over
+def count_bone_iterations(count):
+    if current_profile is not None:
+        current_profile.bone_iterations += count
+
+# adds a profile to the log as one line of JSON
+def write_profile_log(path, profile):
+    with open(bpy.path.abspath(path), "a", encoding="utf-8") as opened_file:
+        opened_file.write(json.dumps(profile.as_dict()) + "\n")
+
+# decorator for operator execute methods, profiles the run and keeps it for the panel
+def profiled(execute):
+    @functools.wraps(execute)
+    def wrapper(self, context):
+        global current_profile, last_profile
+
+        # operators called by a profiled operator count towards its profile
+        if current_profile is not None:
+            return execute(self, context)
+
+        profile = OperatorProfile(self.bl_label)
+        current_profile = profile
+        start = time.perf_counter()
+        try:
+            return execute(self, context)
+        finally:
+            profile.time = time.perf_counter() - start
+            current_profile = None
+            last_profile = profile
+
+            log_path = context.scene.my_tool.my_profile_log_path
+            if log_path:
+                try:
+                    write_profile_log(log_path, profile)
+                except OSError as error:
+                    self.report({'WARNING'}, "Couldn't write profile log: %s" % error)
+
+    return wrapper
+
 # get selected bones
 def get_selected_bones():
     return [obj.name for obj in bpy.context.selected_bones]
 
+# names, parents and children of every bone in an armature
+class BoneIndex:
+    def __init__(self, bones):
+        self.names = []
+        self.parents = {}
+        self.children = {}
+
+        for bone in bones:
+            parent = bone.parent.name if bone.parent else None
+            self.names.append(bone.name)
+            self.parents[bone.name] = parent
+            self.children.setdefault(bone.name, [])
+            if parent is not None:
+                self.children.setdefault(parent, []).append(bone.name)
+
+        self.name_set = set(self.names)
+
+    def __contains__(self, name):
+        return name in self.name_set
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def roots(self):
+        return [i for i in self.names if self.parents[i] is None]
+
+    # parent, grandparent and so on up to the root
+    def ancestors(self, name):
+        parent = self.parents.get(name)
+        while parent is not None:
+            yield parent
+            parent = self.parents.get(parent)
+
+    # every bone below this one, parents before children
+    def descendants(self, name):
+        stack = list(reversed(self.children.get(name, [])))
+        while stack:
+            child = stack.pop()
+            yield child
+            stack.extend(reversed(self.children.get(child, [])))
+
+# bone indexes by armature datablock, cleared by the depsgraph handler when an armature changes
+bone_index_cache = {}
+
+# gets the bone index of an armature without changing mode or selection
+# in edit mode the index is read from edit bones and isn't cached since they change without updates
+def get_bone_index(armature):
+    if armature.is_editmode:
+        return BoneIndex(armature.edit_bones)
+
+    key = armature.as_pointer()
+    bone_index = bone_index_cache.get(key)
+    if bone_index is None:
+        bone_index = bone_index_cache[key] = BoneIndex(armature.bones)
+    return bone_index
+
+# removes an armature from the bone index cache, used right after bones are added or removed
+def invalidate_bone_index(armature=None):
+    if armature is None:
+        bone_index_cache.clear()
+    else:
+        bone_index_cache.pop(armature.as_pointer(), None)
+
+# (identifier, name, description) items of armature objects by scene, for the armature searches,
+# kept here until the depsgraph handler finds their scene changed
+search_items_cache = {}
+
+# object count of each scene when its armature items were read, so selection updates don't re-read them
+scene_object_counts = {}
+
+# armature objects in a scene
+def get_armature_items(scene):
+    key = ('ARMATURE', scene.as_pointer())
+    items = search_items_cache.get(key)
+    if items is None:
+        items = search_items_cache[key] = [(ob.name, ob.name, "") for ob in scene.objects if ob.type == 'ARMATURE']
+        scene_object_counts[key] = len(scene.objects)
+    return items
+
+# forgets the armature items of a scene and refills the scene's armature search from a timer,
+# properties can't be written from depsgraph handlers
+def invalidate_armature_items(scene=None):
+    if scene is None:
+        search_items_cache.clear()
+    else:
+        search_items_cache.pop(('ARMATURE', scene.as_pointer()), None)
+
+    if not bpy.app.timers.is_registered(sync_armature_names):
+        bpy.app.timers.register(sync_armature_names)
+
+def sync_armature_names():
+    for scene in bpy.data.scenes:
+        arma_upd(scene.my_tool, bpy.context)
+
+# true when objects were added to or removed from a scene, or an armature object was renamed
+def armature_items_changed(scene, data):
+    key = ('ARMATURE', scene.as_pointer())
+    items = search_items_cache.get(key)
+    if items is None:
+        return True
+    if isinstance(data, bpy.types.Object):
+        return data.type == 'ARMATURE' and not any(i[0] == data.name for i in items)
+    return scene_object_counts.get(key) != len(scene.objects)
+
+@persistent
+def bone_index_depsgraph_update(scene, depsgraph):
+    for update in depsgraph.updates:
+        data = update.id.original
+        if isinstance(data, (bpy.types.Scene, bpy.types.Collection, bpy.types.Object)) and \
+                armature_items_changed(scene, data):
+            invalidate_armature_items(scene)
+        if isinstance(data, bpy.types.Object):
+            data = data.data
+        if isinstance(data, bpy.types.Armature):
+            invalidate_bone_index(data)
+
+@persistent
+def bone_index_load_post(dummy):
+    invalidate_bone_index()
+    invalidate_armature_items()
+
 # get all bones
 def get_all_bones():
-    bpy.ops.object.mode_set(mode='EDIT')
-    bpy.ops.armature.select_all(action='SELECT')
-    all_bones = get_selected_bones()
-    bpy.ops.armature.select_all(action='DESELECT')
-    return all_bones
+    return list(get_bone_index(bpy.context.active_object.data).names)
+
+# get selected edit bones of one armature, works when several armatures are in edit mode
+def get_selected_edit_bones(armature):
+    return [bone.name for bone in armature.edit_bones
+            if bone.select and not bone.hide and
+            any(i and j for i, j in zip(bone.layers, armature.layers))]
+
+# get selected bones of one armature in any mode
+def get_selected_bone_names(armature):
+    if armature.is_editmode:
+        return get_selected_edit_bones(armature)
+    return [bone.name for bone in armature.bones
+            if bone.select and not bone.hide and
+            any(i and j for i, j in zip(bone.layers, armature.layers))]
+
+# armatures the batch operators run on, the active one, the selected ones or a collection's
+def get_batch_armatures(context):
+    mytool = context.scene.my_tool
+    active_object = context.view_layer.objects.active
+
+    if mytool.my_batch_mode == 'batch_SELECTED':
+        objects = [active_object] + list(context.selected_objects)
+    elif mytool.my_batch_mode == 'batch_COLLECTION' and mytool.my_batch_collection is not None:
+        objects = list(mytool.my_batch_collection.all_objects)
+    else:
+        objects = [active_object]
+
+    # only armatures that can go into edit mode from this view layer
+    view_layer_objects = context.view_layer.objects
+    armatures = []
+    for ob in objects:
+        if ob is not None and ob.type == 'ARMATURE' and ob not in armatures and \
+                ob.name in view_layer_objects and ob.visible_get():
+            armatures.append(ob)
+    return armatures
+
+# batches always use bone data since the operator fallbacks only work on the active armature
+def use_fast_mode(mytool):
+    return mytool.my_use_fast_mode or mytool.my_batch_mode != 'batch_ACTIVE'
+
+# puts every armature in the batch into a mode with a single mode switch using multi object editing
+def set_batch_mode(context, armatures, mode):
+    view_layer = context.view_layer
+    if view_layer.objects.active is not None and view_layer.objects.active.mode != 'OBJECT':
+        profiled_ops.object.mode_set(mode='OBJECT')
+
+    # other selected armatures would join the mode switch, anything else can stay selected
+    for ob in context.selected_objects:
+        if ob.type == 'ARMATURE' and ob not in armatures:
+            ob.select_set(False)
+    for ob in armatures:
+        ob.select_set(True)
+    if view_layer.objects.active not in armatures:
+        view_layer.objects.active = armatures[0]
+
+    profiled_ops.object.mode_set(mode=mode)
+
+# names of the selected objects and of the active one with its mode, so a batch can put them back
+def save_object_selection(context):
+    active_object = context.view_layer.objects.active
+    if active_object is None:
+        return [ob.name for ob in context.selected_objects], None, 'OBJECT'
+    return [ob.name for ob in context.selected_objects], active_object.name, active_object.mode
+
+# puts back the selection set_batch_mode changed, objects the batch removed are skipped
+# armatures the batch ran on stay selected while the active object is still one of them,
+# since they're in its mode, if the batch made another object active it goes back to the old one and its mode
+def restore_object_selection(context, selection):
+    selected_names, active_name, mode = selection
+    view_layer = context.view_layer
+    active_object = view_layer.objects.active
+    previous_active = view_layer.objects.get(active_name) if active_name is not None else None
+
+    if previous_active is not None and previous_active != active_object:
+        if active_object is not None and active_object.mode != 'OBJECT':
+            profiled_ops.object.mode_set(mode='OBJECT')
+        for ob in context.selected_objects:
+            if ob.name not in selected_names:
+                ob.select_set(False)
+        view_layer.objects.active = previous_active
+        if mode != 'OBJECT':
+            try:
+                profiled_ops.object.mode_set(mode=mode)
+            except RuntimeError:
+                pass
+
+    for name in selected_names:
+        ob = view_layer.objects.get(name)
+        if ob is not None:
+            ob.select_set(True)
+
+# deselect all bones without operators
+def deselect_all_bones(armature):
+    for bone in armature.bones:
+        bone.select = False
+        bone.select_head = False
+        bone.select_tail = False
+
+# edit bone settings copied onto duplicated bones
+EDIT_BONE_ATTRIBUTES = (
+    "head",
+    "tail",
+    "roll",
+    "use_deform",
+    "use_inherit_rotation",
+    "inherit_scale",
+    "use_local_location",
+    "use_relative_parent",
+    "use_envelope_multiply",
+    "envelope_distance",
+    "envelope_weight",
+    "head_radius",
+    "tail_radius",
+    "bbone_segments",
+    "bbone_x",
+    "bbone_z",
+    "layers",
+    "show_wire",
+)
+
+# pose bone settings copied onto duplicated bones
+POSE_BONE_ATTRIBUTES = (
+    "rotation_mode",
+    "custom_shape",
+    "custom_shape_scale",
+    "custom_shape_transform",
+    "use_custom_shape_bone_size",
+    "bone_group",
+    "lock_location",
+    "lock_rotation",
+    "lock_rotation_w",
+    "lock_scale",
+    "ik_stretch",
+)
+
+# edit bone settings that foreach_get and foreach_set can copy, with their type and values per bone
+# the rest of EDIT_BONE_ATTRIBUTES are enums and get copied one bone at a time
+EDIT_BONE_ARRAYS = {
+    "head": (np.float32, 3),
+    "tail": (np.float32, 3),
+    "roll": (np.float32, 1),
+    "use_deform": (bool, 1),
+    "use_inherit_rotation": (bool, 1),
+    "use_local_location": (bool, 1),
+    "use_relative_parent": (bool, 1),
+    "use_envelope_multiply": (bool, 1),
+    "envelope_distance": (np.float32, 1),
+    "envelope_weight": (np.float32, 1),
+    "head_radius": (np.float32, 1),
+    "tail_radius": (np.float32, 1),
+    "bbone_segments": (np.int32, 1),
+    "bbone_x": (np.float32, 1),
+    "bbone_z": (np.float32, 1),
+    "layers": (bool, 32),
+    "show_wire": (bool, 1),
+    "select": (bool, 1),
+    "select_head": (bool, 1),
+    "select_tail": (bool, 1),
+}
+
+# copies settings of edit bones onto other edit bones in bulk, takes a dict of source name to target name
+# copied bones end up deselected
+def copy_edit_bone_attributes(edit_bones, bone_names):
+    indices = {bone.name: i for i, bone in enumerate(edit_bones)}
+    sources = np.array([indices[i] for i in bone_names], dtype=np.int64)
+    targets = np.array([indices[i] for i in bone_names.values()], dtype=np.int64)
+    count = len(indices)
+
+    for attr, (dtype, size) in EDIT_BONE_ARRAYS.items():
+        values = np.empty(count * size, dtype=dtype)
+        edit_bones.foreach_get(attr, values)
+        values = values.reshape(count, size)
+        if attr.startswith("select"):
+            values[targets] = False
+        else:
+            values[targets] = values[sources]
+        edit_bones.foreach_set(attr, values.ravel())
+
+    count_bone_iterations(len(bone_names))
+    for source_name, target_name in bone_names.items():
+        source = edit_bones[source_name]
+        target = edit_bones[target_name]
+        for attr in EDIT_BONE_ATTRIBUTES:
+            if attr not in EDIT_BONE_ARRAYS and hasattr(source, attr):
+                setattr(target, attr, getattr(source, attr))
+
+# duplicates edit bones with a prefix, returns a dict of old name to new name
+# new bones are named prefix + name, if that is taken blender adds a number suffix and the dict has
+# the name it got, so later steps should always look bones up through the dict
+# works like armature.duplicate, children of duplicated bones follow their duplicated parent
+# unless keep_hierarchy is off, then every duplicate keeps the original parent
+def duplicate_edit_bones(edit_bones, bone_names, bone_prefix, keep_hierarchy=True):
+    new_names = {}
+
+    count_bone_iterations(2 * len(bone_names))
+    for i in bone_names:
+        new_names[i] = edit_bones.new(bone_prefix + i).name
+
+    copy_edit_bone_attributes(edit_bones, new_names)
+
+    # parents after every bone exists since selection order isn't hierarchy order
+    for i in bone_names:
+        source = edit_bones[i]
+        new_bone = edit_bones[new_names[i]]
+        if source.parent is None:
+            continue
+        if keep_hierarchy and source.parent.name in new_names:
+            new_bone.parent = edit_bones[new_names[source.parent.name]]
+        else:
+            new_bone.parent = source.parent
+        new_bone.use_connect = source.use_connect
+
+    return new_names
+
+# how many new bones didn't get prefix + name because it was taken
+def count_renamed_bones(new_names, bone_prefix):
+    return sum(1 for old_name, new_name in new_names.items() if new_name != bone_prefix + old_name)
+
+# copies pose bone settings and constraints onto duplicated bones, needs pose or object mode
+def copy_pose_bones(armature_object, new_names):
+    pose_bones = armature_object.pose.bones
+
+    count_bone_iterations(len(new_names))
+    for old_name, new_name in new_names.items():
+        source = pose_bones[old_name]
+        target = pose_bones[new_name]
+        for attr in POSE_BONE_ATTRIBUTES:
+            if hasattr(source, attr):
+                setattr(target, attr, getattr(source, attr))
+
+        for constraint in source.constraints:
+            # link constraints the add-on owns belong to the source bone, the duplicate gets its own when linked
+            if constraint.name.startswith(OWNED_CONSTRAINT_PREFIX):
+                continue
+            new_constraint = target.constraints.copy(constraint)
+
+            # points constraints at duplicated bones like armature.duplicate does
+            if getattr(new_constraint, "target", None) == armature_object and \
+                    new_constraint.subtarget in new_names:
+                new_constraint.subtarget = new_names[new_constraint.subtarget]
+
+# z axes of bones with no roll pointing along directions, same as blender's vec_roll_to_mat3
+def zero_roll_z_axes(directions):
+    x, y, z = directions[:, 0], directions[:, 1], directions[:, 2]
+    theta = 1.0 + y
+    theta_alt = x * x + z * z
+
+    # bones pointing almost straight down -y use a series so theta doesn't go to zero
+    near_down = theta <= 6.1e-3
+    theta = np.where(near_down, theta_alt * 0.5 + theta_alt * theta_alt * 0.125, theta)
+    flipped = near_down & (theta_alt <= 2.5e-4 * 2.5e-4)
+    theta[flipped] = 1.0
+
+    axes = np.stack((-x * z / theta, -z, 1.0 - z * z / theta), axis=1)
+    axes[flipped] = (0.0, 0.0, 1.0)
+    return axes
+
+# heads, tails and rolls of every edit bone, read and written in bulk with foreach_get and foreach_set
+# rows are in edit_bones order
+class BoneGeometry:
+    def __init__(self, edit_bones):
+        self.names = [i.name for i in edit_bones]
+        self.indices = {name: i for i, name in enumerate(self.names)}
+        self.parents = np.array([self.indices[i.parent.name] if i.parent else -1 for i in edit_bones],
+                                dtype=np.int64)
+
+        count = len(self.names)
+        self.heads = np.empty(count * 3, dtype=np.float32)
+        self.tails = np.empty(count * 3, dtype=np.float32)
+        self.rolls = np.empty(count, dtype=np.float32)
+        self.connected = np.empty(count, dtype=bool)
+
+        edit_bones.foreach_get("head", self.heads)
+        edit_bones.foreach_get("tail", self.tails)
+        edit_bones.foreach_get("roll", self.rolls)
+        edit_bones.foreach_get("use_connect", self.connected)
+
+        self.heads = self.heads.reshape(count, 3)
+        self.tails = self.tails.reshape(count, 3)
+
+    # row numbers of bones by name
+    def index(self, bone_names):
+        return np.array([self.indices[i] for i in bone_names], dtype=np.int64)
+
+    # unit vectors from heads to tails, zero length bones point up like in blender
+    def directions(self, bones):
+        vectors = self.tails[bones] - self.heads[bones]
+        lengths = np.linalg.norm(vectors, axis=1)
+
+        directions = np.zeros_like(vectors)
+        directions[:, 2] = 1.0
+        np.divide(vectors, lengths[:, None], out=directions, where=lengths[:, None] > 0.0)
+        return directions, lengths
+
+    # z axes of bones, same as EditBone.z_axis
+    def z_axes(self, bones):
+        directions = self.directions(bones)[0]
+        zero_roll = zero_roll_z_axes(directions)
+        sides = np.cross(directions, zero_roll)
+        rolls = self.rolls[bones][:, None]
+        return zero_roll * np.cos(rolls) + sides * np.sin(rolls)
+
+    # sets rolls so the z axes of bones point along axes, same as EditBone.align_roll for each bone
+    # bones whose direction is along their axis get no roll
+    def align_rolls(self, bones, axes):
+        directions = self.directions(bones)[0]
+        axes = np.broadcast_to(np.asarray(axes, dtype=np.float32), directions.shape)
+
+        projected = axes - directions * np.einsum('ij,ij->i', axes, directions)[:, None]
+        zero_roll = zero_roll_z_axes(directions)
+        sides = np.cross(directions, zero_roll)
+        rolls = np.arctan2(np.einsum('ij,ij->i', sides, projected), np.einsum('ij,ij->i', zero_roll, projected))
+
+        rolls[np.einsum('ij,ij->i', projected, projected) < 1e-12] = 0.0
+        self.rolls[bones] = rolls
+
+    # moves tails of bones onto heads of other bones
+    def snap_tails_to_heads(self, bones, targets):
+        self.tails[bones] = self.heads[targets]
+
+    # makes bones longer along their direction, like adding to EditBone.length
+    def elongate(self, bones, value):
+        directions, lengths = self.directions(bones)
+        self.tails[bones] = self.heads[bones] + directions * (lengths + value)[:, None]
+
+    # writes heads, tails and rolls back
+    # foreach_set skips edit bone updates, so heads of connected bones are moved onto their parent's tail here
+    def write(self, edit_bones, sync_connected=True):
+        if sync_connected:
+            connected = self.connected & (self.parents >= 0)
+            self.heads[connected] = self.tails[self.parents[connected]]
+
+        edit_bones.foreach_set("head", self.heads.ravel())
+        edit_bones.foreach_set("tail", self.tails.ravel())
+        edit_bones.foreach_set("roll", self.rolls)
+
+    # writes only the rolls back, for when heads and tails haven't changed since they were read
+    def write_rolls(self, edit_bones):
+        edit_bones.foreach_set("roll", self.rolls)
+
+# constraint settings saved by snapshots, constraints that get put back are made from these
+CONSTRAINT_ATTRIBUTES = (
+    "name",
+    "mute",
+    "influence",
+    "owner_space",
+    "target_space",
+    "target",
+    "subtarget",
+    "head_tail",
+    "mix_mode",
+    "use_offset",
+    "use_x",
+    "use_y",
+    "use_z",
+    "pole_target",
+    "pole_subtarget",
+    "pole_angle",
+    "chain_count",
+    "iterations",
+    "use_tail",
+    "use_stretch",
+)
+
+# copies arrays like layers so saved values don't change with the bone
+def snapshot_value(value):
+    if hasattr(value, "__len__") and not isinstance(value, str):
+        return tuple(value)
+    return value
+
+# every setting of a constraint that can be set again, in an order where targets come before their bones
+def snapshot_constraint(constraint):
+    saved = {attr: snapshot_value(getattr(constraint, attr))
+             for attr in CONSTRAINT_ATTRIBUTES if hasattr(constraint, attr)}
+
+    rna = getattr(constraint, "bl_rna", None)
+    if rna is not None:
+        for prop in rna.properties:
+            if prop.identifier not in saved and prop.identifier != "rna_type" and not prop.is_readonly and \
+                    prop.type != 'COLLECTION':
+                saved[prop.identifier] = snapshot_value(getattr(constraint, prop.identifier))
+
+    saved["type"] = constraint.type
+    saved["pointer"] = constraint.as_pointer()
+    return saved
+
+# sets saved constraint settings, ones this blender can't set are skipped
+def restore_constraint(constraint, saved):
+    for attr, value in saved.items():
+        if attr in ("type", "pointer"):
+            continue
+        try:
+            setattr(constraint, attr, value)
+        except (AttributeError, TypeError, ValueError):
+            pass
+
+# bones and constraints of an armature saved before an operator changes them
+# only the given bones are saved, or every bone if bone_names is None, bones added after the snapshot
+# are removed when it's restored and saved bones that were deleted are made again
+class ArmatureSnapshot:
+    def __init__(self, armature_object, bone_names=None):
+        armature = armature_object.data
+        self.armature_object = armature_object
+        self.bone_names = set(get_bone_index(armature).names)
+
+        bones = armature.edit_bones if armature.is_editmode else armature.bones
+        pose_bones = armature_object.pose.bones
+        if bone_names is None:
+            bone_names = self.bone_names
+        bone_names = [i for i in bone_names if i in self.bone_names]
+
+        # heads, tails and z axes in armature space, read in bulk, rolls are put back by aligning to the
+        # z axes since Bone has no roll. outside edit mode they come from head_local, tail_local and
+        # matrix_local, which foreach_get gives column by column, Bone.z_axis is relative to the parent
+        if armature.is_editmode:
+            geometry = BoneGeometry(bones)
+            rows = geometry.index(bone_names)
+            self.heads = geometry.heads[rows]
+            self.tails = geometry.tails[rows]
+            self.z_axes = geometry.z_axes(rows)
+        else:
+            count = len(bones)
+            heads = np.empty(count * 3, dtype=np.float32)
+            tails = np.empty(count * 3, dtype=np.float32)
+            matrices = np.empty(count * 16, dtype=np.float32)
+            bones.foreach_get("head_local", heads)
+            bones.foreach_get("tail_local", tails)
+            bones.foreach_get("matrix_local", matrices)
+
+            indices = {name: i for i, name in enumerate(get_bone_index(armature).names)}
+            rows = np.array([indices[i] for i in bone_names], dtype=np.int64)
+            self.heads = heads.reshape(count, 3)[rows]
+            self.tails = tails.reshape(count, 3)[rows]
+            self.z_axes = matrices.reshape(count, 4, 4)[rows, 2, :3]
+        self.geometry_names = bone_names
+
+        self.bones = {}
+        count_bone_iterations(len(bone_names))
+        for name in bone_names:
+            bone = bones[name]
+            saved = {
+                "parent": bone.parent.name if bone.parent is not None else None,
+                "use_connect": bone.use_connect,
+                "attributes": {attr: snapshot_value(getattr(bone, attr)) for attr in EDIT_BONE_ATTRIBUTES
+                               if attr not in ("head", "tail", "roll") and hasattr(bone, attr)},
+                "pose": {},
+                "constraints": [],
+            }
+
+            pose_bone = pose_bones.get(name)
+            if pose_bone is not None:
+                saved["pose"] = {attr: snapshot_value(getattr(pose_bone, attr)) for attr in POSE_BONE_ATTRIBUTES
+                                 if hasattr(pose_bone, attr)}
+                saved["constraints"] = [snapshot_constraint(i) for i in pose_bone.constraints]
+
+            self.bones[name] = saved
+
+    # puts bones back, needs edit mode
+    def restore_edit_bones(self):
+        edit_bones = self.armature_object.data.edit_bones
+
+        # removes bones added since the snapshot, then makes deleted ones again
+        for edit_bone in list(edit_bones):
+            if edit_bone.name not in self.bone_names:
+                edit_bones.remove(edit_bone)
+        for name in self.bones:
+            if edit_bones.get(name) is None:
+                edit_bones.new(name)
+
+        for name, saved in self.bones.items():
+            edit_bone = edit_bones[name]
+            for attr, value in saved["attributes"].items():
+                setattr(edit_bone, attr, value)
+
+        # parents after every bone exists again
+        for name, saved in self.bones.items():
+            edit_bone = edit_bones[name]
+            edit_bone.parent = edit_bones.get(saved["parent"]) if saved["parent"] is not None else None
+            edit_bone.use_connect = saved["use_connect"]
+
+        # geometry last and in bulk, foreach_set doesn't move connected heads so the saved ones stay
+        if self.geometry_names:
+            geometry = BoneGeometry(edit_bones)
+            rows = geometry.index(self.geometry_names)
+            geometry.heads[rows] = self.heads
+            geometry.tails[rows] = self.tails
+            geometry.align_rolls(rows, self.z_axes)
+            geometry.write(edit_bones, sync_connected=False)
+
+    # puts pose settings and constraints back, needs pose or object mode
+    def restore_pose_bones(self):
+        pose_bones = self.armature_object.pose.bones
+
+        for name, saved in self.bones.items():
+            pose_bone = pose_bones.get(name)
+            if pose_bone is None:
+                continue
+            for attr, value in saved["pose"].items():
+                setattr(pose_bone, attr, value)
+
+            # constraints that were there are found by pointer, so renamed and retargeted ones are set back,
+            # ones added since the snapshot are removed and removed ones are made again
+            constraints = pose_bone.constraints
+            existing = {i.as_pointer(): i for i in constraints}
+            kept = []
+            for saved_constraint in saved["constraints"]:
+                constraint = existing.pop(saved_constraint["pointer"], None)
+                kept.append(constraint if constraint is not None and constraint.type == saved_constraint["type"]
+                            else None)
+            for constraint in list(constraints):
+                if constraint not in kept:
+                    constraints.remove(constraint)
+
+            restored = []
+            for saved_constraint, constraint in zip(saved["constraints"], kept):
+                if constraint is None:
+                    constraint = constraints.new(saved_constraint["type"])
+                restore_constraint(constraint, saved_constraint)
+                restored.append(constraint)
+
+            # back in the saved order
+            for i, constraint in enumerate(restored):
+                current = list(constraints).index(constraint)
+                if current != i:
+                    constraints.move(current, i)
+
+# puts snapshots back after an operator failed and returns the armatures to the mode they were in
+def restore_snapshots(context, snapshots, mode):
+    armatures = [i.armature_object for i in snapshots]
+
+    set_batch_mode(context, armatures, 'EDIT')
+    for snapshot in snapshots:
+        snapshot.restore_edit_bones()
+
+    set_batch_mode(context, armatures, 'POSE')
+    for snapshot in snapshots:
+        invalidate_bone_index(snapshot.armature_object.data)
+        snapshot.restore_pose_bones()
+
+    if mode != 'POSE':
+        profiled_ops.object.mode_set(mode=mode)
+
+# bones and their parents and children, the bones that reparenting around them can change
+def with_neighbour_bones(index, bone_names):
+    names = set(bone_names)
+    for name in bone_names:
+        parent = index.parents.get(name)
+        if parent is not None:
+            names.add(parent)
+        names.update(index.children.get(name, ()))
+    return names
+
+# names of bones with a constraint that test is true for
+def find_constrained_bones(armature_object, test):
+    count_bone_iterations(len(armature_object.pose.bones))
+    return {pose_bone.name for pose_bone in armature_object.pose.bones
+            if any(test(constraint) for constraint in pose_bone.constraints)}
+
+# the (armature object, bone names) entries of snapshot_bones with one entry per armature,
+# None for an armature means all of its bones
+def merge_snapshot_bones(entries):
+    merged = {}
+    for armature_object, bone_names in entries:
+        if armature_object not in merged:
+            merged[armature_object] = None if bone_names is None else set(bone_names)
+        elif merged[armature_object] is not None:
+            merged[armature_object] = None if bone_names is None else merged[armature_object] | set(bone_names)
+    return list(merged.items())
+
+# decorator for operator execute methods, if the operator fails the bones it changed are put back
+# the operator's snapshot_bones method returns the (armature object, bone names or None) it can change,
+# with UNDO in bl_options a run that works is still one undo step since nested operators don't push any
+def transaction(execute):
+    @functools.wraps(execute)
+    def wrapper(self, context):
+        active_object = context.view_layer.objects.active
+        mode = active_object.mode if active_object is not None else 'OBJECT'
+        selection = save_object_selection(context)
+
+        with profile_phase("snapshot"):
+            snapshots = [ArmatureSnapshot(ob, bone_names) for ob, bone_names in self.snapshot_bones(context)]
+
+        try:
+            return execute(self, context)
+        except Exception as error:
+            if not snapshots:
+                raise
+
+            try:
+                restore_snapshots(context, snapshots, mode)
+            except Exception as restore_error:
+                self.report({'ERROR'}, "%s failed and couldn't be undone: %s" % (self.bl_label, restore_error))
+                return {'CANCELLED'}
+
+            self.report({'ERROR'}, "%s failed, its changes were undone: %s: %s" %
+                        (self.bl_label, type(error).__name__, error))
+            return {'CANCELLED'}
+        finally:
+            restore_object_selection(context, selection)
+
+    return wrapper
+
+# constraints used by each link type
+LINK_CONSTRAINT_TYPES = {
+    'link_TRANSFORM': ('COPY_TRANSFORMS',),
+    'link_LOCROT': ('COPY_ROTATION', 'COPY_LOCATION'),
+}
+
+# link constraints the add-on made are named with this prefix and the tool that made them,
+# constraints can't hold custom properties so the name is the tag
+OWNED_CONSTRAINT_PREFIX = "RT "
+
+def owned_constraint_name(group, constraint_type):
+    return "%s%s %s" % (OWNED_CONSTRAINT_PREFIX, group, constraint_type.replace('_', ' ').title())
+
+def is_owned_constraint(constraint, group):
+    return constraint.name.startswith("%s%s " % (OWNED_CONSTRAINT_PREFIX, group))
+
+# how many constraints reconcile_link_constraints added, pointed somewhere else, left alone and removed
+class ConstraintChanges:
+    def __init__(self):
+        self.added = 0
+        self.updated = 0
+        self.kept = 0
+        self.removed = 0
+
+    @property
+    def reused(self):
+        return self.updated + self.kept
+
+# makes the link constraints group owns match links, a dict of owner bone name to (target object, target bone)
+# owned constraints are reused and pointed at the right bone, missing ones are added and the ones left over
+# are removed, from the owner bones in links or from every bone if all_bones is on
+# constraints made before they were tagged are only taken over if they're exactly a planned link, of a type
+# the link type uses and following the target bone, any other constraint is the user's and left alone
+def reconcile_link_constraints(armature_object, links, link_type, group, all_bones=False):
+    pose_bones = armature_object.pose.bones
+    constraint_types = LINK_CONSTRAINT_TYPES[link_type]
+    changes = ConstraintChanges()
+
+    owners = [i.name for i in pose_bones] if all_bones else list(links)
+    count_bone_iterations(len(owners))
+    for owner in owners:
+        pose_bone = pose_bones.get(owner)
+        if pose_bone is None:
+            continue
+
+        owned = [i for i in pose_bone.constraints if is_owned_constraint(i, group)]
+        if owner in links:
+            target_object, target = links[owner]
+            for constraint in pose_bone.constraints:
+                if constraint.type in constraint_types and not constraint.name.startswith(OWNED_CONSTRAINT_PREFIX) and \
+                        constraint.target == target_object and constraint.subtarget == target:
+                    constraint.name = owned_constraint_name(group, constraint.type)
+                    owned.append(constraint)
+
+            for constraint_type in constraint_types:
+                same_type = [i for i in owned if i.type == constraint_type]
+                constraint = next((i for i in same_type if i.target == target_object and i.subtarget == target),
+                                  same_type[0] if same_type else None)
+                if constraint is not None:
+                    owned.remove(constraint)
+
+                if constraint is None:
+                    constraint = pose_bone.constraints.new(constraint_type)
+                    constraint.name = owned_constraint_name(group, constraint_type)
+                    changes.added += 1
+                elif constraint.target == target_object and constraint.subtarget == target:
+                    changes.kept += 1
+                    continue
+                else:
+                    changes.updated += 1
+                constraint.target = target_object
+                constraint.subtarget = target
+
+        # owned constraints of another link type, a bone that isn't linked any more or a second copy
+        for constraint in owned:
+            pose_bone.constraints.remove(constraint)
+            changes.removed += 1
+
+    return changes
+
+# tool that made an owned constraint, None if the add-on didn't make it
+def owned_constraint_group(constraint):
+    if not constraint.name.startswith(OWNED_CONSTRAINT_PREFIX):
+        return None
+    return constraint.name[len(OWNED_CONSTRAINT_PREFIX):].split(' ', 1)[0]
+
+# settings of a copy rotation and copy location pair that has to be at these values for
+# one copy transforms to do the same, the defaults the constraints get when they're added
+LINK_PAIR_DEFAULTS = {
+    "mute": False,
+    "use_x": True,
+    "use_y": True,
+    "use_z": True,
+    "invert_x": False,
+    "invert_y": False,
+    "invert_z": False,
+    "use_offset": False,
+    "mix_mode": 'REPLACE',
+    "head_tail": 0.0,
+}
+
+# settings both constraints of the pair have to share
+LINK_PAIR_SHARED = ("target", "subtarget", "influence", "owner_space", "target_space")
+
+# copy rotation and copy location next to each other that follow the same bone the same way
+# copy transforms also copies scale, so they're only the same while the target bone isn't scaled
+def is_redundant_link_pair(first, second):
+    if {first.type, second.type} != {'COPY_ROTATION', 'COPY_LOCATION'}:
+        return False
+    if any(getattr(first, i, None) != getattr(second, i, None) for i in LINK_PAIR_SHARED):
+        return False
+    return all(getattr(constraint, name, value) == value
+               for constraint in (first, second) for name, value in LINK_PAIR_DEFAULTS.items())
+
+# index of the first constraint of every redundant pair in a bone's constraints
+def find_redundant_link_pairs(constraints):
+    pairs = []
+    i = 0
+    while i < len(constraints) - 1:
+        if is_redundant_link_pair(constraints[i], constraints[i + 1]):
+            pairs.append(i)
+            i += 2
+        else:
+            i += 1
+    return pairs
+
+# swaps every redundant copy rotation and copy location pair of the armatures for one copy transforms
+# in the same place in the stack, owned pairs stay owned by the same tool, returns how many were swapped
+def merge_link_constraint_pairs(armatures):
+    merged = 0
+    for armature_object in armatures:
+        count_bone_iterations(len(armature_object.pose.bones))
+        for pose_bone in armature_object.pose.bones:
+            constraints = pose_bone.constraints
+            # later pairs first so the indexes of earlier ones don't move
+            for i in reversed(find_redundant_link_pairs(list(constraints))):
+                first, second = constraints[i], constraints[i + 1]
+                location = first if first.type == 'COPY_LOCATION' else second
+                group = owned_constraint_group(first)
+
+                constraint = constraints.new('COPY_TRANSFORMS')
+                for attr in LINK_PAIR_SHARED:
+                    if hasattr(first, attr):
+                        setattr(constraint, attr, getattr(first, attr))
+                if hasattr(location, "head_tail"):
+                    constraint.head_tail = location.head_tail
+                if group is not None:
+                    constraint.name = owned_constraint_name(group, 'COPY_TRANSFORMS')
+
+                constraints.remove(first)
+                constraints.remove(second)
+                constraints.move(len(constraints) - 1, i)
+                merged += 1
+    return merged
+
+# constraints on the armatures' bones and how long the armatures take to evaluate
+class PoseCostReport:
+    def __init__(self):
+        self.armatures = []
+        self.bones = 0
+        # constraint type to how many there are
+        self.constraints = {}
+        # armature name to bone name to its constraint types and how many of each, only bones with constraints
+        self.bone_constraints = {}
+        # (armature name, bone name) of copy rotation and copy location pairs one copy transforms could replace
+        self.redundant_pairs = []
+        # seconds it took to evaluate the armatures on each measured frame
+        self.frame_times = []
+
+    @property
+    def average_time(self):
+        return sum(self.frame_times) / len(self.frame_times) if self.frame_times else 0.0
+
+    # bone with the most constraints as (armature name, bone name, count), None if no bone has any
+    @property
+    def busiest_bone(self):
+        counts = [(armature_name, bone_name, sum(types.values()))
+                  for armature_name, bones in self.bone_constraints.items() for bone_name, types in bones.items()]
+        return max(counts, key=lambda i: i[2], default=None)
+
+    def as_dict(self):
+        return {
+            "armatures": list(self.armatures),
+            "bones": self.bones,
+            "constraints": dict(self.constraints),
+            "bone_constraints": self.bone_constraints,
+            "redundant_pairs": [list(i) for i in self.redundant_pairs],
+            "frame_times": list(self.frame_times),
+            "average_time": self.average_time,
+        }
+
+# counts constraints by type on every bone and finds redundant link pairs, without evaluating anything
+def count_pose_cost(armatures):
+    report = PoseCostReport()
+    for armature_object in armatures:
+        report.armatures.append(armature_object.name)
+        bones = report.bone_constraints.setdefault(armature_object.name, {})
+
+        count_bone_iterations(len(armature_object.pose.bones))
+        for pose_bone in armature_object.pose.bones:
+            report.bones += 1
+            constraints = list(pose_bone.constraints)
+            if not constraints:
+                continue
+
+            bone_types = bones[pose_bone.name] = {}
+            for constraint in constraints:
+                bone_types[constraint.type] = bone_types.get(constraint.type, 0) + 1
+                report.constraints[constraint.type] = report.constraints.get(constraint.type, 0) + 1
+            report.redundant_pairs.extend((armature_object.name, pose_bone.name)
+                                          for i in find_redundant_link_pairs(constraints))
+    return report
+
+# times frame changes over frames frames after the current one, which is what playback pays for
+# the armatures' constraints, everything else animated in the scene is evaluated too and adds to it
+# a frame change only evaluates what's animated, so the armatures are tagged before each one to have
+# their poses evaluated even when nothing animates them
+# the scene is put back on the frame and subframe it was on, nothing else is changed
+def measure_pose_evaluation(context, armatures, frames, report):
+    scene = context.scene
+    frame = scene.frame_current
+    subframe = scene.frame_subframe
+
+    try:
+        for i in range(1, frames + 1):
+            start = time.perf_counter()
+            for armature_object in armatures:
+                armature_object.update_tag()
+            scene.frame_set(frame + i)
+            report.frame_times.append(time.perf_counter() - start)
+    finally:
+        scene.frame_set(frame, subframe=subframe)
+
+    return report
+
+# pose cost report of the last measure for the panel
+last_pose_cost = None
+
+# removes constraints that target bones which are about to be deleted, like armature.delete does
+def remove_constraints_targeting(armature_object, bone_names):
+    count_bone_iterations(len(armature_object.pose.bones))
+    for pose_bone in armature_object.pose.bones:
+        if pose_bone.name in bone_names:
+            continue
+        for constraint in list(pose_bone.constraints):
+            if getattr(constraint, "target", None) == armature_object and \
+                    constraint.subtarget in bone_names:
+                pose_bone.constraints.remove(constraint)
+
+# deletes edit bones by name, returns how many were deleted
+# edit_bones.remove parents children to the deleted bone's parent, so children end up on the
+# nearest bone that isn't deleted, unless reparent is off and they lose their parent instead
+def delete_edit_bones(edit_bones, bone_names, reparent=True):
+    if not reparent:
+        count_bone_iterations(len(edit_bones))
+        for edit_bone in edit_bones:
+            if edit_bone.parent is not None and edit_bone.parent.name in bone_names and \
+                    edit_bone.name not in bone_names:
+                edit_bone.use_connect = False
+                edit_bone.parent = None
+
+    deleted = 0
+    count_bone_iterations(len(bone_names))
+    for i in bone_names:
+        edit_bone = edit_bones.get(i)
+        if edit_bone is not None:
+            edit_bones.remove(edit_bone)
+            deleted += 1
+
+    return deleted
+
+# bones that can't be parented to parent_name since it's the bone itself or one of its children
+def find_parent_cycles(index, bone_names, parent_name):
+    parent_chain = set(index.ancestors(parent_name))
+    parent_chain.add(parent_name)
+    return [i for i in bone_names if i in parent_chain]
+
+# parents edit bones to one bone, needs edit mode
+# connecting moves the heads of the bones to the parent's tail
+def set_edit_bone_parents(edit_bones, bone_names, parent_name, connect=False):
+    parent = edit_bones[parent_name]
+    count_bone_iterations(len(bone_names))
+    for i in bone_names:
+        edit_bone = edit_bones[i]
+        edit_bone.parent = parent
+        edit_bone.use_connect = connect
+
+# clears the parent of edit bones, needs edit mode
+def clear_edit_bone_parents(edit_bones, bone_names):
+    count_bone_iterations(len(bone_names))
+    for i in bone_names:
+        edit_bone = edit_bones[i]
+        edit_bone.use_connect = False
+        edit_bone.parent = None
+
+# joins another armature object into an armature so its bones can be parents
+# returns the name bone_name has after the join, it's renamed first if the armature has a bone with that name
+def merge_armature(context, armature_object, other_object, bone_name):
+    names = get_bone_index(armature_object.data)
+    if bone_name in names:
+        other_names = get_bone_index(other_object.data)
+        number = 1
+        while "%s.%03d" % (bone_name, number) in names or "%s.%03d" % (bone_name, number) in other_names:
+            number += 1
+        other_object.data.bones[bone_name].name = "%s.%03d" % (bone_name, number)
+        bone_name = "%s.%03d" % (bone_name, number)
+
+    if context.view_layer.objects.active is not None:
+        profiled_ops.object.mode_set(mode='OBJECT')
+    profiled_ops.object.select_all(action='DESELECT')
+    other_object.select_set(True)
+    armature_object.select_set(True)
+    context.view_layer.objects.active = armature_object
+    profiled_ops.object.join()
+
+    invalidate_bone_index(armature_object.data)
+    return bone_name
+
+GLOBAL_ROLL_AXES = {
+    'roll_GLOBAL_X': (1.0, 0.0, 0.0),
+    'roll_GLOBAL_Y': (0.0, 1.0, 0.0),
+    'roll_GLOBAL_Z': (0.0, 0.0, 1.0),
+}
+
+# splits bones into the longest chains where each bone is the only child of the one before
+# a bone whose parent has more than one child in bone_names starts a new chain, chains are in bone order
+def find_bone_chains(index, bone_names):
+    bone_set = {i for i in bone_names if i in index}
+
+    child_counts = {}
+    for i in bone_set:
+        parent = index.parents[i]
+        if parent in bone_set:
+            child_counts[parent] = child_counts.get(parent, 0) + 1
+
+    count_bone_iterations(len(index))
+    chains = []
+    for name in index.names:
+        if name not in bone_set:
+            continue
+        parent = index.parents[name]
+        if parent in bone_set and child_counts[parent] == 1:
+            continue
+
+        chain = [name]
+        while child_counts.get(chain[-1]) == 1:
+            chain.append(next(i for i in index.children[chain[-1]] if i in bone_set))
+        chains.append(chain)
+
+    return chains
+
+# chains to connect from the selected bones, one chain in selected order or chains found in the hierarchy
+def get_bone_chains(index, selected_bones, chain_mode):
+    if chain_mode == 'chain_SELECTED':
+        return [selected_bones] if selected_bones else []
+
+    bone_names = set(selected_bones)
+    if chain_mode == 'chain_SUBTREE':
+        for i in selected_bones:
+            bone_names.update(index.descendants(i))
+    return find_bone_chains(index, bone_names)
+
+# sets rolls of new bones of chains in bulk, each chain is a list of bones in order, needs edit mode
+# new bones are rolled like their source bone, to a global axis, or with as little twist down the chain as they can
+def roll_chains(geometry, chains, new_bones, roll_mode):
+    selected_bones = [i for chain in chains for i in chain]
+    count_bone_iterations(len(selected_bones))
+    sources = geometry.index(selected_bones)
+    bones = geometry.index([new_bones[i] for i in selected_bones])
+
+    if roll_mode in GLOBAL_ROLL_AXES:
+        geometry.align_rolls(bones, GLOBAL_ROLL_AXES[roll_mode])
+        return
+
+    axes = geometry.z_axes(sources)
+    if roll_mode == 'roll_TWIST':
+        # carries the z axis of the first bone down each chain, each bone's axis is the last one
+        # with the part along the bone taken out, falls back to the source's axis when they're parallel
+        directions = geometry.directions(bones)[0]
+        # rows where the next chain starts keep their own source's axis
+        starts = set(itertools.accumulate(len(chain) for chain in chains))
+        for i in range(1, len(axes)):
+            if i in starts:
+                continue
+            projected = axes[i - 1] - directions[i] * np.dot(axes[i - 1], directions[i])
+            length = np.linalg.norm(projected)
+            if length > 1e-6:
+                axes[i] = projected / length
+
+    geometry.align_rolls(bones, axes)
+
+# duplicates, connects, parents and rolls chains of bones, each chain is a list of bones in order, needs edit mode
+# every chain is built in the same pass, returns a dict of original bone name to new bone name
+def connect_edit_bones(armature_object, chains, mytool):
+    edit_bones = armature_object.data.edit_bones
+    selected_bones = [i for chain in chains for i in chain]
+    links = [(elem, next_elem) for chain in chains for elem, next_elem in zip(chain, chain[1:])]
+
+    # duplicates selected bones, keeps their hierarchy if parenting by hierarchy
+    with profile_phase("duplicate"):
+        new_bones = duplicate_edit_bones(edit_bones, selected_bones, mytool.my_new_bone_prefix,
+                                         mytool.my_parent_using == 'parent_HIERARCHY')
+
+    # snaps tails of new bones to heads of next bones in their chain and elongates the last ones in bulk
+    with profile_phase("connect"):
+        geometry = BoneGeometry(edit_bones)
+        geometry.snap_tails_to_heads(geometry.index([new_bones[elem] for elem, next_elem in links]),
+                                     geometry.index([next_elem for elem, next_elem in links]))
+    if mytool.my_elongate_end_of_chain:
+        with profile_phase("elongate"):
+            geometry.elongate(geometry.index([new_bones[chain[-1]] for chain in chains]), mytool.my_elongate_value)
+    with profile_phase("connect"):
+        geometry.write(edit_bones)
+
+    with profile_phase("parent"):
+        count_bone_iterations(len(links))
+        for elem, next_elem in links:
+            # parents next bone to this bone
+            edit_bones[new_bones[next_elem]].parent = edit_bones[new_bones[elem]]
+
+            # make parents connected if user chooses
+            if mytool.my_parent_type == 'parent_CONNECTED':
+                edit_bones[new_bones[next_elem]].use_connect = True
+
+    # set roll from original bone, same as calculate_roll with the original bone active for Match Source
+    # parenting moves heads of connected bones, so the geometry is read again
+    with profile_phase("roll"):
+        geometry = BoneGeometry(edit_bones)
+        roll_chains(geometry, chains, new_bones, mytool.my_roll_mode)
+        geometry.write_rolls(edit_bones)
+
+    # links bones with parenting
+    if mytool.my_link_bones and mytool.my_link_type == 'link_PARENTS':
+        with profile_phase("link"):
+            count_bone_iterations(len(selected_bones))
+            for i in selected_bones:
+                edit_bones[i].parent = edit_bones[new_bones[i]]
+
+    # use deform or not
+    with profile_phase("deform"):
+        count_bone_iterations(len(selected_bones))
+        for i in selected_bones:
+            edit_bones[new_bones[i]].use_deform = mytool.my_use_deform
+
+    return new_bones
+
+# copies pose settings and adds the link and ik constraints of chains, needs pose or object mode
+def connect_pose_bones(armature_object, chains, new_bones, mytool):
+    with profile_phase("duplicate"):
+        copy_pose_bones(armature_object, new_bones)
+
+    # links original bones to new bones with constraints
+    if mytool.my_link_bones and mytool.my_link_type != 'link_PARENTS':
+        with profile_phase("link"):
+            reconcile_link_constraints(armature_object,
+                                       {i: (armature_object, new_bones[i]) for chain in chains for i in chain},
+                                       mytool.my_link_type, "Chain")
+
+    # adds ik to end of every chain or not
+    if mytool.my_add_ik_to_chain:
+        with profile_phase("IK"):
+            count_bone_iterations(len(chains))
+            for chain in chains:
+                armature_object.pose.bones[new_bones[chain[-1]]].constraints.new('IK')
+
+    deselect_all_bones(armature_object.data)
+
+# bone names and patterns read from a bone list file
+# plain lines are bone names, lines with * ? or [ are globs and lines starting with re: are regex
+class BoneList:
+    def __init__(self):
+        self.names = set()
+        self.pattern_sources = []
+        self.pattern = None
+
+    def add(self, entry):
+        entry = entry.strip()
+        if not entry or entry.startswith(('#', '//')):
+            return
+        if entry.startswith('re:'):
+            self.pattern_sources.append(entry[3:].strip())
+        elif any(char in entry for char in '*?['):
+            self.pattern_sources.append(fnmatch.translate(entry))
+        else:
+            self.names.add(entry)
+
+    # compiles every pattern into one regex so matching is a single call per bone
+    def compile(self):
+        if self.pattern_sources:
+            self.pattern = re.compile('|'.join('(?:%s)' % i for i in self.pattern_sources))
+        return self
+
+    # returns the bone names that are in the list or match a pattern
+    def match(self, bone_names):
+        if self.pattern is None:
+            return self.names.intersection(bone_names)
+        return {i for i in bone_names if i in self.names or self.pattern.fullmatch(i)}
+
+    # returns the listed bone names that aren't in bone_names, patterns are never missing
+    def missing(self, bone_names):
+        return self.names.difference(bone_names)
+
+# reads one bone name per line
+def read_text_bone_list(opened_file):
+    for line in opened_file:
+        yield line
+
+# reads the bone name from the first column, or from a name/bone column if there is a header
+def read_csv_bone_list(opened_file):
+    column = 0
+    for row_index, row in enumerate(csv.reader(opened_file)):
+        if not row:
+            continue
+        if row_index == 0:
+            header = [i.strip().lower() for i in row]
+            for key in ('name', 'bone', 'bone_name'):
+                if key in header:
+                    column = header.index(key)
+                    break
+            else:
+                yield row[0]
+            continue
+        if column < len(row):
+            yield row[column]
+
+# reads a list of bone names, or an object with a "bones" list
+def read_json_bone_list(opened_file):
+    data = json.load(opened_file)
+    if isinstance(data, dict):
+        data = data.get('bones', [])
+    if not isinstance(data, list):
+        raise ValueError("JSON bone list must be a list of names or have a \"bones\" list")
+    for i in data:
+        if isinstance(i, str):
+            yield i
+
+# bone list readers by file extension, anything else is read as plain text
+BONE_LIST_READERS = {
+    '.txt': read_text_bone_list,
+    '.csv': read_csv_bone_list,
+    '.json': read_json_bone_list,
+}
 
+# parsed files, keyed on file path and reader and checked against the file's modified time
+file_cache = {}
+
+# reads a file with reader, reuses the result if the file hasn't changed since it was last read
+def load_cached_file(path, reader):
+    path = os.path.normpath(bpy.path.abspath(path))
+    stat = os.stat(path)
+    file_key = (stat.st_mtime_ns, stat.st_size)
+
+    cached = file_cache.get((path, reader))
+    if cached is not None and cached[0] == file_key:
+        return cached[1]
+
+    result = reader(path)
+    file_cache[(path, reader)] = (file_key, result)
+    return result
+
+# parses a bone list file with the reader for its extension
+def read_bone_list(path):
+    reader = BONE_LIST_READERS.get(os.path.splitext(path)[1].lower(), read_text_bone_list)
+    bone_list = BoneList()
+
+    with open(path, "r", encoding="utf-8-sig", newline="") as opened_file:
+        for entry in reader(opened_file):
+            bone_list.add(entry)
+
+    return bone_list.compile()
+
+# loads a bone list file, reuses the parsed list if the file hasn't changed
+def load_bone_list(path):
+    return load_cached_file(path, read_bone_list)
+
+# rules for matching bone names between armatures
+# remaps are (regex, replacement) pairs applied in order, then one prefix and one suffix is stripped
+class BoneNameMatcher:
+    def __init__(self, strip_prefixes=(), strip_suffixes=(), remaps=()):
+        self.strip_prefixes = tuple(i for i in strip_prefixes if i)
+        self.strip_suffixes = tuple(i for i in strip_suffixes if i)
+        self.remaps = [(re.compile(pattern), replacement) for pattern, replacement in remaps]
+
+    # the rules as plain values, matchers with the same settings match the same way
+    def settings(self):
+        return (self.strip_prefixes, self.strip_suffixes,
+                tuple((pattern.pattern, replacement) for pattern, replacement in self.remaps))
+
+    # the name a bone is matched by
+    def key(self, name):
+        for pattern, replacement in self.remaps:
+            name = pattern.sub(replacement, name)
+        for prefix in self.strip_prefixes:
+            if name.startswith(prefix):
+                name = name[len(prefix):]
+                break
+        for suffix in self.strip_suffixes:
+            if name.endswith(suffix):
+                name = name[:-len(suffix)]
+                break
+        return name
+
+    # dict of match name to bone name, if two bones get the same match name the first one is kept
+    def index(self, bone_names):
+        index = {}
+        for name in bone_names:
+            index.setdefault(self.key(name), name)
+        return index
+
+# reads (regex, replacement) pairs
+# JSON files hold an object of regex to replacement or a list of pairs, other files two csv columns
+def read_remap_table(path):
+    with open(path, "r", encoding="utf-8-sig", newline="") as opened_file:
+        if path.lower().endswith('.json'):
+            data = json.load(opened_file)
+            remaps = list(data.items()) if isinstance(data, dict) else \
+                [tuple(i) if isinstance(i, list) else i for i in data]
+        else:
+            remaps = []
+            for row in csv.reader(opened_file):
+                if not row or not row[0].strip() or row[0].lstrip().startswith('#'):
+                    continue
+                remaps.append((row[0].strip(), row[1].strip() if len(row) > 1 else ""))
+
+    for remap in remaps:
+        if not isinstance(remap, tuple) or len(remap) != 2 or not all(isinstance(i, str) for i in remap):
+            raise ValueError("Remaps must be pairs of regex and replacement, got %r" % (remap,))
+
+    return remaps
+
+# prefixes and suffixes the link settings strip from bone names
+def get_link_strips(mytool):
+    return ([i.strip() for i in mytool.my_link_strip_prefixes.split(',')],
+            [i.strip() for i in mytool.my_link_strip_suffixes.split(',')])
+
+# builds the bone name matcher from the link settings
+def get_link_matcher(mytool):
+    remaps = load_cached_file(mytool.my_link_remap_path, read_remap_table) \
+        if mytool.my_link_remap_path else ()
+
+    strip_prefixes, strip_suffixes = get_link_strips(mytool)
+    return BoneNameMatcher(strip_prefixes, strip_suffixes, remaps)
+
+# which bones of a base armature match bones of target armatures
+class LinkMatchReport:
+    def __init__(self):
+        # (target object, base bone name, target bone name)
+        self.pairs = []
+        self.unmatched_base = set()
+        # target object name to names of its bones that matched nothing
+        self.unmatched_target = {}
+        # base bones that also matched a bone in a later target armature
+        self.conflicts = set()
+        # constraints that were already there and pointed at the target armature,
+        # and ones of base bones that aren't linked any more
+        self.reused = 0
+        self.removed = 0
+
+# matches bone names of the base armature to bone names of every target armature
+# a base bone is only matched to the first target armature that has it
+# target_names is a list of (target armature name, bone names), pairs get the target armature name
+# doesn't touch blender data so it can run in the thread pool, progress gets called with 0 to 1
+def match_bone_names(base_names, target_names, matcher=None, progress=None):
+    if matcher is None:
+        matcher = BoneNameMatcher()
+
+    report = LinkMatchReport()
+    base_index = matcher.index(base_names)
+    report.unmatched_base = set(base_index.values())
+
+    for target_number, (target_name, bone_names) in enumerate(target_names):
+        if progress is not None:
+            progress(target_number / len(target_names))
+        target_index = matcher.index(bone_names)
+        unmatched_target = set(target_index.values())
+
+        for key, target_bone in target_index.items():
+            base_bone = base_index.get(key)
+            if base_bone is None:
+                continue
+            unmatched_target.discard(target_bone)
+            if base_bone not in report.unmatched_base:
+                report.conflicts.add(base_bone)
+                continue
+            report.unmatched_base.discard(base_bone)
+            report.pairs.append((target_name, base_bone, target_bone))
+
+        report.unmatched_target[target_name] = unmatched_target
+
+    return report
+
+# link plans are match reports with target armatures stored by their place in the target list
+# they're kept by a hash of the bone names of the armatures and the match settings, so armatures with the
+# same bones reuse the plan, the least recently used plans are dropped past LINK_PLAN_CACHE_SIZE
+LINK_PLAN_CACHE_SIZE = 64
+LINK_PLAN_VERSION = 1
+
+link_plan_cache = collections.OrderedDict()
+link_plan_lock = threading.Lock()
+
+# file the cache was loaded from and whether it has plans the file doesn't
+link_plan_cache_path = None
+link_plan_cache_changed = False
+
+# hash of bone names in order, their order decides which bone is kept when two get the same match name
+def link_plan_key(base_names, target_names, matcher):
+    digest = hashlib.sha1()
+    for bone_names in [base_names] + [bone_names for target_name, bone_names in target_names]:
+        digest.update("\x1f".join(bone_names).encode("utf-8"))
+        digest.update(b"\x1e")
+    digest.update(repr(matcher.settings()).encode("utf-8"))
+    return digest.hexdigest()
+
+def link_plan_from_report(report, target_names):
+    slots = {target_name: i for i, (target_name, bone_names) in enumerate(target_names)}
+    return {
+        "pairs": [[slots[i], base_bone, target_bone] for i, base_bone, target_bone in report.pairs],
+        "unmatched_base": sorted(report.unmatched_base),
+        "unmatched_target": [sorted(report.unmatched_target[i]) for i, bone_names in target_names],
+        "conflicts": sorted(report.conflicts),
+    }
+
+def report_from_link_plan(plan, target_names):
+    report = LinkMatchReport()
+    report.pairs = [(target_names[i][0], base_bone, target_bone) for i, base_bone, target_bone in plan["pairs"]]
+    report.unmatched_base = set(plan["unmatched_base"])
+    report.unmatched_target = {target_names[i][0]: set(bone_names)
+                               for i, bone_names in enumerate(plan["unmatched_target"])}
+    report.conflicts = set(plan["conflicts"])
+    return report
+
+# needs link_plan_lock
+def store_link_plan(key, plan):
+    link_plan_cache[key] = plan
+    link_plan_cache.move_to_end(key)
+    while len(link_plan_cache) > LINK_PLAN_CACHE_SIZE:
+        link_plan_cache.popitem(last=False)
+
+# matches bone names like match_bone_names, armatures with the same bones as an earlier match reuse its plan
+# can run in the thread pool like match_bone_names
+def plan_bone_links(base_names, target_names, matcher=None, progress=None):
+    global link_plan_cache_changed
+
+    if matcher is None:
+        matcher = BoneNameMatcher()
+    key = link_plan_key(base_names, target_names, matcher)
+
+    with link_plan_lock:
+        plan = link_plan_cache.get(key)
+        if plan is not None:
+            link_plan_cache.move_to_end(key)
+    if plan is not None:
+        return report_from_link_plan(plan, target_names)
+
+    report = match_bone_names(base_names, target_names, matcher, progress)
+    with link_plan_lock:
+        store_link_plan(key, link_plan_from_report(report, target_names))
+        link_plan_cache_changed = True
+    return report
+
+# adds the plans in a plan cache file to the cache, only reads the file the first time it's used
+# unless reload is on, which picks up plans other processes saved since
+def load_link_plans(path, reload=False):
+    global link_plan_cache_path, link_plan_cache_changed
+
+    path = os.path.normpath(bpy.path.abspath(path))
+    if path == link_plan_cache_path and not reload:
+        return
+
+    try:
+        with open(path, "r", encoding="utf-8") as opened_file:
+            data = json.load(opened_file)
+    except FileNotFoundError:
+        data = {"version": LINK_PLAN_VERSION, "plans": {}}
+
+    if not isinstance(data, dict) or data.get("version") != LINK_PLAN_VERSION or \
+            not isinstance(data.get("plans"), dict):
+        raise ValueError("Not a version %d plan cache" % LINK_PLAN_VERSION)
 
-# bones for drop down
-def arma_items(self, context):
-    obs = []
-    for ob in context.scene.objects:
-        if ob.type == 'ARMATURE':
-            obs.append((ob.name, ob.name, ""))
-    return obs
+    with link_plan_lock:
+        # plans from memory are newer than the file's, so they stay at the recently used end
+        plans = collections.OrderedDict(data["plans"])
+        link_plan_cache_changed = bool(set(link_plan_cache).difference(plans))
+        plans.update(link_plan_cache)
+        link_plan_cache.clear()
+        for key, plan in plans.items():
+            store_link_plan(key, plan)
 
+    link_plan_cache_path = path
+
+# writes the cache back to the file it was loaded from if it has new plans
+def save_link_plans():
+    global link_plan_cache_changed
+
+    if link_plan_cache_path is None or not link_plan_cache_changed:
+        return
+
+    with link_plan_lock:
+        data = {"version": LINK_PLAN_VERSION, "plans": dict(link_plan_cache)}
+        link_plan_cache_changed = False
+
+    # written next to the file and swapped in so batch workers sharing the file never read half of it
+    temp_path = "%s.%d.tmp" % (link_plan_cache_path, os.getpid())
+    with open(temp_path, "w", encoding="utf-8") as opened_file:
+        json.dump(data, opened_file)
+    os.replace(temp_path, link_plan_cache_path)
+
+# swaps the target armature names in the pairs of a match report for the objects
+def with_target_objects(report, target_objects):
+    objects = {i.name: i for i in target_objects}
+    report.pairs = [(objects[i], base_bone, target_bone) for i, base_bone, target_bone in report.pairs]
+    return report
+
+# matches bones of the base armature to bones of every target armature
+def match_armature_bones(base_object, target_objects, matcher=None):
+    report = plan_bone_links(get_bone_index(base_object.data).names,
+                              [(i.name, get_bone_index(i.data).names) for i in target_objects], matcher)
+    return with_target_objects(report, target_objects)
+
+# deletes listed bones from every armature in one edit session
+# returns how many bones were matched, missing and deleted
+def delete_listed_bones(context, armatures, bone_list, reparent=True, report=None):
+    # compares all bones of each armature to bone list and only keeps matching bones,
+    # unless a dry run already did
+    if report is None:
+        with profile_phase("match"):
+            report = dry_run_delete({ob.name: get_bone_index(ob.data).names for ob in armatures}, bone_list)
+
+    plans = [(armature_object, report.bones[armature_object.name]) for armature_object in armatures]
+    missing_bones = report.missing
+    for armature_object, bone_list_formatted in plans:
+        with profile_phase("constraints"):
+            remove_constraints_targeting(armature_object, bone_list_formatted)
+
+    set_batch_mode(context, armatures, 'EDIT')
+
+    deleted_bones = 0
+    with profile_phase("delete"):
+        for armature_object, bone_list_formatted in plans:
+            deleted_bones += delete_edit_bones(armature_object.data.edit_bones, bone_list_formatted, reparent)
+
+    set_batch_mode(context, armatures, 'POSE')
+
+    for armature_object, bone_list_formatted in plans:
+        invalidate_bone_index(armature_object.data)
+
+    return sum(len(i[1]) for i in plans), missing_bones, deleted_bones
+
+# bones delete can change, the listed ones, their parents and children and bones with constraints on them
+def delete_snapshot_bones(armature_object, bone_list):
+    index = get_bone_index(armature_object.data)
+    matched = set(bone_list.match(index.names))
+    if not matched:
+        return set()
+    return with_neighbour_bones(index, matched) | find_constrained_bones(
+        armature_object, lambda i: getattr(i, "target", None) == armature_object and i.subtarget in matched)
+
+# adds target bones to every armature in one edit session and links the original bones to them
+# returns a list of (armature object, dict of original bone name to target bone name)
+def add_target_bones(context, armatures, bone_prefix, link_type):
+    set_batch_mode(context, armatures, 'EDIT')
+
+    # duplicates all bones with the target prefix
+    targets = []
+    for armature_object in armatures:
+        all_bones = list(get_bone_index(armature_object.data).names)
+        targets.append((armature_object, add_target_edit_bones(armature_object, all_bones, bone_prefix, link_type)))
+
+    set_batch_mode(context, armatures, 'POSE')
+
+    # adds constraints to original bones to target bones
+    for armature_object, (target_bones, new_bones) in targets:
+        invalidate_bone_index(armature_object.data)
+        link_target_bones(armature_object, target_bones, new_bones, link_type)
+
+    return [(armature_object, new_bones) for armature_object, (target_bones, new_bones) in targets]
+
+# splits bones into sources that need a target bone and source to target names of targets that can be reused,
+# bones the manifest lists as targets are never sources, targets are reused while the prefix is the same
+def get_target_sources(armature, bone_names, bone_prefix):
+    manifest = read_target_manifest(armature)
+    if manifest is None:
+        return list(bone_names), {}
+
+    names = set(bone_names)
+    known_targets = set(manifest["bones"].values())
+    target_bones = {}
+    if manifest.get("prefix") == bone_prefix:
+        target_bones = {i: j for i, j in manifest["bones"].items() if i in names and j in names}
+    count_bone_iterations(len(names))
+    return [i for i in bone_names if i not in known_targets and i not in target_bones], target_bones
+
+# duplicates bones that have no target bone yet with the target prefix and disables use deform on them,
+# needs edit mode, returns source to target names of every target bone and of the new ones
+def add_target_edit_bones(armature_object, bone_names, bone_prefix, link_type):
+    edit_bones = armature_object.data.edit_bones
+    sources, target_bones = get_target_sources(armature_object.data, bone_names, bone_prefix)
+    with profile_phase("duplicate"):
+        new_bones = duplicate_edit_bones(edit_bones, sources, bone_prefix)
+
+    with profile_phase("deform"):
+        count_bone_iterations(len(new_bones))
+        for i in new_bones.values():
+            edit_bones[i].use_deform = False
+
+    target_bones.update(new_bones)
+    write_target_manifest(armature_object.data, bone_prefix, link_type, target_bones)
+    return target_bones, new_bones
+
+# copies pose settings to the new target bones and links the original bones to every target bone,
+# needs pose or object mode
+def link_target_bones(armature_object, target_bones, new_bones, link_type):
+    with profile_phase("duplicate"):
+        copy_pose_bones(armature_object, new_bones)
+    with profile_phase("link"):
+        reconcile_link_constraints(armature_object, {i: (armature_object, j) for i, j in target_bones.items()},
+                                   link_type, "Target")
+    deselect_all_bones(armature_object.data)
+
+# custom property on armature data with the target bones made by add target bones, saved as JSON:
+# {"prefix": bone prefix, "link_type": link type, "bones": {source bone: target bone}}
+TARGET_MANIFEST_KEY = "rigging_tools_targets"
+
+# reads the target bone manifest of an armature, None if there isn't one
+def read_target_manifest(armature):
+    try:
+        manifest = json.loads(armature.get(TARGET_MANIFEST_KEY, ""))
+    except (TypeError, ValueError):
+        return None
+
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("bones"), dict):
+        return None
+    return manifest
+
+def write_target_manifest(armature, bone_prefix, link_type, target_bones):
+    armature[TARGET_MANIFEST_KEY] = json.dumps({"prefix": bone_prefix, "link_type": link_type,
+                                                "bones": target_bones})
+
+# what add target bones has to change in one armature since its last run
+class TargetBonesPlan:
+    def __init__(self):
+        # source bones that need a new target bone
+        self.create = []
+        # target bones whose source bone is gone
+        self.remove = []
+        # source to target name of target bones that stay
+        self.keep = {}
+        # kept source bones whose target no longer matches them
+        self.update = []
+        # source bones whose link constraints need checking
+        self.relink = []
+        # source to target name of the target bones made when the plan was applied
+        self.created = {}
+
+    def edits_bones(self):
+        return bool(self.create or self.remove or self.update)
+
+    # kept source bones whose target bone or link constraints had to change
+    def updated(self):
+        return set(self.update) | {i for i in self.relink if i in self.keep}
+
+# diffs the manifest against the armature's bones, only outside edit mode since it reads armature.bones
+# without a manifest, bones named prefix + an existing bone are taken over as its target
+def plan_target_bones(armature_object, bone_prefix, link_type):
+    armature = armature_object.data
+    index = get_bone_index(armature)
+    manifest = read_target_manifest(armature)
+    plan = TargetBonesPlan()
+
+    if manifest is None:
+        known = {i[len(bone_prefix):]: i for i in index.names
+                 if i.startswith(bone_prefix) and i[len(bone_prefix):] in index}
+        relink_all = True
+    elif manifest.get("prefix") != bone_prefix:
+        # the prefix changed, old targets go and every bone gets a new one
+        plan.remove = [i for i in manifest["bones"].values() if i in index]
+        known = {}
+        relink_all = True
+    else:
+        known = manifest["bones"]
+        relink_all = manifest.get("link_type") != link_type
+
+    count_bone_iterations(len(known))
+    for source, target in known.items():
+        if source not in index:
+            if target in index:
+                plan.remove.append(target)
+        elif target not in index:
+            plan.create.append(source)
+        else:
+            plan.keep[source] = target
+
+    # bones with the prefix are never sources, so targets don't get targets of their own,
+    # neither are targets that are being removed
+    targets = set(known.values()) | set(plan.remove)
+    count_bone_iterations(len(index))
+    plan.create.extend(i for i in index.names
+                       if i not in known and i not in targets and not i.startswith(bone_prefix))
+
+    # kept targets whose transform, length, parent or connection differs from their source
+    if plan.keep:
+        bones = armature.bones
+        count = len(bones)
+        matrices = np.empty(count * 16, dtype=np.float32)
+        lengths = np.empty(count, dtype=np.float32)
+        connected = np.empty(count, dtype=bool)
+        bones.foreach_get("matrix_local", matrices)
+        bones.foreach_get("length", lengths)
+        bones.foreach_get("use_connect", connected)
+        matrices = matrices.reshape(count, 16)
+
+        rows = {name: i for i, name in enumerate(index.names)}
+        sources = np.array([rows[i] for i in plan.keep], dtype=np.int64)
+        targets = np.array([rows[i] for i in plan.keep.values()], dtype=np.int64)
+        changed = (np.abs(matrices[sources] - matrices[targets]).max(axis=1) > 1e-4) | \
+            (np.abs(lengths[sources] - lengths[targets]) > 1e-4) | (connected[sources] != connected[targets])
+
+        for (source, target), moved in zip(plan.keep.items(), changed):
+            parent = index.parents.get(source)
+            if moved or index.parents.get(target) != plan.keep.get(parent, parent):
+                plan.update.append(source)
+
+    # the manifest says kept bones are linked, only the constraints of changed ones are checked so an update
+    # that changes nothing doesn't read every bone's constraints, a full run relinks every bone
+    if relink_all:
+        plan.relink = plan.create + list(plan.keep)
+    else:
+        constraint_types = LINK_CONSTRAINT_TYPES[link_type]
+        pose_bones = armature_object.pose.bones
+        count_bone_iterations(len(plan.update))
+        plan.relink = plan.create + [source for source in plan.update
+                                     if not has_target_links(pose_bones[source], armature_object, plan.keep[source],
+                                                             constraint_types)]
+    return plan
+
+# whether a source bone has the owned link constraints of every type following its target bone
+def has_target_links(pose_bone, armature_object, target, constraint_types):
+    found = {i.type for i in pose_bone.constraints
+             if is_owned_constraint(i, "Target") and i.target == armature_object and i.subtarget == target}
+    return found.issuperset(constraint_types)
+
+# makes the link constraints of source bones follow their target bone with the link type
+def relink_target_bones(armature_object, target_bones, link_type):
+    reconcile_link_constraints(armature_object, {i: (armature_object, j) for i, j in target_bones.items()},
+                               link_type, "Target")
+
+# bones an incremental update can change, removed and moved targets with their neighbours and relinked sources
+# new targets aren't in it since the snapshot removes bones made after it
+def target_snapshot_bones(armature_object, plan):
+    index = get_bone_index(armature_object.data)
+    bone_names = with_neighbour_bones(index, plan.remove) | {plan.keep[i] for i in plan.update} | set(plan.relink)
+    if plan.remove:
+        removed = set(plan.remove)
+        bone_names |= find_constrained_bones(
+            armature_object, lambda i: getattr(i, "target", None) == armature_object and i.subtarget in removed)
+    return bone_names
+
+# adds, updates and removes target bones so every bone has one, only edits what changed since the
+# manifest was written and only goes into edit mode if bones have to change
+# plans already made for armatures can be given by armature name
+# returns a list of (armature object, TargetBonesPlan)
+def update_target_bones(context, armatures, bone_prefix, link_type, plans=None):
+    ready_plans = plans or {}
+    with profile_phase("diff"):
+        plans = [(ob, ready_plans.get(ob.name) or plan_target_bones(ob, bone_prefix, link_type)) for ob in armatures]
+
+    edited = [(ob, plan) for ob, plan in plans if plan.edits_bones()]
+    if edited:
+        for armature_object, plan in edited:
+            if plan.remove:
+                remove_constraints_targeting(armature_object, plan.remove)
+
+        set_batch_mode(context, [ob for ob, plan in edited], 'EDIT')
+
+        for armature_object, plan in edited:
+            edit_bones = armature_object.data.edit_bones
+
+            with profile_phase("delete"):
+                delete_edit_bones(edit_bones, plan.remove)
+
+            with profile_phase("duplicate"):
+                plan.created = duplicate_edit_bones(edit_bones, plan.create, bone_prefix)
+
+                # moves changed targets back onto their source
+                copy_edit_bone_attributes(edit_bones, {i: plan.keep[i] for i in plan.update})
+
+            # parents of new and changed targets are the targets of their source's parent
+            target_bones = dict(plan.keep, **plan.created)
+            with profile_phase("parent"):
+                count_bone_iterations(len(plan.created) + len(plan.update))
+                for source in list(plan.created) + plan.update:
+                    edit_bone = edit_bones[target_bones[source]]
+                    parent = edit_bones[source].parent
+                    if parent is not None and parent.name in target_bones:
+                        parent = edit_bones[target_bones[parent.name]]
+                    edit_bone.parent = parent
+                    edit_bone.use_connect = edit_bones[source].use_connect
+
+            with profile_phase("deform"):
+                for source in list(plan.created) + plan.update:
+                    edit_bones[target_bones[source]].use_deform = False
+
+        set_batch_mode(context, [ob for ob, plan in edited], 'POSE')
+
+    for armature_object, plan in plans:
+        target_bones = dict(plan.keep, **plan.created)
+        if plan.edits_bones():
+            invalidate_bone_index(armature_object.data)
+            with profile_phase("duplicate"):
+                copy_pose_bones(armature_object, plan.created)
+            deselect_all_bones(armature_object.data)
+
+        with profile_phase("link"):
+            relink_target_bones(armature_object, {i: target_bones[i] for i in plan.relink}, link_type)
+
+        write_target_manifest(armature_object.data, bone_prefix, link_type, target_bones)
+
+    return plans
+
+# links bones in the base armature to matching bones in the target armatures
+# returns the match report, which is only made if it isn't given
+def link_armature_bones(base_object, target_objects, matcher=None, report=None):
+    if report is None:
+        with profile_phase("match"):
+            report = match_armature_bones(base_object, target_objects, matcher)
+
+    # base bones follow the matching bone in their target armature with copy transforms
+    # the base armature's links are replaced, so copy transforms from linking another armature
+    # are pointed at these ones and the ones of bones that don't match any more are removed
+    with profile_phase("link"):
+        changes = reconcile_link_constraints(
+            base_object, {base_bone: (i, target_bone) for i, base_bone, target_bone in report.pairs},
+            'link_TRANSFORM', "Weapon", all_bones=True)
+        report.reused = changes.reused
+        report.removed = changes.removed
+
+    return report
+
+# base bones a link run can change, the matched ones and the ones with weapon links it can remove
+def link_snapshot_bones(base_object, report):
+    return {base_bone for target_object, base_bone, target_bone in report.pairs} | find_constrained_bones(
+        base_object, lambda i: is_owned_constraint(i, "Weapon"))
+
+# refills the armature search of a scene, only when its armatures changed
 def arma_upd(self, context):
-    self.arma_coll.clear()
-    for ob in context.scene.objects:
-        if ob.type == 'ARMATURE':
-            item = self.arma_coll.add()
-            item.name = ob.name
-
-def bone_items(self, context):
-    arma = context.scene.objects.get(self.arma)
-    if arma is None:
+    names = [i[0] for i in get_armature_items(self.id_data)]
+    if [i.name for i in self.my_armature_names] == names:
         return
-    return [(bone.name, bone.name, "") for bone in arma.data.bones]
+    self.my_armature_names.clear()
+    for name in names:
+        item = self.my_armature_names.add()
+        item.name = name
+
+# the active object if it's an armature
+def active_armature(context):
+    active_object = context.active_object
+    if active_object is None or active_object.type != 'ARMATURE':
+        return None
+    return active_object
+
+# values the panel shows that take a loop over bones, each kept with the key it was made from
+# keys hold the cached bone indexes and files they were read from, so they change when those do
+panel_state_cache = {}
+
+def get_panel_state(name, key, compute):
+    cached = panel_state_cache.get(name)
+    if cached is None or cached[0] != key:
+        cached = panel_state_cache[name] = (key, compute())
+    return cached[1]
+
+# what delete or link would do, worked out from the bone indexes without changing anything
+class DryRunReport:
+    def __init__(self):
+        # armature object name to names of its bones that would be deleted or linked
+        self.bones = {}
+        # listed names that aren't in the armatures, or base bones that matched nothing
+        self.missing = 0
+        self.constraints = 0
+        self.conflicts = 0
+
+    @property
+    def count(self):
+        return sum(len(i) for i in self.bones.values())
+
+# bones the bone list would delete in each armature
+# bone_names is a dict of armature name to bone names, so this can run in the thread pool
+def dry_run_delete(bone_names, bone_list, progress=None):
+    report = DryRunReport()
+    for armature_number, (armature_name, all_bones) in enumerate(bone_names.items()):
+        if progress is not None:
+            progress(armature_number / len(bone_names))
+        report.bones[armature_name] = bone_list.match(all_bones)
+        report.missing += len(bone_list.missing(all_bones))
+    return report
+
+# base bones that would get constraints and the target bones they would follow
+def dry_run_link(base_object, target_objects, matcher):
+    match = match_armature_bones(base_object, target_objects, matcher)
+    report = DryRunReport()
+    report.bones[base_object.name] = {base_bone for target_object, base_bone, target_bone in match.pairs}
+    for target_object, base_bone, target_bone in match.pairs:
+        report.bones.setdefault(target_object.name, set()).add(target_bone)
+    report.missing = len(match.unmatched_base)
+    report.constraints = len(match.pairs)
+    report.conflicts = len(match.conflicts)
+    return report
+
+# what delete would do to the batch armatures
+# edit bones aren't indexed between redraws so there is no preview in edit mode
+def get_delete_preview(context):
+    mytool = context.scene.my_tool
+    if not mytool.my_bone_list_path:
+        return None
+
+    armatures = [ob for ob in get_batch_armatures(context) if not ob.data.is_editmode]
+    if not armatures:
+        return None
+
+    try:
+        bone_list = load_bone_list(mytool.my_bone_list_path)
+    except (OSError, ValueError, csv.Error, re.error):
+        return None
+
+    indexes = {ob.name: get_bone_index(ob.data) for ob in armatures}
+    key = (tuple(indexes.items()), bone_list)
+    return get_panel_state('delete', key,
+                           lambda: dry_run_delete({i: index.names for i, index in indexes.items()}, bone_list))
+
+# what link would do between the picked armatures
+def get_link_preview(context):
+    scene = context.scene
+    mytool = scene.my_tool
+    base_object = bpy.data.objects.get(scene.target_arm_armature)
+    target_object = bpy.data.objects.get(scene.target_weapon_armature)
+    if base_object is None or target_object is None or base_object.type != 'ARMATURE' or \
+            target_object.type != 'ARMATURE' or base_object.data.is_editmode or target_object.data.is_editmode:
+        return None
+
+    try:
+        remaps = load_cached_file(mytool.my_link_remap_path, read_remap_table) \
+            if mytool.my_link_remap_path else ()
+    except (OSError, ValueError, csv.Error, re.error):
+        return None
+
+    key = (base_object.name, get_bone_index(base_object.data), target_object.name,
+           get_bone_index(target_object.data), mytool.my_link_strip_prefixes, mytool.my_link_strip_suffixes, remaps)
+    return get_panel_state('link', key, lambda: dry_run_link(base_object, [target_object], get_link_matcher(mytool)))
+
+# overlay colors of the bones that would be deleted and linked
+PREVIEW_COLORS = {
+    'delete': (1.0, 0.25, 0.2, 1.0),
+    'link': (0.2, 0.6, 1.0, 1.0),
+}
+
+# line batch from head to tail of every bone in a preview report, drawn at the bones' rest position
+# kept with the report and armature matrices so it's only rebuilt when one of them changes
+def get_preview_batch(name, report, shader):
+    from gpu_extras.batch import batch_for_shader
+
+    armature_objects = [(bpy.data.objects.get(i), bone_names) for i, bone_names in report.bones.items()]
+    armature_objects = [(ob, bone_names) for ob, bone_names in armature_objects if ob is not None]
+    key = (report,) + tuple(tuple(i for row in ob.matrix_world for i in row) for ob, bone_names in armature_objects)
+
+    def compute():
+        coords = []
+        for ob, bone_names in armature_objects:
+            matrix = ob.matrix_world
+            bones = ob.data.bones
+            for bone_name in bone_names:
+                bone = bones.get(bone_name)
+                if bone is not None:
+                    coords.append(matrix @ bone.head_local)
+                    coords.append(matrix @ bone.tail_local)
+        return batch_for_shader(shader, 'LINES', {"pos": coords})
+
+    return get_panel_state(name + ' batch', key, compute)
+
+# viewport draw handler, only draws anything while preview is on
+def draw_preview_overlay():
+    context = bpy.context
+    if not context.scene.my_tool.my_show_preview:
+        return
+
+    import gpu
+
+    shader = gpu.shader.from_builtin('3D_UNIFORM_COLOR')
+    for name, report in (('delete', get_delete_preview(context)), ('link', get_link_preview(context))):
+        if report is None or not report.count:
+            continue
+        batch = get_preview_batch(name, report, shader)
+        shader.bind()
+        shader.uniform_float("color", PREVIEW_COLORS[name])
+        batch.draw(shader)
+
+# handle of the overlay draw handler while the add-on is registered
+preview_draw_handler = None
+
+# recipes are recorded operator runs that can be replayed on other armatures, saved as JSON:
+# {"version": 1, "steps": [{"operator": bl_idname, "settings": {property: value}, ...}]}
+# every step has all the settings its operator reads, so it doesn't depend on the scene it's played in
+RECIPE_VERSION = 1
+
+# settings each operator reads, besides bones and armatures which are stored in the step itself
+RECIPE_SETTINGS = {
+    "wm.delete_listed_bones": ("my_bone_list_path", "my_reparent_orphans"),
+    "wm.connect_selected_bones": ("my_parent_type", "my_new_bone_prefix", "my_use_deform", "my_add_ik_to_chain",
+                                  "my_elongate_end_of_chain", "my_elongate_value", "my_parent_using",
+                                  "my_link_bones", "my_link_type", "my_roll_mode", "my_chain_mode"),
+    "wm.set_parent": ("my_set_parent_type",),
+    "wm.clear_parent": (),
+    "wm.add_target_bones": ("my_target_bone_prefix", "my_target_link_type", "my_target_incremental"),
+    "wm.link_arm_to_weapon_armature": ("my_link_strip_prefixes", "my_link_strip_suffixes", "my_link_remap_path"),
+}
+
+# settings added after a recipe version came out, recipes saved before them get these
+RECIPE_SETTING_DEFAULTS = {
+    "my_roll_mode": 'roll_SOURCE',
+    "my_chain_mode": 'chain_SELECTED',
+}
+
+# steps recorded while recording is on, written to a recipe file by Save Recipe
+recorded_steps = []
+
+# a recipe step for an operator with its current settings, file paths are made absolute
+# so the recipe still finds them when it's played in another file
+def make_recipe_step(operator, mytool, **values):
+    settings = {}
+    for name in RECIPE_SETTINGS[operator]:
+        value = getattr(mytool, name)
+        if name.endswith('_path') and value:
+            value = os.path.normpath(bpy.path.abspath(value))
+        settings[name] = value
+    return dict(operator=operator, settings=settings, **values)
+
+# records a successful run of an operator as a recipe step while recording is on
+# the step is made before the operator runs since it changes the selection
+def recorded(execute):
+    @functools.wraps(execute)
+    def wrapper(self, context):
+        step = self.recipe_step(context) if context.scene.my_tool.my_record_recipe else None
+        result = execute(self, context)
+        if step is not None and result == {'FINISHED'}:
+            recorded_steps.append(step)
+        return result
+
+    return wrapper
+
+# reads the steps of a recipe file, checks every step has the settings its operator needs
+def read_recipe(path):
+    with open(path, "r", encoding="utf-8") as opened_file:
+        recipe = json.load(opened_file)
+
+    if not isinstance(recipe, dict) or recipe.get("version") != RECIPE_VERSION:
+        raise ValueError("Not a version %d recipe" % RECIPE_VERSION)
+
+    steps = recipe.get("steps", [])
+    for number, step in enumerate(steps, 1):
+        operator = step.get("operator") if isinstance(step, dict) else None
+        if operator not in RECIPE_SETTINGS:
+            raise ValueError("Step %d has an unknown operator %r" % (number, operator))
+        settings = step.setdefault("settings", {})
+        for name in RECIPE_SETTINGS[operator]:
+            if name in RECIPE_SETTING_DEFAULTS:
+                settings.setdefault(name, RECIPE_SETTING_DEFAULTS[name])
+        missing = set(RECIPE_SETTINGS[operator]).difference(settings)
+        if missing:
+            raise ValueError("Step %d (%s) is missing settings: %s" % (number, operator, ", ".join(sorted(missing))))
+
+    return steps
+
+# loads a recipe file, reuses the parsed steps if the file hasn't changed
+def load_recipe(path):
+    return load_cached_file(path, read_recipe)
+
+def write_recipe(path, steps):
+    with open(path, "w", encoding="utf-8") as opened_file:
+        json.dump({"version": RECIPE_VERSION, "steps": steps}, opened_file, indent=4)
+
+# bone names of a step in the order they're listed, entries with * ? or [ and re: entries are patterns
+# that match bones in armature order, names the armature doesn't have are left out
+def resolve_recipe_bones(index, entries):
+    bone_names = []
+    for entry in entries:
+        bone_list = BoneList()
+        bone_list.add(entry)
+        if bone_list.pattern_sources:
+            matched = bone_list.compile().match(index.names)
+            bone_names.extend(i for i in index.names if i in matched and i not in bone_names)
+        elif entry in index and entry not in bone_names:
+            bone_names.append(entry)
+    return bone_names
+
+# part of a recipe step that runs in edit or pose mode, or None for parts that set their own mode
+# removes_bones and reads_bones keep parts in their recorded order where moving them would change the result
+class RecipePart:
+    def __init__(self, step, mode, function, removes_bones=False, reads_bones=False):
+        self.step = step
+        self.mode = mode
+        self.function = function
+        self.removes_bones = removes_bones
+        self.reads_bones = reads_bones
+
+# orders parts so edit parts run together, an edit part that doesn't remove bones moves before the pose
+# parts of earlier steps, unless one of them reads bone names and would see bones it didn't before
+def schedule_recipe_parts(parts):
+    scheduled = []
+    for part in parts:
+        position = len(scheduled)
+        if part.mode == 'EDIT' and not part.removes_bones:
+            while position > 0 and scheduled[position - 1].mode == 'POSE' and \
+                    not scheduled[position - 1].reads_bones and scheduled[position - 1].step is not part.step:
+                position -= 1
+        scheduled.insert(position, part)
+    return scheduled
+
+# state shared by the parts of a recipe while it plays
+class RecipeRun:
+    def __init__(self, context, armatures):
+        self.context = context
+        self.armatures = armatures
+        self.mode = None
+        self.indexes = {}
+        self.warnings = []
+
+    # bone index of an armature, shared by every part until a part changes its bones
+    def index(self, armature_object):
+        index = self.indexes.get(armature_object.name)
+        if index is None:
+            index = self.indexes[armature_object.name] = get_bone_index(armature_object.data)
+        return index
+
+    # called after a part adds, removes or reparents bones
+    def changed(self, armature_object):
+        self.indexes.pop(armature_object.name, None)
+        invalidate_bone_index(armature_object.data)
+
+    def set_mode(self, mode):
+        if mode != self.mode:
+            set_batch_mode(self.context, self.armatures, mode)
+            self.mode = mode
+
+def recipe_delete_parts(step, settings):
+    bone_list = load_bone_list(settings.my_bone_list_path)
+    plans = {}
+
+    def match(run):
+        for armature_object in run.armatures:
+            with profile_phase("match"):
+                plans[armature_object.name] = bone_list.match(run.index(armature_object).names)
+            with profile_phase("constraints"):
+                remove_constraints_targeting(armature_object, plans[armature_object.name])
+
+    def delete(run):
+        with profile_phase("delete"):
+            for armature_object in run.armatures:
+                delete_edit_bones(armature_object.data.edit_bones, plans[armature_object.name],
+                                  settings.my_reparent_orphans)
+                run.changed(armature_object)
+
+    return [RecipePart(step, 'POSE', match, reads_bones=True),
+            RecipePart(step, 'EDIT', delete, removes_bones=True)]
+
+def recipe_connect_parts(step, settings):
+    chains = []
+
+    def connect(run):
+        for armature_object in run.armatures:
+            index = run.index(armature_object)
+            bone_chains = get_bone_chains(index, resolve_recipe_bones(index, step.get("bones", [])),
+                                          settings.my_chain_mode)
+            if not bone_chains:
+                run.warnings.append("%s has none of the bones to connect" % armature_object.name)
+                continue
+            chains.append((armature_object, bone_chains,
+                           connect_edit_bones(armature_object, bone_chains, settings)))
+            run.changed(armature_object)
+
+    def link(run):
+        for armature_object, bone_chains, new_bones in chains:
+            connect_pose_bones(armature_object, bone_chains, new_bones, settings)
+
+    return [RecipePart(step, 'EDIT', connect), RecipePart(step, 'POSE', link)]
+
+def recipe_set_parent_parts(step, settings):
+    def parent(run):
+        parent_name = step.get("parent", "")
+        for armature_object in run.armatures:
+            index = run.index(armature_object)
+            if parent_name not in index:
+                run.warnings.append("%s has no parent bone %s" % (armature_object.name, parent_name))
+                continue
+            selected_bones = resolve_recipe_bones(index, step.get("bones", []))
+            cycles = find_parent_cycles(index, selected_bones, parent_name)
+            with profile_phase("parent"):
+                set_edit_bone_parents(armature_object.data.edit_bones, [i for i in selected_bones if i not in cycles],
+                                      parent_name, settings.my_set_parent_type == 'parent_CONNECTED')
+            run.changed(armature_object)
+
+    return [RecipePart(step, 'EDIT', parent)]
+
+def recipe_clear_parent_parts(step, settings):
+    def clear(run):
+        for armature_object in run.armatures:
+            selected_bones = resolve_recipe_bones(run.index(armature_object), step.get("bones", []))
+            with profile_phase("parent"):
+                clear_edit_bone_parents(armature_object.data.edit_bones, selected_bones)
+            run.changed(armature_object)
+
+    return [RecipePart(step, 'EDIT', clear)]
+
+def recipe_target_parts(step, settings):
+    bone_prefix = settings.my_target_bone_prefix
+    link_type = settings.my_target_link_type
+
+    # incremental updates decide themselves if they need edit mode, the diff needs edit mode left
+    if settings.my_target_incremental:
+        def update(run):
+            if run.mode == 'EDIT':
+                run.set_mode('POSE')
+            update_target_bones(run.context, run.armatures, bone_prefix, link_type)
+            run.mode = None
+            run.indexes.clear()
+
+        return [RecipePart(step, None, update, removes_bones=True, reads_bones=True)]
+
+    targets = {}
+
+    def duplicate(run):
+        for armature_object in run.armatures:
+            targets[armature_object.name] = add_target_edit_bones(
+                armature_object, list(run.index(armature_object).names), bone_prefix, link_type)
+            run.changed(armature_object)
+
+    def link(run):
+        for armature_object in run.armatures:
+            link_target_bones(armature_object, *targets[armature_object.name], link_type)
+
+    return [RecipePart(step, 'EDIT', duplicate), RecipePart(step, 'POSE', link)]
+
+def recipe_link_parts(step, settings):
+    matcher = get_link_matcher(settings)
+
+    def link(run):
+        base_object = bpy.data.objects.get(step.get("base", ""))
+        target_objects = [bpy.data.objects.get(i) for i in step.get("targets", [])]
+        if base_object is None or not target_objects or None in target_objects:
+            run.warnings.append("Couldn't find armatures %s and %s" % (step.get("base"), step.get("targets")))
+            return
+        link_armature_bones(base_object, target_objects, matcher)
+
+    return [RecipePart(step, 'POSE', link, reads_bones=True)]
+
+RECIPE_PARTS = {
+    "wm.delete_listed_bones": recipe_delete_parts,
+    "wm.connect_selected_bones": recipe_connect_parts,
+    "wm.set_parent": recipe_set_parent_parts,
+    "wm.clear_parent": recipe_clear_parent_parts,
+    "wm.add_target_bones": recipe_target_parts,
+    "wm.link_arm_to_weapon_armature": recipe_link_parts,
+}
+
+# (armature object, bone names) entries of the bones recipe steps can change, found from the armatures
+# before the recipe runs, bones a step makes are removed on rollback so later steps only add bones that
+# are there now, target bone steps can relink any bone so they need every bone
+def recipe_snapshot_bones(armatures, steps):
+    snapshot_bones = []
+    for step in steps:
+        settings = types.SimpleNamespace(**step["settings"])
+        operator = step["operator"]
+
+        if operator == "wm.add_target_bones":
+            snapshot_bones.extend((ob, None) for ob in armatures)
+        elif operator == "wm.delete_listed_bones":
+            bone_list = load_bone_list(settings.my_bone_list_path)
+            snapshot_bones.extend((ob, delete_snapshot_bones(ob, bone_list)) for ob in armatures)
+        elif operator == "wm.link_arm_to_weapon_armature":
+            base_object = bpy.data.objects.get(step.get("base", ""))
+            target_objects = [bpy.data.objects.get(i) for i in step.get("targets", [])]
+            if base_object is not None and target_objects and None not in target_objects:
+                report = match_armature_bones(base_object, target_objects, get_link_matcher(settings))
+                snapshot_bones.append((base_object, link_snapshot_bones(base_object, report)))
+        elif operator == "wm.connect_selected_bones":
+            for ob in armatures:
+                index = get_bone_index(ob.data)
+                chains = get_bone_chains(index, resolve_recipe_bones(index, step.get("bones", [])),
+                                         settings.my_chain_mode)
+                snapshot_bones.append((ob, {j for i in chains for j in i}))
+        else:
+            # parenting steps only change the bones they name
+            snapshot_bones.extend((ob, resolve_recipe_bones(get_bone_index(ob.data), step.get("bones", [])))
+                                  for ob in armatures)
+    return snapshot_bones
+
+# plays recipe steps on armatures, files the steps read are read before anything changes
+# returns warnings for armatures a step couldn't run on
+def play_recipe(context, armatures, steps):
+    parts = []
+    for step in steps:
+        settings = types.SimpleNamespace(**step["settings"])
+        parts.extend(RECIPE_PARTS[step["operator"]](step, settings))
+
+    run = RecipeRun(context, armatures)
+    for part in schedule_recipe_parts(parts):
+        if part.mode is not None:
+            run.set_mode(part.mode)
+        part.function(run)
+    if run.mode == 'EDIT':
+        run.set_mode('POSE')
+
+    for armature_object in armatures:
+        invalidate_bone_index(armature_object.data)
+    return run.warnings
+
+# thread pool for parsing files and matching bone names, made when it's first needed
+thread_pool = None
+
+def get_thread_pool():
+    global thread_pool
+    if thread_pool is None:
+        thread_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+    return thread_pool
+
+class BackgroundJobCancelled(Exception):
+    pass
+
+# a function running in the thread pool, it gets the job as its first argument to report progress
+# the function can't touch blender data, it only gets names and paths copied on the main thread
+class BackgroundJob:
+    def __init__(self, function, *args):
+        self.progress = 0.0
+        self.cancelled = threading.Event()
+        self.future = get_thread_pool().submit(function, self, *args)
+
+    # called by the function, stops it by raising once the job is cancelled
+    def update(self, progress):
+        if self.cancelled.is_set():
+            raise BackgroundJobCancelled()
+        self.progress = progress
+
+    def cancel(self):
+        self.cancelled.set()
+        self.future.cancel()
+
+# reads the bone list and matches it against bone names copied from the armatures
+def plan_delete_job(job, path, bone_names):
+    bone_list = load_bone_list(path)
+    job.update(0.5)
+    return bone_list, dry_run_delete(bone_names, bone_list, lambda i: job.update(0.5 + i * 0.5))
+
+# reads the remap table and matches bone names copied from the base and target armatures
+def plan_link_job(job, remap_path, strip_prefixes, strip_suffixes, base_names, target_names):
+    remaps = load_cached_file(remap_path, read_remap_table) if remap_path else ()
+    job.update(0.25)
+    matcher = BoneNameMatcher(strip_prefixes, strip_suffixes, remaps)
+    return matcher, plan_bone_links(base_names, target_names, matcher, lambda i: job.update(0.25 + i * 0.75))
 
 # ------------------------------------------------------------------------
 #    Operators
 # ------------------------------------------------------------------------
 
-class WM_OT_DeleteListedBones(Operator):
+# runs the slow part of an operator in the thread pool when it's started from the UI
+# start_job returns a BackgroundJob, or None to run execute right away
+# execute gets the job's result from get_job_result, scripts calling execute don't use the pool
+class BackgroundJobOperator:
+    def invoke(self, context, event):
+        self.job = self.start_job(context)
+        if self.job is None:
+            return self.execute(context)
+
+        wm = context.window_manager
+        self.timer = wm.event_timer_add(0.1, window=context.window)
+        wm.modal_handler_add(self)
+        wm.progress_begin(0, 100)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            self.job.cancel()
+            self.finish_job(context)
+            self.report({'INFO'}, "%s cancelled" % self.bl_label)
+            return {'CANCELLED'}
+
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+
+        if not self.job.future.done():
+            context.window_manager.progress_update(int(self.job.progress * 100))
+            context.workspace.status_text_set("%s: %d%%, Esc to cancel" % (self.bl_label, self.job.progress * 100))
+            return {'PASS_THROUGH'}
+
+        self.finish_job(context)
+        try:
+            self.job_result = self.job.future.result()
+        except (OSError, ValueError, csv.Error, re.error) as error:
+            self.report({'ERROR'}, "Couldn't read %s: %s" % (self.job_file, error))
+            return {'CANCELLED'}
+        except Exception as error:
+            # nothing was changed yet, the job only reads
+            self.report({'ERROR'}, "%s failed: %s: %s" % (self.bl_label, type(error).__name__, error))
+            return {'CANCELLED'}
+
+        # only applying the result runs on the main thread
+        return self.execute(context)
+
+    def finish_job(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self.timer)
+        wm.progress_end()
+        context.workspace.status_text_set(None)
+
+    # names of the armatures the job read and the bone indexes it read them from
+    def set_job_armatures(self, armature_objects):
+        self.job_indexes = {ob.name: get_bone_index(ob.data) for ob in armature_objects}
+        return {name: index.names for name, index in self.job_indexes.items()}
+
+    # the job's result, or None if there was no job or any of the armatures changed while it ran
+    def peek_job_result(self, armature_objects):
+        job_result = getattr(self, 'job_result', None)
+        job_indexes = getattr(self, 'job_indexes', {})
+        if job_result is None or len(job_indexes) != len(armature_objects) or \
+                any(job_indexes.get(ob.name) is not get_bone_index(ob.data) for ob in armature_objects):
+            return None
+        return job_result
+
+    # same as peek_job_result, the result is only used once
+    def get_job_result(self, armature_objects):
+        job_result = self.peek_job_result(armature_objects)
+        self.job_result = None
+        return job_result
+
+class WM_OT_DeleteListedBones(BackgroundJobOperator, Operator):
     """Delete bones listed in a text file"""
     bl_label = "Delete Listed Bones"
     bl_idname = "wm.delete_listed_bones"
-
+    bl_options = {'REGISTER', 'UNDO'}
+
+    job_file = "bone list"
+
+    # listed bones with their parents and children and the bones with constraints on them,
+    # nothing if the bone list can't be read since execute stops before changing anything
+    def snapshot_bones(self, context):
+        armatures = get_batch_armatures(context)
+        job_result = self.peek_job_result(armatures)
+        try:
+            bone_list = job_result[0] if job_result is not None else \
+                load_bone_list(context.scene.my_tool.my_bone_list_path)
+        except (OSError, ValueError, csv.Error, re.error):
+            return []
+        return [(ob, delete_snapshot_bones(ob, bone_list)) for ob in armatures]
+
+    def recipe_step(self, context):
+        return make_recipe_step(self.bl_idname, context.scene.my_tool)
+
+    # parses the bone list and matches it against the armatures' bone names in the thread pool
+    def start_job(self, context):
+        mytool = context.scene.my_tool
+        armatures = get_batch_armatures(context)
+        if not mytool.my_bone_list_path or not armatures or any(ob.data.is_editmode for ob in armatures):
+            return None
+
+        path = os.path.normpath(bpy.path.abspath(mytool.my_bone_list_path))
+        return BackgroundJob(plan_delete_job, path, self.set_job_armatures(armatures))
+
+    @profiled
+    @recorded
+    @transaction
     def execute(self, context):
-        scene = context.scene
-        mytool = scene.my_tool
-        active_object = bpy.context.active_object
-        bone_list_formatted = []
+        mytool = context.scene.my_tool
+        armatures = get_batch_armatures(context)
 
-        bpy.ops.object.mode_set(mode='EDIT')
-        bpy.ops.armature.select_all(action='DESELECT')
+        # get bones from list, the background job already did if it ran
+        job_result = self.get_job_result(armatures)
+        if job_result is not None:
+            bone_list, report = job_result
+        else:
+            report = None
+            try:
+                bone_list = load_bone_list(mytool.my_bone_list_path)
+            except (OSError, ValueError, csv.Error, re.error) as error:
+                self.report({'ERROR'}, "Couldn't read bone list: %s" % error)
+                return {'CANCELLED'}
 
-        # get bones from list
-        opened_file = open(mytool.my_bone_list_path, "r")
-        bone_list = opened_file.readlines()
+        if not use_fast_mode(mytool):
+            return self.execute_ops(context, bone_list)
+
+        if not armatures:
+            self.report({'WARNING'}, "No armatures to process")
+            return {'CANCELLED'}
+
+        matched_bones, missing_bones, deleted_bones = delete_listed_bones(
+            context, armatures, bone_list, mytool.my_reparent_orphans, report)
+
+        self.report({'INFO'}, "Matched %d bones, %d missing, %d deleted in %d armatures" %
+                    (matched_bones, missing_bones, deleted_bones, len(armatures)))
+
+        return {'FINISHED'}
 
-        # removes \n
-        for i in bone_list:
-            bone_list_formatted.append(i.strip())
+    # deletes bones of the active armature by selecting them, kept as a fallback
+    def execute_ops(self, context, bone_list):
+        active_object = bpy.context.active_object
 
         # gets all bones
         all_bones = get_all_bones()
 
         # compares all bones list to bone list and only keeps matching bones
-        bone_list_formatted = list(set(bone_list_formatted) & set(all_bones))
+        with profile_phase("match"):
+            bone_list_formatted = bone_list.match(all_bones)
+            missing_bones = bone_list.missing(all_bones)
 
-        bpy.ops.object.mode_set(mode='POSE')
-        bpy.ops.pose.select_all(action='DESELECT')
+        profiled_ops.object.mode_set(mode='POSE')
+        profiled_ops.pose.select_all(action='DESELECT')
 
         # delete bones using list
-        for i in bone_list_formatted:
-            active_object.data.bones[i].select = True
+        with profile_phase("delete"):
+            count_bone_iterations(len(bone_list_formatted))
+            for i in bone_list_formatted:
+                active_object.data.bones[i].select = True
+
+            profiled_ops.object.mode_set(mode='EDIT')
+            profiled_ops.armature.delete()
 
-        bpy.ops.object.mode_set(mode='EDIT')
-        bpy.ops.armature.delete()
+        profiled_ops.object.mode_set(mode='POSE')
+        invalidate_bone_index(active_object.data)
 
-        bpy.ops.object.mode_set(mode='POSE')
+        self.report({'INFO'}, "Matched %d bones, %d missing, %d deleted" %
+                    (len(bone_list_formatted), len(missing_bones), len(bone_list_formatted)))
 
         return {'FINISHED'}
 
@@ -262,188 +3003,222 @@ class WM_OT_ConnectSelectedBones(Operator):
     """Generates and connects generated bones selected"""
     bl_label = "Connect Selected Bones"
     bl_idname = "wm.connect_selected_bones"
-
+    bl_options = {'REGISTER', 'UNDO'}
+
+    # only the bones of the chains change, the new bones are removed when restoring
+    def snapshot_bones(self, context):
+        chain_mode = context.scene.my_tool.my_chain_mode
+        return [(ob, {j for i in get_bone_chains(get_bone_index(ob.data), get_selected_bone_names(ob.data), chain_mode)
+                      for j in i})
+                for ob in get_batch_armatures(context)]
+
+    # the chain is stored by bone names of the active armature
+    def recipe_step(self, context):
+        active_object = context.view_layer.objects.active
+        bone_names = get_selected_bone_names(active_object.data) \
+            if active_object is not None and active_object.type == 'ARMATURE' else []
+        return make_recipe_step(self.bl_idname, context.scene.my_tool, bones=bone_names)
+
+    @profiled
+    @recorded
+    @transaction
     def execute(self, context):
-        scene = context.scene
-        mytool = scene.my_tool
-        active_object = bpy.context.active_object
-
-        # get prefix from input
-        bone_prefix = mytool.my_new_bone_prefix
+        mytool = context.scene.my_tool
 
-        bpy.ops.object.mode_set(mode='EDIT')
+        # the operator path only builds the one chain of selected bones
+        if use_fast_mode(mytool) or mytool.my_chain_mode != 'chain_SELECTED':
+            return self.execute_data(context)
 
-        # gets selected bones into list
-        selected_bones = get_selected_bones()
+        return self.execute_ops(context)
 
-        # parent based on selected or hierarchy
-        if bpy.context.scene.my_tool.my_parent_using == 'parent_HIERARCHY':
-            # duplicates selected bones
-            bpy.ops.armature.duplicate(do_flip_names=False)
+    # builds the chains with bone data in one edit session, same result as execute_ops
+    def execute_data(self, context):
+        mytool = context.scene.my_tool
 
-            # gets dupped bones and adds prefix
-            for i in selected_bones:
-                bpy.context.object.pose.bones[i + '.001'].name = bone_prefix + i
-                bpy.ops.armature.select_all(action='DESELECT')
-        else:
-            bpy.ops.armature.select_all(action='DESELECT')
+        armatures = get_batch_armatures(context)
+        if not armatures:
+            self.report({'WARNING'}, "No armatures to process")
+            return {'CANCELLED'}
 
-            for i in selected_bones:
-                bpy.ops.object.mode_set(mode='POSE')
-                active_object.data.bones[i].select = True
+        # chains are found with the cached bone index, bones don't change when switching mode
+        indexes = {armature_object: get_bone_index(armature_object.data) for armature_object in armatures}
 
-                bpy.ops.object.mode_set(mode='EDIT')
-                bpy.ops.armature.duplicate(do_flip_names=False)
+        set_batch_mode(context, armatures, 'EDIT')
 
-                # gets dupped bones and adds prefix
-                bpy.context.object.pose.bones.get(i + '.001').name = bone_prefix + i
-                bpy.ops.armature.select_all(action='DESELECT')
+        # gets selected bones of every armature and builds all of their chains in one pass
+        chains = []
+        for armature_object in armatures:
+            bone_chains = get_bone_chains(indexes[armature_object], get_selected_edit_bones(armature_object.data),
+                                          mytool.my_chain_mode)
+            if bone_chains:
+                new_bones = connect_edit_bones(armature_object, bone_chains, mytool)
+                chains.append((armature_object, bone_chains, new_bones))
 
-        # connect bones
-        for i, elem in enumerate(selected_bones):
-            try:
-                # set 3d cursor to head of next bone in list
-                bpy.ops.object.mode_set(mode='POSE')
-                active_object.data.bones[str(selected_bones[i+1])].select_head = True
-                bpy.ops.object.mode_set(mode='EDIT')
-                bpy.ops.view3d.snap_cursor_to_selected()
-
-                # snaps current bone in list to 3d cusor
-                bpy.ops.armature.select_all(action='DESELECT')
-                bpy.ops.object.mode_set(mode='POSE')
-                active_object.data.bones[bone_prefix + elem].select_tail = True
-                bpy.ops.object.mode_set(mode='EDIT')
-                bpy.ops.view3d.snap_selected_to_cursor(use_offset=False)
-                bpy.ops.armature.select_all(action='DESELECT')
-            except IndexError:
-                pass
+        set_batch_mode(context, armatures, 'POSE')
 
-        # parent new bones
-        for i, elem in enumerate(selected_bones):
-            try:
-                bpy.ops.object.mode_set(mode='POSE')
-                bpy.ops.pose.select_all(action='DESELECT')
-                bpy.ops.object.mode_set(mode='EDIT')
+        for armature_object, bone_chains, new_bones in chains:
+            invalidate_bone_index(armature_object.data)
+            connect_pose_bones(armature_object, bone_chains, new_bones, mytool)
 
-                # parents next bone to this bone
-                active_object.data.edit_bones[bone_prefix + str(selected_bones[i + 1])].parent = \
-                    active_object.data.edit_bones[bone_prefix + elem]
+        if not chains:
+            self.report({'WARNING'}, "No bones selected")
+            return {'CANCELLED'}
 
-                # make parents connected if user chooses
-                if bpy.context.scene.my_tool.my_parent_type == 'parent_CONNECTED':
-                    active_object.data.edit_bones[bone_prefix + str(selected_bones[i + 1])].use_connect = True
+        renamed_bones = sum(count_renamed_bones(new_bones, mytool.my_new_bone_prefix)
+                            for armature_object, bone_chains, new_bones in chains)
+        if renamed_bones:
+            self.report({'WARNING'}, "%d new bone names were taken, those bones got a number suffix" %
+                        renamed_bones)
 
-                bpy.ops.armature.select_all(action='DESELECT')
-            except IndexError:
-                pass
+        return {'FINISHED'}
 
-        # set roll from original bone
-        for i in selected_bones:
-            try:
-                bpy.ops.object.mode_set(mode='POSE')
-                bpy.ops.pose.select_all(action='DESELECT')
+    # builds the chain with operators, slower but kept as a fallback
+    def execute_ops(self, context):
+        scene = context.scene
+        mytool = scene.my_tool
+        active_object = bpy.context.active_object
 
-                # set roll of new bone to original bone
-                active_object.data.bones[bone_prefix + i].select = True
-                active_object.data.bones[i].select = True
-                bpy.context.object.data.bones.active = bpy.context.object.pose.bones[i].bone
+        # get prefix from input
+        bone_prefix = mytool.my_new_bone_prefix
 
-                bpy.ops.object.mode_set(mode='EDIT')
+        # the 3d cursor is used to snap bones, puts it back afterwards
+        cursor_location = scene.cursor.location.copy()
 
-                bpy.ops.armature.calculate_roll(type='ACTIVE')
+        profiled_ops.object.mode_set(mode='EDIT')
 
-            except IndexError:
-                pass
+        # gets selected bones into list
+        selected_bones = get_selected_bones()
 
-        # links original bones to new bones
-        if bpy.context.scene.my_tool.my_link_bones:
-            if bpy.context.scene.my_tool.my_link_type == 'link_PARENTS':
-                # links bones with parenting
-                for i in selected_bones:
-                    try:
-                        bpy.ops.object.mode_set(mode='POSE')
-                        bpy.ops.pose.select_all(action='DESELECT')
-                        bpy.ops.object.mode_set(mode='EDIT')
-
-                        # parents original bone to new bone
-                        active_object.data.edit_bones[i].parent = \
-                            active_object.data.edit_bones[bone_prefix + i]
-
-                        bpy.ops.armature.select_all(action='DESELECT')
-                        bpy.ops.object.mode_set(mode='POSE')
-                    except IndexError:
-                        pass
-            elif bpy.context.scene.my_tool.my_link_type == 'link_TRANSFORM':
-                # links bones with copy transform
-                for i in selected_bones:
-                    try:
-                        bpy.ops.object.mode_set(mode='POSE')
-                        bpy.ops.pose.select_all(action='DESELECT')
+        # duplicates selected bones with the prefix, keeps their hierarchy if parenting by hierarchy
+        # new_bones maps each selected bone to its new bone for every step after this
+        with profile_phase("duplicate"):
+            new_bones = duplicate_edit_bones(active_object.data.edit_bones, selected_bones, bone_prefix,
+                                             mytool.my_parent_using == 'parent_HIERARCHY')
+            profiled_ops.armature.select_all(action='DESELECT')
 
-                        # links bones with copy transform
-                        active_object.data.bones[bone_prefix + i].select = True
-                        active_object.data.bones[i].select = True
-                        bpy.context.object.data.bones.active = bpy.context.object.pose.bones[i].bone
+            # pose bones of new bones only exist after leaving edit mode
+            profiled_ops.object.mode_set(mode='POSE')
+            copy_pose_bones(active_object, new_bones)
 
-                        bpy.ops.object.mode_set(mode='EDIT')
-                        bpy.ops.object.mode_set(mode='POSE')
+        # connect bones
+        with profile_phase("connect"):
+            count_bone_iterations(len(selected_bones))
+            for i, elem in enumerate(selected_bones):
+                try:
+                    # set 3d cursor to head of next bone in list
+                    profiled_ops.object.mode_set(mode='POSE')
+                    active_object.data.bones[str(selected_bones[i+1])].select_head = True
+                    profiled_ops.object.mode_set(mode='EDIT')
+                    profiled_ops.view3d.snap_cursor_to_selected()
+
+                    # snaps current bone in list to 3d cusor
+                    profiled_ops.armature.select_all(action='DESELECT')
+                    profiled_ops.object.mode_set(mode='POSE')
+                    active_object.data.bones[new_bones[elem]].select_tail = True
+                    profiled_ops.object.mode_set(mode='EDIT')
+                    profiled_ops.view3d.snap_selected_to_cursor(use_offset=False)
+                    profiled_ops.armature.select_all(action='DESELECT')
+                except IndexError:
+                    pass
 
-                        bpy.ops.pose.constraint_add_with_targets(type='COPY_TRANSFORMS')
+        # parent new bones
+        with profile_phase("parent"):
+            count_bone_iterations(len(selected_bones))
+            for i, elem in enumerate(selected_bones):
+                try:
+                    profiled_ops.object.mode_set(mode='POSE')
+                    profiled_ops.pose.select_all(action='DESELECT')
+                    profiled_ops.object.mode_set(mode='EDIT')
 
-                        bpy.ops.pose.select_all(action='DESELECT')
-                    except IndexError:
-                        pass
-            else:
-                # links bones with copy loc & rot
-                for i in selected_bones:
-                    try:
-                        bpy.ops.object.mode_set(mode='POSE')
-                        bpy.ops.pose.select_all(action='DESELECT')
+                    # parents next bone to this bone
+                    active_object.data.edit_bones[new_bones[selected_bones[i + 1]]].parent = \
+                        active_object.data.edit_bones[new_bones[elem]]
 
-                        # links bones with copy transform
-                        active_object.data.bones[bone_prefix + i].select = True
-                        active_object.data.bones[i].select = True
-                        bpy.context.object.data.bones.active = bpy.context.object.pose.bones[i].bone
+                    # make parents connected if user chooses
+                    if bpy.context.scene.my_tool.my_parent_type == 'parent_CONNECTED':
+                        active_object.data.edit_bones[new_bones[selected_bones[i + 1]]].use_connect = True
 
-                        bpy.ops.object.mode_set(mode='EDIT')
-                        bpy.ops.object.mode_set(mode='POSE')
+                    profiled_ops.armature.select_all(action='DESELECT')
+                except IndexError:
+                    pass
 
-                        bpy.ops.pose.constraint_add_with_targets(type='COPY_ROTATION')
-                        bpy.ops.pose.constraint_add_with_targets(type='COPY_LOCATION')
+        # set roll from original bone
+        with profile_phase("roll"):
+            # rolls every new bone at once from the edit bones, doesn't depend on which bones are selected
+            profiled_ops.object.mode_set(mode='EDIT')
+            geometry = BoneGeometry(active_object.data.edit_bones)
+            roll_chains(geometry, [selected_bones], new_bones, mytool.my_roll_mode)
+            geometry.write_rolls(active_object.data.edit_bones)
 
-                        bpy.ops.pose.select_all(action='DESELECT')
-                    except IndexError:
-                        pass
-        else:
-            bpy.ops.object.mode_set(mode='POSE')
+        # links original bones to new bones
+        with profile_phase("link"):
+            if bpy.context.scene.my_tool.my_link_bones:
+                count_bone_iterations(len(selected_bones))
+                if bpy.context.scene.my_tool.my_link_type == 'link_PARENTS':
+                    # links bones with parenting
+                    for i in selected_bones:
+                        try:
+                            profiled_ops.object.mode_set(mode='POSE')
+                            profiled_ops.pose.select_all(action='DESELECT')
+                            profiled_ops.object.mode_set(mode='EDIT')
+
+                            # parents original bone to new bone
+                            active_object.data.edit_bones[i].parent = \
+                                active_object.data.edit_bones[new_bones[i]]
+
+                            profiled_ops.armature.select_all(action='DESELECT')
+                            profiled_ops.object.mode_set(mode='POSE')
+                        except IndexError:
+                            pass
+                else:
+                    # links bones with copy transforms or copy loc & rot, the constraints are added directly
+                    # like the fast path does, constraint_add_with_targets needs a selection round trip per bone
+                    profiled_ops.object.mode_set(mode='POSE')
+                    reconcile_link_constraints(active_object,
+                                               {i: (active_object, new_bones[i]) for i in selected_bones},
+                                               bpy.context.scene.my_tool.my_link_type, "Chain")
+            else:
+                profiled_ops.object.mode_set(mode='POSE')
 
         # use deform or not
-        if not bpy.context.scene.my_tool.my_use_deform:
-            for i in selected_bones:
-                active_object.data.bones[bone_prefix + i].use_deform = False
-        else:
-            for i in selected_bones:
-                active_object.data.bones[bone_prefix + i].use_deform = True
+        with profile_phase("deform"):
+            count_bone_iterations(len(selected_bones))
+            if not bpy.context.scene.my_tool.my_use_deform:
+                for i in selected_bones:
+                    active_object.data.bones[new_bones[i]].use_deform = False
+            else:
+                for i in selected_bones:
+                    active_object.data.bones[new_bones[i]].use_deform = True
 
         # adds ik to end of chain or not
         if bpy.context.scene.my_tool.my_add_ik_to_chain:
-            bpy.ops.object.mode_set(mode='POSE')
-            bpy.ops.pose.select_all(action='DESELECT')
+            with profile_phase("IK"):
+                profiled_ops.object.mode_set(mode='POSE')
+                profiled_ops.pose.select_all(action='DESELECT')
 
-            active_object.data.bones[bone_prefix + selected_bones[-1]].select = True
-            bpy.context.object.data.bones.active = bpy.context.object.pose.bones[bone_prefix + selected_bones[-1]].bone
-            bpy.ops.pose.ik_add(with_targets=False)
-            bpy.ops.pose.select_all(action='DESELECT')
+                active_object.data.bones[new_bones[selected_bones[-1]]].select = True
+                bpy.context.object.data.bones.active = bpy.context.object.pose.bones[new_bones[selected_bones[-1]]].bone
+                profiled_ops.pose.ik_add(with_targets=False)
+                profiled_ops.pose.select_all(action='DESELECT')
 
         # elongates last bone or not
         if bpy.context.scene.my_tool.my_elongate_end_of_chain:
-            bpy.ops.object.mode_set(mode='EDIT')
-            active_object.data.edit_bones[bone_prefix + selected_bones[-1]].length = \
-                active_object.data.edit_bones[bone_prefix + selected_bones[-1]].length + mytool.my_elongate_value
-            bpy.ops.object.mode_set(mode='POSE')
+            with profile_phase("elongate"):
+                profiled_ops.object.mode_set(mode='EDIT')
+                active_object.data.edit_bones[new_bones[selected_bones[-1]]].length = \
+                    active_object.data.edit_bones[new_bones[selected_bones[-1]]].length + mytool.my_elongate_value
+                profiled_ops.object.mode_set(mode='POSE')
+
+        profiled_ops.object.mode_set(mode='POSE')
+        profiled_ops.pose.select_all(action='DESELECT')
+        invalidate_bone_index(active_object.data)
 
-        bpy.ops.object.mode_set(mode='POSE')
-        bpy.ops.pose.select_all(action='DESELECT')
+        scene.cursor.location = cursor_location
+
+        renamed_bones = count_renamed_bones(new_bones, bone_prefix)
+        if renamed_bones:
+            self.report({'WARNING'}, "%d new bone names were taken, those bones got a number suffix" %
+                        renamed_bones)
 
         return {'FINISHED'}
 
@@ -451,18 +3226,72 @@ class WM_OT_SetParent(Operator):
     """Sets the parent of selected bone"""
     bl_label = "Set Parent"
     bl_idname = "wm.set_parent"
-
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def snapshot_bones(self, context):
+        active_object = context.view_layer.objects.active
+        if active_object is None or active_object.type != 'ARMATURE':
+            return []
+        return [(active_object, get_selected_bone_names(active_object.data))]
+
+    # parents in other armatures are joined in, which recipes don't do, so only the bone name is stored
+    def recipe_step(self, context):
+        active_object = context.view_layer.objects.active
+        bone_names = get_selected_bone_names(active_object.data) \
+            if active_object is not None and active_object.type == 'ARMATURE' else []
+        return make_recipe_step(self.bl_idname, context.scene.my_tool, parent=context.scene.bone_name,
+                                bones=bone_names)
+
+    @profiled
+    @recorded
+    @transaction
     def execute(self, context):
-        active_object = bpy.context.active_object
-        bpy.ops.object.mode_set(mode='EDIT')
-        selected_bones = get_selected_bones()
+        scene = context.scene
+        active_object = context.view_layer.objects.active
+        if active_object is None or active_object.type != 'ARMATURE':
+            self.report({'ERROR'}, "Active object isn't an armature")
+            return {'CANCELLED'}
+
+        # the parent can be in another armature, which gets joined into the active one
+        parent_object = bpy.data.objects.get(scene.parent_armature) if scene.parent_armature else active_object
+        if parent_object is None or parent_object.type != 'ARMATURE' or \
+                parent_object.name not in context.view_layer.objects:
+            self.report({'ERROR'}, "Parent armature not found")
+            return {'CANCELLED'}
+
+        parent_name = scene.bone_name
+        if parent_name not in get_bone_index(parent_object.data):
+            self.report({'ERROR'}, "Parent bone %s not found" % parent_name)
+            return {'CANCELLED'}
+
+        selected_bones = get_selected_bone_names(active_object.data)
+        if not selected_bones:
+            self.report({'WARNING'}, "No bones selected")
+            return {'CANCELLED'}
+
+        # bones can't be parented to their own children, checked on the cached hierarchy before edit mode
+        if parent_object == active_object:
+            cycles = find_parent_cycles(get_bone_index(active_object.data), selected_bones, parent_name)
+            selected_bones = [i for i in selected_bones if i not in cycles]
+        else:
+            cycles = []
+            with profile_phase("merge"):
+                parent_name = merge_armature(context, active_object, parent_object, parent_name)
+            scene.parent_armature = ""
+            scene.bone_name = parent_name
 
-        for i in selected_bones:
-            bpy.ops.armature.select_all(action='DESELECT')
-            active_object.data.edit_bones[i].parent = \
-                active_object.data.edit_bones[bpy.context.scene.bone_name]
+        profiled_ops.object.mode_set(mode='EDIT')
+
+        with profile_phase("parent"):
+            set_edit_bone_parents(active_object.data.edit_bones, selected_bones, parent_name,
+                                  scene.my_tool.my_set_parent_type == 'parent_CONNECTED')
+
+        profiled_ops.object.mode_set(mode='POSE')
+        invalidate_bone_index(active_object.data)
 
-        bpy.ops.object.mode_set(mode='POSE')
+        if cycles:
+            self.report({'WARNING'}, "Skipped %d bones, %s is one of their children" % (len(cycles), parent_name))
+        self.report({'INFO'}, "Parented %d bones to %s" % (len(selected_bones), parent_name))
 
         return {'FINISHED'}
 
@@ -470,23 +3299,43 @@ class WM_OT_ClearParent(Operator):
     """Clears the parent of selected bone"""
     bl_label = "Clear Parent"
     bl_idname = "wm.clear_parent"
-
+    bl_options = {'REGISTER', 'UNDO'}
+
+    def snapshot_bones(self, context):
+        active_object = context.view_layer.objects.active
+        if active_object is None or active_object.type != 'ARMATURE':
+            return []
+        return [(active_object, get_selected_bone_names(active_object.data))]
+
+    def recipe_step(self, context):
+        active_object = context.view_layer.objects.active
+        bone_names = get_selected_bone_names(active_object.data) \
+            if active_object is not None and active_object.type == 'ARMATURE' else []
+        return make_recipe_step(self.bl_idname, context.scene.my_tool, bones=bone_names)
+
+    @profiled
+    @recorded
+    @transaction
     def execute(self, context):
-        active_object = bpy.context.active_object
-        bpy.ops.object.mode_set(mode='EDIT')
-        selected_bones = get_selected_bones()
+        active_object = context.view_layer.objects.active
+        if active_object is None or active_object.type != 'ARMATURE':
+            self.report({'ERROR'}, "Active object isn't an armature")
+            return {'CANCELLED'}
 
-        for i in selected_bones:
-            bpy.ops.object.mode_set(mode='POSE')
-            bpy.ops.pose.select_all(action='DESELECT')
+        selected_bones = get_selected_bone_names(active_object.data)
+        if not selected_bones:
+            self.report({'WARNING'}, "No bones selected")
+            return {'CANCELLED'}
+
+        profiled_ops.object.mode_set(mode='EDIT')
+
+        with profile_phase("parent"):
+            clear_edit_bone_parents(active_object.data.edit_bones, selected_bones)
 
-            active_object.data.bones[i].select = True
-            bpy.context.object.data.bones.active = bpy.context.object.pose.bones[i].bone
-            bpy.ops.object.mode_set(mode='EDIT')
-            bpy.ops.armature.parent_clear(type='CLEAR')
-            bpy.ops.armature.select_all(action='DESELECT')
+        profiled_ops.object.mode_set(mode='POSE')
+        invalidate_bone_index(active_object.data)
 
-        bpy.ops.object.mode_set(mode='POSE')
+        self.report({'INFO'}, "Cleared the parent of %d bones" % len(selected_bones))
 
         return {'FINISHED'}
 
@@ -494,8 +3343,95 @@ class WM_OT_AddTargetBones(Operator):
     """Adds target bones to selected"""
     bl_label = "Add Target Bones"
     bl_idname = "wm.add_target_bones"
-
+    bl_options = {'REGISTER', 'UNDO'}
+
+    # with only changes on the update is planned here and only the bones it changes are saved,
+    # execute reuses the plans while the bones stay the same, otherwise every bone gets a link constraint
+    def snapshot_bones(self, context):
+        mytool = context.scene.my_tool
+        armatures = get_batch_armatures(context)
+        self.target_plans = {}
+        if not mytool.my_target_incremental or any(ob.data.is_editmode for ob in armatures):
+            return [(ob, None) for ob in armatures]
+
+        snapshot_bones = []
+        for ob in armatures:
+            plan = plan_target_bones(ob, mytool.my_target_bone_prefix, mytool.my_target_link_type)
+            self.target_plans[ob.name] = (get_bone_index(ob.data), plan)
+            snapshot_bones.append((ob, target_snapshot_bones(ob, plan)))
+        return snapshot_bones
+
+    def recipe_step(self, context):
+        return make_recipe_step(self.bl_idname, context.scene.my_tool)
+
+    @profiled
+    @recorded
+    @transaction
     def execute(self, context):
+        mytool = context.scene.my_tool
+        if mytool.my_target_incremental:
+            return self.execute_update(context)
+        if use_fast_mode(mytool):
+            return self.execute_data(context)
+
+        return self.execute_ops(context)
+
+    # only adds, updates and removes target bones of bones that changed since the last run
+    def execute_update(self, context):
+        mytool = context.scene.my_tool
+
+        armatures = get_batch_armatures(context)
+        if not armatures:
+            self.report({'WARNING'}, "No armatures to process")
+            return {'CANCELLED'}
+
+        # the diff reads bones, which only get the changes made to edit bones when edit mode is left
+        if any(ob.data.is_editmode for ob in armatures):
+            profiled_ops.object.mode_set(mode='POSE')
+            for ob in armatures:
+                invalidate_bone_index(ob.data)
+
+        # plans made for the snapshot, unless the bones changed since
+        target_plans = getattr(self, 'target_plans', {})
+        self.target_plans = {}
+        ready_plans = {ob.name: target_plans[ob.name][1] for ob in armatures
+                       if ob.name in target_plans and target_plans[ob.name][0] is get_bone_index(ob.data)}
+
+        plans = update_target_bones(context, armatures, mytool.my_target_bone_prefix,
+                                    mytool.my_target_link_type, ready_plans)
+
+        self.report({'INFO'}, "Added %d, updated %d and removed %d target bones in %d armatures" %
+                    (sum(len(plan.created) for ob, plan in plans), sum(len(plan.updated()) for ob, plan in plans),
+                     sum(len(plan.remove) for ob, plan in plans), len(armatures)))
+
+        renamed_bones = sum(count_renamed_bones(plan.created, mytool.my_target_bone_prefix) for ob, plan in plans)
+        if renamed_bones:
+            self.report({'WARNING'}, "%d target bone names were taken, those bones got a number suffix" %
+                        renamed_bones)
+
+        return {'FINISHED'}
+
+    # adds target bones to every armature in the batch in one edit session
+    def execute_data(self, context):
+        mytool = context.scene.my_tool
+
+        armatures = get_batch_armatures(context)
+        if not armatures:
+            self.report({'WARNING'}, "No armatures to process")
+            return {'CANCELLED'}
+
+        targets = add_target_bones(context, armatures, mytool.my_target_bone_prefix, mytool.my_target_link_type)
+
+        renamed_bones = sum(count_renamed_bones(new_bones, mytool.my_target_bone_prefix)
+                            for armature_object, new_bones in targets)
+        if renamed_bones:
+            self.report({'WARNING'}, "%d target bone names were taken, those bones got a number suffix" %
+                        renamed_bones)
+
+        return {'FINISHED'}
+
+    # adds target bones to the active armature with operators, kept as a fallback
+    def execute_ops(self, context):
         scene = context.scene
         mytool = scene.my_tool
         active_object = bpy.context.active_object
@@ -503,131 +3439,305 @@ class WM_OT_AddTargetBones(Operator):
         # get prefix from input
         bone_prefix = mytool.my_target_bone_prefix
 
-        bpy.ops.object.mode_set(mode='EDIT')
-        bpy.ops.armature.select_all(action='DESELECT')
+        # get all bones, except target bones and bones that already have one
+        sources, target_bones = get_target_sources(active_object.data, get_all_bones(), bone_prefix)
 
-        # get all bones
-        all_bones = get_all_bones()
+        # duplicates all bones with the prefix
+        with profile_phase("duplicate"):
+            profiled_ops.object.mode_set(mode='EDIT')
+            new_bones = duplicate_edit_bones(active_object.data.edit_bones, sources, bone_prefix)
+            profiled_ops.armature.select_all(action='DESELECT')
 
-        # duplicate bones
-        bpy.ops.object.mode_set(mode='POSE')
-        bpy.ops.pose.select_all(action='SELECT')
+            profiled_ops.object.mode_set(mode='POSE')
+            invalidate_bone_index(active_object.data)
+            copy_pose_bones(active_object, new_bones)
 
-        bpy.ops.object.mode_set(mode='EDIT')
-        bpy.ops.armature.duplicate(do_flip_names=False)
+        # adds constraints to original bones to target bones
+        target_bones.update(new_bones)
+        with profile_phase("link"):
+            reconcile_link_constraints(active_object, {i: (active_object, j) for i, j in target_bones.items()},
+                                       mytool.my_target_link_type, "Target")
 
-        # gets dupped bones and adds prefix
-        for i in all_bones:
-            bpy.context.object.pose.bones[i + '.001'].name = bone_prefix + i
-            bpy.ops.armature.select_all(action='DESELECT')
+        # disables use deform on generated target bones
+        with profile_phase("deform"):
+            count_bone_iterations(len(new_bones))
+            for i in new_bones.values():
+                active_object.data.bones[i].use_deform = False
 
-        # adds constraints to original bones to target bones
-        if bpy.context.scene.my_tool.my_target_link_type == 'link_TRANSFORM':
-            # links bones with copy transform
-            for i in all_bones:
-                try:
-                    bpy.ops.object.mode_set(mode='POSE')
-                    bpy.ops.pose.select_all(action='DESELECT')
+        write_target_manifest(active_object.data, bone_prefix, mytool.my_target_link_type, target_bones)
 
-                    # links bones with copy transform
-                    active_object.data.bones[bone_prefix + i].select = True
-                    active_object.data.bones[i].select = True
-                    bpy.context.object.data.bones.active = bpy.context.object.pose.bones[i].bone
+        renamed_bones = count_renamed_bones(new_bones, bone_prefix)
+        if renamed_bones:
+            self.report({'WARNING'}, "%d target bone names were taken, those bones got a number suffix" %
+                        renamed_bones)
 
-                    bpy.ops.object.mode_set(mode='EDIT')
-                    bpy.ops.object.mode_set(mode='POSE')
+        return {'FINISHED'}
 
-                    bpy.ops.pose.constraint_add_with_targets(type='COPY_TRANSFORMS')
+class WM_OT_LinkArmToWeaponArmature(BackgroundJobOperator, Operator):
+    """Links bones in an armature to another with the same name"""
+    bl_label = "Link Arm to Weapon Armature"
+    bl_idname = "wm.link_arm_to_weapon_armature"
+    bl_options = {'REGISTER', 'UNDO'}
 
-                    bpy.ops.pose.select_all(action='DESELECT')
+    job_file = "remap table"
 
-                    # disables use deform on generated target bones
-                    active_object.data.bones[bone_prefix + i].use_deform = False
-                except IndexError:
-                    pass
+    # only the base armature gets constraints, on the matched bones and the ones with weapon links the run
+    # can remove, nothing if the remap table can't be read since execute stops first
+    def snapshot_bones(self, context):
+        base_object, target_objects = self.get_link_objects(context)
+        if base_object is None or not target_objects:
+            return []
+
+        job_result = self.peek_job_result([base_object] + target_objects)
+        if job_result is not None:
+            report = job_result[1]
         else:
-            # links bones with copy loc & rot
-            for i in all_bones:
-                try:
-                    bpy.ops.object.mode_set(mode='POSE')
-                    bpy.ops.pose.select_all(action='DESELECT')
+            try:
+                report = match_armature_bones(base_object, target_objects, get_link_matcher(context.scene.my_tool))
+            except (OSError, ValueError, csv.Error, re.error):
+                return []
+        return [(base_object, link_snapshot_bones(base_object, report))]
 
-                    # links bones with copy transform
-                    active_object.data.bones[bone_prefix + i].select = True
-                    active_object.data.bones[i].select = True
-                    bpy.context.object.data.bones.active = bpy.context.object.pose.bones[i].bone
+    # the armatures are stored by name, batch armatures aren't since they're different in each file
+    def recipe_step(self, context):
+        scene = context.scene
+        return make_recipe_step(self.bl_idname, scene.my_tool, base=scene.target_arm_armature,
+                                targets=[scene.target_weapon_armature])
+
+    # the base armature and the armatures it gets linked to
+    def get_link_objects(self, context):
+        scene = context.scene
 
-                    bpy.ops.object.mode_set(mode='EDIT')
-                    bpy.ops.object.mode_set(mode='POSE')
+        base_object = bpy.data.objects.get(scene.target_arm_armature)
+        if base_object is None or base_object.type != 'ARMATURE':
+            return None, []
+
+        # links to the target armature, and every other armature in the batch when batching
+        target_objects = []
+        target_object = bpy.data.objects.get(scene.target_weapon_armature)
+        if target_object is not None and target_object.type == 'ARMATURE':
+            target_objects.append(target_object)
+        if scene.my_tool.my_batch_mode != 'batch_ACTIVE':
+            for ob in get_batch_armatures(context):
+                if ob != base_object and ob not in target_objects:
+                    target_objects.append(ob)
+
+        return base_object, target_objects
+
+    # reads the remap table and matches bone names in the thread pool
+    def start_job(self, context):
+        mytool = context.scene.my_tool
+        base_object, target_objects = self.get_link_objects(context)
+        if base_object is None or not target_objects or \
+                any(ob.data.is_editmode for ob in [base_object] + target_objects):
+            return None
+
+        # plans from the cache file are read first so the job can reuse them,
+        # if the file can't be read execute runs right away and reports it
+        if mytool.my_link_plan_cache_path:
+            try:
+                load_link_plans(mytool.my_link_plan_cache_path)
+            except (OSError, ValueError):
+                return None
+
+        bone_names = self.set_job_armatures([base_object] + target_objects)
+        remap_path = os.path.normpath(bpy.path.abspath(mytool.my_link_remap_path)) \
+            if mytool.my_link_remap_path else ""
+        strip_prefixes, strip_suffixes = get_link_strips(mytool)
+        return BackgroundJob(plan_link_job, remap_path, strip_prefixes, strip_suffixes,
+                             bone_names[base_object.name], [(i.name, bone_names[i.name]) for i in target_objects])
+
+    @profiled
+    @recorded
+    @transaction
+    def execute(self, context):
+        mytool = context.scene.my_tool
 
-                    bpy.ops.pose.constraint_add_with_targets(type='COPY_ROTATION')
-                    bpy.ops.pose.constraint_add_with_targets(type='COPY_LOCATION')
+        base_object, target_objects = self.get_link_objects(context)
+        if base_object is None:
+            self.report({'ERROR'}, "Base armature not found")
+            return {'CANCELLED'}
 
-                    bpy.ops.pose.select_all(action='DESELECT')
+        if not target_objects:
+            self.report({'ERROR'}, "Target armature not found")
+            return {'CANCELLED'}
 
-                    # disables use deform on generated target bones
-                    active_object.data.bones[bone_prefix + i].use_deform = False
-                except IndexError:
-                    pass
+        if mytool.my_link_plan_cache_path:
+            try:
+                load_link_plans(mytool.my_link_plan_cache_path)
+            except (OSError, ValueError) as error:
+                self.report({'ERROR'}, "Couldn't read plan cache: %s" % error)
+                return {'CANCELLED'}
+
+        # the background job already matched the bones if it ran
+        job_result = self.get_job_result([base_object] + target_objects)
+        if job_result is not None:
+            matcher, report = job_result
+            report = with_target_objects(report, target_objects)
+        else:
+            report = None
+            try:
+                matcher = get_link_matcher(mytool)
+            except (OSError, ValueError, csv.Error, re.error) as error:
+                self.report({'ERROR'}, "Couldn't read remap table: %s" % error)
+                return {'CANCELLED'}
+
+        if context.view_layer.objects.active is not None:
+            profiled_ops.object.mode_set(mode='OBJECT')
+        profiled_ops.object.select_all(action='DESELECT')
+        bpy.context.view_layer.objects.active = base_object
+
+        report = link_armature_bones(base_object, target_objects, matcher, report)
 
-        bpy.ops.object.mode_set(mode='POSE')
+        if mytool.my_link_plan_cache_path:
+            try:
+                save_link_plans()
+            except OSError as error:
+                self.report({'WARNING'}, "Couldn't save plan cache: %s" % error)
+
+        self.report({'INFO'}, "Linked %d bones to %d armatures, %d reused and %d removed constraints, "
+                              "%d base bones unmatched, %d conflicts" %
+                    (len(report.pairs), len(target_objects), report.reused, report.removed,
+                     len(report.unmatched_base), len(report.conflicts)))
 
         return {'FINISHED'}
 
-class WM_OT_LinkArmToWeaponArmature(Operator):
-    """Links bones in an armature to another with the same name"""
-    bl_label = "Link Arm to Weapon Armature"
-    bl_idname = "wm.link_arm_to_weapon_armature"
+class WM_OT_SaveRecipe(Operator):
+    """Saves the recorded steps to the recipe file"""
+    bl_label = "Save Recipe"
+    bl_idname = "wm.save_recipe"
 
     def execute(self, context):
-        active_object = bpy.context.active_object
+        mytool = context.scene.my_tool
+        if not recorded_steps:
+            self.report({'WARNING'}, "No steps recorded")
+            return {'CANCELLED'}
+        if not mytool.my_recipe_path:
+            self.report({'ERROR'}, "No recipe file chosen")
+            return {'CANCELLED'}
+
+        try:
+            write_recipe(bpy.path.abspath(mytool.my_recipe_path), recorded_steps)
+        except OSError as error:
+            self.report({'ERROR'}, "Couldn't save recipe: %s" % error)
+            return {'CANCELLED'}
+
+        self.report({'INFO'}, "Saved %d steps" % len(recorded_steps))
+        return {'FINISHED'}
 
-        bpy.ops.object.mode_set(mode='OBJECT')
-        bpy.ops.object.select_all(action='DESELECT')
+class WM_OT_ClearRecipe(Operator):
+    """Forgets the recorded steps"""
+    bl_label = "Clear Recipe"
+    bl_idname = "wm.clear_recipe"
 
-        # makes base armature active and gets all bones
-        bpy.context.view_layer.objects.active = bpy.data.objects[bpy.context.scene.target_arm_armature]
-        all_bones_base = get_all_bones()
-        bpy.ops.object.mode_set(mode='OBJECT')
-        bpy.ops.object.select_all(action='DESELECT')
+    def execute(self, context):
+        recorded_steps.clear()
+        return {'FINISHED'}
 
-        # makes target armature active and gets all bones
-        bpy.context.view_layer.objects.active = bpy.data.objects[bpy.context.scene.target_weapon_armature]
-        all_bones_target = get_all_bones()
+class WM_OT_PlayRecipe(Operator):
+    """Plays the steps of the recipe file on the armatures, with as few mode switches as it can"""
+    bl_label = "Play Recipe"
+    bl_idname = "wm.play_recipe"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    # bones the steps can change, every bone if the recipe can't be read
+    def snapshot_bones(self, context):
+        mytool = context.scene.my_tool
+        armatures = get_batch_armatures(context)
+        try:
+            steps = load_recipe(mytool.my_recipe_path) if mytool.my_recipe_path else []
+            return merge_snapshot_bones(recipe_snapshot_bones(armatures, steps))
+        except (OSError, ValueError, KeyError, csv.Error, re.error):
+            return [(ob, None) for ob in armatures]
+
+    @profiled
+    @transaction
+    def execute(self, context):
+        mytool = context.scene.my_tool
+        if not mytool.my_recipe_path:
+            self.report({'ERROR'}, "No recipe file chosen")
+            return {'CANCELLED'}
+
+        try:
+            steps = load_recipe(mytool.my_recipe_path)
+        except (OSError, ValueError) as error:
+            self.report({'ERROR'}, "Couldn't read recipe: %s" % error)
+            return {'CANCELLED'}
+
+        armatures = get_batch_armatures(context)
+        if not armatures:
+            self.report({'WARNING'}, "No armatures to process")
+            return {'CANCELLED'}
+
+        try:
+            warnings = play_recipe(context, armatures, steps)
+        except (OSError, ValueError, csv.Error, re.error) as error:
+            self.report({'ERROR'}, "Couldn't read a file the recipe uses: %s" % error)
+            return {'CANCELLED'}
+
+        for warning in warnings:
+            self.report({'WARNING'}, warning)
+        self.report({'INFO'}, "Played %d steps on %d armatures" % (len(steps), len(armatures)))
 
-        # only keeps bones that are in both armatures
-        bone_list_formatted = list(set(all_bones_base) & set(all_bones_target))
-        
-        bpy.ops.object.mode_set(mode='OBJECT')
-        bpy.ops.object.select_all(action='DESELECT')
-        bpy.context.view_layer.objects.active = bpy.data.objects[bpy.context.scene.target_arm_armature]
+        return {'FINISHED'}
 
-        bpy.ops.object.mode_set(mode='POSE')
+class WM_OT_MeasurePoseCost(Operator):
+    """Counts constraints on the armatures and times frame changes, the frame is put back after so there is nothing to undo"""
+    bl_label = "Measure Pose Cost"
+    bl_idname = "wm.measure_pose_cost"
 
-        for i in bone_list_formatted:
-            try:
-                bpy.ops.pose.select_all(action='DESELECT')
-                active_object.data.bones[i].select = True
-                bpy.context.object.data.bones.active = bpy.context.object.pose.bones[i].bone
-                bpy.ops.object.mode_set(mode='EDIT')
-                bpy.ops.object.mode_set(mode='POSE')
+    def execute(self, context):
+        global last_pose_cost
 
-                # adds copy transform
-                bpy.ops.pose.constraint_add(type='COPY_TRANSFORMS')
+        armatures = get_batch_armatures(context)
+        if not armatures:
+            self.report({'WARNING'}, "No armatures to process")
+            return {'CANCELLED'}
 
-                # sets target and sub target
-                bpy.context.object.pose.bones[i].constraints["Copy Transforms"].target = \
-                    bpy.data.objects[bpy.context.scene.target_weapon_armature]
+        report = count_pose_cost(armatures)
+        measure_pose_evaluation(context, armatures, context.scene.my_tool.my_pose_cost_frames, report)
+        last_pose_cost = report
 
-                bpy.context.object.pose.bones[i].constraints["Copy Transforms"].subtarget = i
-                bpy.ops.pose.select_all(action='DESELECT')
-            # if a bone is not found, skips it
-            except:
-                continue
-                
-        bpy.ops.pose.select_all(action='DESELECT')
-        bpy.ops.object.mode_set(mode='OBJECT')
+        self.report({'INFO'}, "%d constraints on %d bones, %.2f ms per frame" %
+                    (sum(report.constraints.values()), report.bones, report.average_time * 1000.0))
+        return {'FINISHED'}
+
+class WM_OT_MergeLinkConstraints(Operator):
+    """Swaps Copy Rotation and Copy Location pairs that follow the same bone for one Copy Transforms"""
+    bl_label = "Use Copy Transforms"
+    bl_idname = "wm.merge_link_constraints"
+    bl_options = {'REGISTER', 'UNDO'}
+
+    # bones with pairs to swap
+    def snapshot_bones(self, context):
+        snapshot_bones = []
+        for ob in get_batch_armatures(context):
+            count_bone_iterations(len(ob.pose.bones))
+            snapshot_bones.append((ob, {pose_bone.name for pose_bone in ob.pose.bones
+                                        if find_redundant_link_pairs(list(pose_bone.constraints))}))
+        return snapshot_bones
+
+    @profiled
+    @transaction
+    def execute(self, context):
+        global last_pose_cost
+
+        armatures = get_batch_armatures(context)
+        if not armatures:
+            self.report({'WARNING'}, "No armatures to process")
+            return {'CANCELLED'}
+
+        if context.view_layer.objects.active is not None and context.view_layer.objects.active.mode == 'EDIT':
+            profiled_ops.object.mode_set(mode='POSE')
+
+        with profile_phase("link"):
+            merged = merge_link_constraint_pairs(armatures)
 
+        # the counts changed and the old times are for the constraints that were there before
+        if last_pose_cost is not None:
+            last_pose_cost = count_pose_cost(armatures)
+
+        self.report({'INFO'}, "Swapped %d pairs for Copy Transforms" % merged)
         return {'FINISHED'}
 
 # ------------------------------------------------------------------------
@@ -650,9 +3760,7 @@ class OBJECT_PT_CustomPanel(Panel):
         layout.use_property_split = False
         layout.use_property_decorate = False
 
-        layout = self.layout
-        scene = context.scene
-        mytool = scene.my_tool
+        mytool = context.scene.my_tool
         column = layout.column()
 
         # layout.prop(mytool, "my_bool")
@@ -661,16 +3769,72 @@ class OBJECT_PT_CustomPanel(Panel):
         # layout.prop(mytool, "my_float")
         # layout.prop(mytool, "my_float_vector", text="")
         # layout.prop(mytool, "my_string")
+        row = column.row()
+        row.label(text="Run On:")
+        row.prop(mytool, "my_batch_mode", expand=True)
+
+        if mytool.my_batch_mode == 'batch_COLLECTION':
+            row = column.row()
+            row.prop(mytool, "my_batch_collection", text="")
+
+        row = column.row()
+        row.prop(mytool, "my_use_fast_mode")
+        row.enabled = mytool.my_batch_mode == 'batch_ACTIVE'
+
+        row = column.row()
+        row.prop(mytool, "my_show_preview", icon='HIDE_OFF' if mytool.my_show_preview else 'HIDE_ON')
+
+        active_object = context.active_object
+        if active_object is not None and active_object.type == 'ARMATURE':
+            armature = active_object.data
+            bones = armature.edit_bones if armature.is_editmode else armature.bones
+            column.label(text="%s: %d bones" % (active_object.name, len(bones)), icon='ARMATURE_DATA')
+
+        # layout.menu(OBJECT_MT_CustomMenu.bl_idname, text="Presets", icon="SCENE")
+        # layout.separator()
+
+# sections of the main panel, blender doesn't draw them while they're collapsed
+class RiggingToolsSubPanel:
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "UI"
+    bl_category = "RIG Tools"
+    bl_parent_id = "OBJECT_PT_custom_panel"
+
+    # batches can run without an active armature
+    @classmethod
+    def poll(self, context):
+        return active_armature(context) is not None or context.scene.my_tool.my_batch_mode != 'batch_ACTIVE'
+
+class OBJECT_PT_DeleteBonesPanel(RiggingToolsSubPanel, Panel):
+    bl_label = "Delete Listed Bones"
+    bl_idname = "OBJECT_PT_delete_bones_panel"
+
+    def draw(self, context):
+        mytool = context.scene.my_tool
+        column = self.layout.column()
+
         row = column.row()
         row.label(text="Bone List File:")
         row.prop(mytool, "my_bone_list_path", text="")
 
+        row = column.row()
+        row.prop(mytool, "my_reparent_orphans")
+        row.enabled = use_fast_mode(mytool)
+
+        preview = get_delete_preview(context)
+        if preview is not None:
+            column.label(text="Would Delete: %d bones, %d missing" % (preview.count, preview.missing))
+
         col = column.column()
         col.operator("wm.delete_listed_bones", icon='TRASH')
 
-        col.separator()
+class OBJECT_PT_ConnectBonesPanel(RiggingToolsSubPanel, Panel):
+    bl_label = "Make & Connect Bones"
+    bl_idname = "OBJECT_PT_connect_bones_panel"
 
-        col.label(text="Make & Connect Bones:")
+    def draw(self, context):
+        mytool = context.scene.my_tool
+        column = self.layout.column()
 
         row = column.row()
         row.prop(mytool, "my_parent_type", expand=True)
@@ -690,7 +3854,15 @@ class OBJECT_PT_CustomPanel(Panel):
 
         row = column.row()
         row.prop(mytool, "my_elongate_value")
-        row.enabled = bpy.context.scene.my_tool.my_elongate_end_of_chain
+        row.enabled = mytool.my_elongate_end_of_chain
+
+        row = column.row()
+        row.label(text="Chains:")
+        row.prop(mytool, "my_chain_mode", expand=True)
+
+        row = column.row()
+        row.label(text="Roll:")
+        row.prop(mytool, "my_roll_mode", text="")
 
         row = column.row()
         row.label(text="Parent By:")
@@ -701,23 +3873,52 @@ class OBJECT_PT_CustomPanel(Panel):
 
         row = column.row()
         row.prop(mytool, "my_link_type", expand=True)
-        row.enabled = bpy.context.scene.my_tool.my_link_bones
+        row.enabled = mytool.my_link_bones
 
         col = column.column()
         col.operator("wm.connect_selected_bones", icon='ADD', text='Add & Connect Selected Bones')
 
-        col.separator()
+class OBJECT_PT_ParentBonesPanel(RiggingToolsSubPanel, Panel):
+    bl_label = "Parent Bones"
+    bl_idname = "OBJECT_PT_parent_bones_panel"
+
+    # the parent is searched in the active armature's bones
+    @classmethod
+    def poll(self, context):
+        return active_armature(context) is not None
+
+    def draw(self, context):
+        scene = context.scene
+        mytool = scene.my_tool
+        column = self.layout.column()
+
+        row = column.row()
+        row.label(text="Armature:")
+        row.prop_search(scene, "parent_armature", mytool, "my_armature_names", text='')
+
+        # bones of the picked armature, or the active one
+        parent_object = bpy.data.objects.get(scene.parent_armature) if scene.parent_armature else None
+        if parent_object is None or parent_object.type != 'ARMATURE':
+            parent_object = context.active_object
 
         row = column.row()
         row.label(text="Parent:")
-        row.prop_search(scene, "bone_name", bpy.context.active_object.data, "bones", text='')
+        row.prop_search(scene, "bone_name", parent_object.data, "bones", text='')
+
+        row = column.row()
+        row.prop(mytool, "my_set_parent_type", expand=True)
 
         row = column.row()
         row.operator("wm.clear_parent", icon='X')
         row.operator("wm.set_parent", icon='RESTRICT_INSTANCED_OFF')
 
-        col = column.column()
-        col.separator()
+class OBJECT_PT_TargetBonesPanel(RiggingToolsSubPanel, Panel):
+    bl_label = "Target Bones"
+    bl_idname = "OBJECT_PT_target_bones_panel"
+
+    def draw(self, context):
+        mytool = context.scene.my_tool
+        column = self.layout.column()
 
         row = column.row()
         row.label(text="Bone Prefix:")
@@ -726,25 +3927,153 @@ class OBJECT_PT_CustomPanel(Panel):
         row = column.row()
         row.prop(mytool, "my_target_link_type", expand=True)
 
+        row = column.row()
+        row.prop(mytool, "my_target_incremental")
+
         col = column.column()
         col.operator("wm.add_target_bones", icon='ADD', text='Add & Link Target Bones')
 
-        col = column.column()
-        col.separator()
+class OBJECT_PT_LinkArmaturesPanel(RiggingToolsSubPanel, Panel):
+    bl_label = "Link Armatures"
+    bl_idname = "OBJECT_PT_link_armatures_panel"
+
+    # armatures are picked by name, so this works with any active object
+    @classmethod
+    def poll(self, context):
+        return True
+
+    def draw(self, context):
+        scene = context.scene
+        mytool = scene.my_tool
+        column = self.layout.column()
 
         row = column.row()
         row.label(text="Base Armature:")
-        row.prop_search(scene, "target_arm_armature", bpy.data, "armatures", text='')
+        row.prop_search(scene, "target_arm_armature", mytool, "my_armature_names", text='')
 
         row = column.row()
         row.label(text="Target Armature:")
-        row.prop_search(scene, "target_weapon_armature", bpy.data, "armatures", text='')
+        row.prop_search(scene, "target_weapon_armature", mytool, "my_armature_names", text='')
+
+        row = column.row()
+        row.label(text="Strip Prefixes:")
+        row.prop(mytool, "my_link_strip_prefixes", text="")
+
+        row = column.row()
+        row.label(text="Strip Suffixes:")
+        row.prop(mytool, "my_link_strip_suffixes", text="")
+
+        row = column.row()
+        row.label(text="Remap Table:")
+        row.prop(mytool, "my_link_remap_path", text="")
+
+        row = column.row()
+        row.label(text="Plan Cache:")
+        row.prop(mytool, "my_link_plan_cache_path", text="")
+
+        preview = get_link_preview(context)
+        if preview is not None:
+            column.label(text="Would Link: %d bones, %d unmatched, %d conflicts" %
+                         (preview.constraints, preview.missing, preview.conflicts))
 
         col = column.column()
         col.operator("wm.link_arm_to_weapon_armature", icon='RESTRICT_INSTANCED_OFF', text='Link Bones from Armatures')
 
-        # layout.menu(OBJECT_MT_CustomMenu.bl_idname, text="Presets", icon="SCENE")
-        # layout.separator()
+class OBJECT_PT_RecipePanel(RiggingToolsSubPanel, Panel):
+    bl_label = "Recipe"
+    bl_idname = "OBJECT_PT_recipe_panel"
+    bl_options = {'DEFAULT_CLOSED'}
+
+    def draw(self, context):
+        mytool = context.scene.my_tool
+        column = self.layout.column()
+
+        row = column.row()
+        row.prop(mytool, "my_record_recipe", icon='REC')
+        row.label(text="%d steps" % len(recorded_steps))
+
+        row = column.row()
+        row.label(text="Recipe File:")
+        row.prop(mytool, "my_recipe_path", text="")
+
+        row = column.row()
+        row.operator("wm.clear_recipe", icon='X')
+        row.operator("wm.save_recipe", icon='FILE_TICK')
+
+        col = column.column()
+        col.operator("wm.play_recipe", icon='PLAY')
+
+# constraint counts and evaluation time of the last measure
+class OBJECT_PT_PoseCostPanel(RiggingToolsSubPanel, Panel):
+    bl_label = "Pose Cost"
+    bl_idname = "OBJECT_PT_pose_cost_panel"
+    bl_options = {'DEFAULT_CLOSED'}
+
+    @classmethod
+    def poll(self, context):
+        return True
+
+    def draw(self, context):
+        mytool = context.scene.my_tool
+        column = self.layout.column()
+
+        row = column.row()
+        row.prop(mytool, "my_pose_cost_frames")
+        row.operator("wm.measure_pose_cost", icon='TIME')
+
+        if last_pose_cost is None:
+            return
+
+        if last_pose_cost.frame_times:
+            column.label(text="%.2f ms per frame, %.2f ms at most" %
+                         (last_pose_cost.average_time * 1000.0, max(last_pose_cost.frame_times) * 1000.0))
+        column.label(text="%d bones, %d constraints" %
+                     (last_pose_cost.bones, sum(last_pose_cost.constraints.values())))
+
+        for constraint_type, count in sorted(last_pose_cost.constraints.items()):
+            row = column.row()
+            row.label(text=constraint_type.replace('_', ' ').title())
+            row.label(text=str(count))
+
+        busiest_bone = last_pose_cost.busiest_bone
+        if busiest_bone is not None:
+            column.label(text="Most on one bone: %s (%d)" % (busiest_bone[1], busiest_bone[2]))
+
+        if last_pose_cost.redundant_pairs:
+            column.label(text="%d Copy Rotation + Copy Location pairs could be one Copy Transforms" %
+                         len(last_pose_cost.redundant_pairs), icon='INFO')
+            column.operator("wm.merge_link_constraints", icon='CONSTRAINT_BONE')
+
+# report of the last operator
+class OBJECT_PT_ProfilePanel(RiggingToolsSubPanel, Panel):
+    bl_label = "Profile"
+    bl_idname = "OBJECT_PT_profile_panel"
+    bl_options = {'DEFAULT_CLOSED'}
+
+    @classmethod
+    def poll(self, context):
+        return True
+
+    def draw(self, context):
+        mytool = context.scene.my_tool
+        column = self.layout.column()
+
+        if last_profile is None:
+            column.label(text="Run a tool to see its profile")
+        else:
+            column.label(text="%s: %.3f s" % (last_profile.operator, last_profile.time))
+            column.label(text="Mode Switches: %d" % last_profile.mode_switches)
+            column.label(text="Other Operator Calls: %d" % last_profile.ops_calls)
+            column.label(text="Bone Iterations: %d" % last_profile.bone_iterations)
+
+            for name, seconds in last_profile.phases.items():
+                row = column.row()
+                row.label(text=name[0].upper() + name[1:])
+                row.label(text="%.3f s" % seconds)
+
+        row = column.row()
+        row.label(text="Log File:")
+        row.prop(mytool, "my_profile_log_path", text="")
 
 
 # ------------------------------------------------------------------------
@@ -752,6 +4081,7 @@ class OBJECT_PT_CustomPanel(Panel):
 # ------------------------------------------------------------------------
 
 classes = (
+    ArmatureName,
     MyProperties,
     WM_OT_DeleteListedBones,
     WM_OT_ConnectSelectedBones,
@@ -759,7 +4089,20 @@ classes = (
     WM_OT_ClearParent,
     WM_OT_AddTargetBones,
     WM_OT_LinkArmToWeaponArmature,
-    OBJECT_PT_CustomPanel
+    WM_OT_SaveRecipe,
+    WM_OT_ClearRecipe,
+    WM_OT_PlayRecipe,
+    WM_OT_MeasurePoseCost,
+    WM_OT_MergeLinkConstraints,
+    OBJECT_PT_CustomPanel,
+    OBJECT_PT_DeleteBonesPanel,
+    OBJECT_PT_ConnectBonesPanel,
+    OBJECT_PT_ParentBonesPanel,
+    OBJECT_PT_TargetBonesPanel,
+    OBJECT_PT_LinkArmaturesPanel,
+    OBJECT_PT_RecipePanel,
+    OBJECT_PT_PoseCostPanel,
+    OBJECT_PT_ProfilePanel
 )
 
 
@@ -770,20 +4113,46 @@ def register():
 
     bpy.types.Scene.arma_name = bpy.props.StringProperty()
     bpy.types.Scene.bone_name = bpy.props.StringProperty()
+    bpy.types.Scene.parent_armature = bpy.props.StringProperty()
     bpy.types.Scene.target_arm_armature = bpy.props.StringProperty()
     bpy.types.Scene.target_weapon_armature = bpy.props.StringProperty()
 
     bpy.types.Scene.my_tool = PointerProperty(type=MyProperties)
 
+    bpy.app.handlers.depsgraph_update_post.append(bone_index_depsgraph_update)
+    bpy.app.handlers.load_post.append(bone_index_load_post)
+    invalidate_armature_items()
+
+    global preview_draw_handler
+    preview_draw_handler = bpy.types.SpaceView3D.draw_handler_add(draw_preview_overlay, (), 'WINDOW', 'POST_VIEW')
+
 
 def unregister():
     from bpy.utils import unregister_class
+
+    global preview_draw_handler
+    bpy.types.SpaceView3D.draw_handler_remove(preview_draw_handler, 'WINDOW')
+    preview_draw_handler = None
+    panel_state_cache.clear()
+
+    global thread_pool
+    if thread_pool is not None:
+        thread_pool.shutdown(wait=False)
+        thread_pool = None
+
+    bpy.app.handlers.depsgraph_update_post.remove(bone_index_depsgraph_update)
+    bpy.app.handlers.load_post.remove(bone_index_load_post)
+    if bpy.app.timers.is_registered(sync_armature_names):
+        bpy.app.timers.unregister(sync_armature_names)
+    invalidate_bone_index()
+
     for cls in reversed(classes):
         unregister_class(cls)
     del bpy.types.Scene.my_tool
 
     del bpy.types.Scene.arma_name
     del bpy.types.Scene.bone_name
+    del bpy.types.Scene.parent_armature
     del bpy.types.Scene.target_arm_armature
     del bpy.types.Scene.target_weapon_armature
 